@@ -0,0 +1,56 @@
+# coding: utf-8
+
+"""
+Latency of the bulk task commands ('C 1,2,...,N') as a function of N:
+sequential API calls versus RtmApi.executeConcurrently().
+
+Usage: python bench/benchBulkCommands.py [latency in ms]
+"""
+
+import sys
+import time
+
+from fakeRtm import FakeRtm
+from RtmApi import RtmApi
+from RtmTransport import RtmFakeTransport
+
+def createApi(rtm, latency):
+    api = RtmApi("key", "secret")
+    api.transport = RtmFakeTransport(rtm.handle, latency)
+    api.setAuthToken("token")
+    api.beginTimeline()
+    
+    return api
+
+def completeSequentially(api, aTasks):
+    for taskseries in aTasks:
+        api.taskComplete("1", taskseries["id"], taskseries["task"]["id"])
+
+def completeConcurrently(api, aTasks):
+    aCalls = [(api.taskComplete, ("1", taskseries["id"], taskseries["task"]["id"])) for taskseries in aTasks]
+    for call in api.executeConcurrently(aCalls):
+        call.getResult()
+
+def main():
+    latency = 0.1
+    if len(sys.argv) > 1:
+        latency = float(sys.argv[1]) / 1000
+    
+    print "RTM latency %i ms, concurrency limit %i" % (latency * 1000, RtmApi.CONCURRENCY_LIMIT)
+    print "%4s %12s %12s" % ("N", "sequential", "concurrent")
+    
+    for n in (1, 2, 5, 10, 20):
+        aTimes = []
+        for complete in (completeSequentially, completeConcurrently):
+            rtm = FakeRtm()
+            aTasks = [rtm.addTask(u"task %i" % i) for i in range(n)]
+            api = createApi(rtm, latency)
+            
+            start = time.time()
+            complete(api, aTasks)
+            aTimes.append(time.time() - start)
+        
+        print "%4i %10.0fms %10.0fms" % (n, aTimes[0] * 1000, aTimes[1] * 1000)
+
+if __name__ == "__main__":
+    main()
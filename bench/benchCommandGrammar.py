@@ -0,0 +1,106 @@
+# coding: utf-8
+
+"""
+Per-message parse cost of the bot commands: the old per-message regex building
+versus the command grammar compiled at import time.
+
+Usage: python bench/benchCommandGrammar.py [iterations]
+"""
+
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from RtmBotGrammar import parseCommand
+
+aMessages = [
+    u"L",
+    u"LIST",
+    u"? milk",
+    u"L tag:work",
+    u"LIST dueBefore:tomorrow status:incomplete",
+    u"HELP",
+    u"CONFIRMATION",
+    u"C 1",
+    u"C 1,2,3,4,5",
+    u"+ 12",
+    u"D 3",
+    u"- 2, 4",
+    u"P 7",
+    u"> 1,2",
+    u"T 3 work urgent",
+    u"# 1,2 home",
+    u"-T 4 urgent",
+    u"C #123456-7654321-9876543",
+    u"buy milk",
+    u"call mom tomorrow at 7pm !1 #family",
+    u"read the article\nhttp://example.com/article\nlooks interesting",
+    u"Lunch with Bob",
+    u"Clean the garage ^saturday",
+]
+
+def legacyParse(message):
+    """Parsing as RtmBot.processCommand did it before the grammar was introduced"""
+
+    if message == "HELP" or message == "CONFIRMATION":
+        return message
+
+    if re.search(ur"^(?:(?:L(?:IST)?)|\?)(\s+.+)?$", message):
+        aMatches = re.match(ur"^(?:(?:L(?:IST)?)|\?)(\s+.+)?$", message).groups()
+        return ("LIST", aMatches[0])
+
+    aCommands = [
+        {"command": (u"C", u"COMPLETE", u"+", u"++")},
+        {"command": (u"D", u"DELETE", u"-")},
+        {"command": (u"P", u"POSTPONE", u">")},
+        {"command": (u"T", u"TAGS", u"#"), "has_param": True},
+        {"command": (u"-T", u"-TAGS", u"-#"), "has_param": True},
+    ]
+
+    for commandInfo in aCommands:
+        aliases = commandInfo["command"]
+        moreParams = "has_param" in commandInfo and commandInfo["has_param"]
+
+        rAliases = []
+        for alias in aliases:
+            rAliases.append(u"(?:" +  re.escape(alias) + ")")
+        rAliases = u"|".join(rAliases)
+
+        if moreParams:
+            rMoreParams = ur"(\s+.+)"
+        else:
+            rMoreParams = u""
+
+        aMatches = re.match(ur"^ (?: " + rAliases + ur") \s+ (?: \#? ) (\d+)-(\d+)-(\d+) " + rMoreParams + u" $", message, re.VERBOSE)
+        if aMatches != None:
+            return aMatches.groups()
+
+        aMatches = re.match(ur"^ (?: " + rAliases + ur" ) \s+ (\d+(?: \s* , \s* \d+)*) " + rMoreParams + u" $", message, re.VERBOSE)
+        if aMatches != None:
+            return re.split(ur"\s*,\s*", aMatches.groups()[0])
+
+    if re.search(ur"^([^\n]+)\n(.+)$", message, re.DOTALL):
+        return re.match(ur"^([^\n]+)\n(.+)$", message, re.DOTALL).groups()
+
+    return message
+
+def parseAll(parse):
+    for message in aMessages:
+        parse(message)
+
+def main():
+    iterations = 2000
+    if len(sys.argv) > 1:
+        iterations = int(sys.argv[1])
+
+    print "%i messages x %i iterations" % (len(aMessages), iterations)
+
+    for name, parse in (("legacy", legacyParse), ("grammar", parseCommand)):
+        seconds = min(timeit.repeat(lambda: parseAll(parse), number = iterations, repeat = 3))
+        print "%-8s %8.2f us/message" % (name, seconds / iterations / len(aMessages) * 1000000)
+
+if __name__ == "__main__":
+    main()
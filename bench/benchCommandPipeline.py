@@ -0,0 +1,90 @@
+# coding: utf-8
+
+"""
+Upstream RTM calls and storage writes made by each of the task commands with several IDs,
+run through RtmBot.processCommand() against the fake RTM and the in-memory storage backend.
+Fails if an invalid ID lets a call through or a command writes a record more than once.
+
+Usage: python bench/benchCommandPipeline.py [latency in ms]
+"""
+
+import sys
+import time
+
+from fakeRtm import FakeRtm
+from RtmBot import RtmBot
+from RtmTransport import RtmFakeTransport
+from SecureStorage import SecureStorage
+from StorageBackend import TieredStorageBackend, MemoryStorageBackend
+
+class Harness(object):
+    def __init__(self, latency):
+        self.rtm = FakeRtm()
+        self.transport = RtmFakeTransport(self.rtm.handle, latency)
+        self.durable = MemoryStorageBackend()
+        self.backend = TieredStorageBackend(self.durable)
+    
+    def say(self, message):
+        """
+        @return tuple (reply, RTM methods called, records written, seconds)
+        """
+        calls = len(self.rtm.aCalls)
+        saves = self.durable.saves
+        start = time.time()
+        
+        storage = SecureStorage("user@example.com", self.backend)
+        bot = RtmBot("key", "secret", "", storage)
+        bot.api.transport = self.transport
+        reply = bot.processCommand(message)
+        storage.flush()
+        
+        return (reply, self.rtm.aCalls[calls:], self.durable.saves - saves, time.time() - start)
+
+def main():
+    latency = 0.05
+    if len(sys.argv) > 1:
+        latency = float(sys.argv[1]) / 1000
+    
+    harness = Harness(latency)
+    for i in range(30):
+        harness.rtm.addTask(u"task %02i" % i, listId = u"1", due = u"2010-12-%02iT10:00:00Z" % (i + 1))
+    
+    for message in (u"hey", u"hey", u"L"):
+        harness.say(message)
+    
+    aCommands = [
+        (u"C 1", 1),
+        (u"C 2,3,4,5,6", 5),
+        (u"D 7,8,9,10", 4),
+        (u"P 11,12", 2),
+        (u"-T 13,14,15 urgent", 3),
+        (u"T 16,17,18 work urgent", 6),
+        (u"D 19,99,100", 0),
+        (u"C 7", 0),
+    ]
+    
+    print "RTM latency %i ms" % (latency * 1000)
+    print "%-24s %6s %8s %8s  %s" % ("command", "calls", "writes", "time", "RTM methods")
+    
+    failed = False
+    for (message, expectedCalls) in aCommands:
+        (reply, aCalls, writes, seconds) = harness.say(message)
+        
+        # the timeline is created once and reused by the following commands
+        aMutations = [method for method in aCalls if method not in ("rtm.timelines.create", "rtm.lists.getList", "rtm.settings.getList", "rtm.timezones.getList")]
+        
+        print "%-24s %6i %8i %6.0fms  %s" % (message, len(aCalls), writes, seconds * 1000, ", ".join(sorted(set(aCalls))))
+        
+        if len(aMutations) != expectedCalls:
+            print "  FAILED: %i task calls, expected %i: %r" % (len(aMutations), expectedCalls, reply)
+            failed = True
+        # the main record (new timeline) and the context, once each at most
+        if writes > 2:
+            print "  FAILED: %i records written" % writes
+            failed = True
+    
+    if failed:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+# coding: utf-8
+
+"""
+Memory held by a warm instance for the rtm.tasks.getList responses of several users, decoded
+without and with the InternTable shared by the decodes (simplejson.InternTable): the raw
+responses kept by RtmApiCache in the instance memory, and the models created from them by
+RtmApiList.createFromRaw(). Sizes count every object reachable from the
+kept responses once, strings included, plus the intern table itself when there is one.
+Times are the best of 3 decodes of one response.
+
+Usage: python bench/benchIntern.py [number of responses] [tasks per response]
+"""
+
+import sys
+import time
+
+from fakeRtm import FakeRtm
+from RtmApi import RtmApiObject, RtmApiList
+import simplejson
+
+def sizeOf(o, aSeen):
+    """
+    Bytes taken by the objects reachable from o not counted yet
+    @return (bytes, bytes of the strings)
+    """
+    if id(o) in aSeen:
+        return (0, 0)
+    aSeen.add(id(o))
+    
+    if isinstance(o, basestring):
+        return (sys.getsizeof(o), sys.getsizeof(o))
+    
+    aValues = []
+    size = sys.getsizeof(o)
+    if isinstance(o, dict):
+        aValues = o.keys() + o.values()
+    elif isinstance(o, (list, tuple)):
+        aValues = o
+    elif isinstance(o, RtmApiObject):
+        for cls in type(o).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if hasattr(o, name):
+                    aValues.append(getattr(o, name))
+    
+    stringsSize = 0
+    for value in aValues:
+        (valueSize, valueStringsSize) = sizeOf(value, aSeen)
+        size += valueSize
+        stringsSize += valueStringsSize
+    
+    return (size, stringsSize)
+
+def decodeRaw(body, table):
+    return simplejson.loads(body, intern = table)
+
+def decodeModels(body, table):
+    aRawLists = simplejson.loads(body, intern = table)["rsp"]["tasks"]["list"]
+    if isinstance(aRawLists, dict):
+        aRawLists = [aRawLists]
+    
+    return [RtmApiList.createFromRaw(list) for list in aRawLists]
+
+def best(function, *args):
+    aTimes = []
+    for i in range(3):
+        start = time.time()
+        function(*args)
+        aTimes.append(time.time() - start)
+    
+    return min(aTimes)
+
+def main():
+    responses = 50
+    tasks = 200
+    if len(sys.argv) > 1:
+        responses = int(sys.argv[1])
+    if len(sys.argv) > 2:
+        tasks = int(sys.argv[2])
+    
+    aBodies = []
+    for i in range(responses):
+        rtm = FakeRtm()
+        rtm.addRandomTasks(tasks)
+        aBodies.append(simplejson.dumps(rtm.handle({"method": "rtm.tasks.getList", "filter": "status:incomplete"})))
+    
+    print "%i responses of %i tasks, %i KB" % (responses, tasks, sum([len(body) for body in aBodies]) / 1024)
+    print "%-8s %-7s %10s %12s %9s %10s %8s" % ("kept", "intern", "total KB", "strings KB", "table KB", "decode ms", "saved")
+    for (name, decode) in [("raw", decodeRaw), ("models", decodeModels)]:
+        plainSize = None
+        for table in [None, simplejson.InternTable()]:
+            aKept = [decode(body, table) for body in aBodies]
+            aSeen = set()
+            (size, stringsSize) = sizeOf(aKept, aSeen)
+            tableSize = 0
+            if table != None:
+                tableSize = sizeOf([table.strings, table.last_used], aSeen)[0]
+            
+            ms = best(decode, aBodies[0], table) * 1000
+            if plainSize == None:
+                plainSize = size
+                print "%-8s %-7s %10i %12i %9s %10.1f %8s" % (name, "no", size / 1024, stringsSize / 1024, "-", ms, "-")
+            else:
+                print "%-8s %-7s %10i %12i %9i %10.1f %7.1f%%" % (name, "yes", size / 1024, stringsSize / 1024, tableSize / 1024, ms,
+                                                                 100.0 * (plainSize - size - tableSize) / plainSize)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# coding: utf-8
+
+"""
+Time to order the LIST reply of 10,000 tasks: the old full sort of all the tasks on the raw
+due date strings versus the full sort and the first page selection (firstTasks) on the sort
+keys computed when the models are created.
+
+Usage: python bench/benchListOrder.py [number of tasks]
+"""
+
+import sys
+import time
+
+from fakeRtm import FakeRtm
+from RtmApi import RtmApiList, RtmApiTask, firstTasks
+from RtmBot import RtmBot
+import simplejson
+
+def sortLegacy(aLists):
+    """The order of RtmBot.__commandList() before the sort keys: the tasks without due date first"""
+    aList = []
+    for list in aLists:
+        aList.extend(list.getTaskseries())
+    
+    aList.sort(key = lambda element: element.task.due)
+    return aList[:RtmBot.LIST_PAGE_SIZE]
+
+def sortAll(aLists):
+    aList = []
+    for list in aLists:
+        aList.extend(list.getTaskseries())
+    
+    aList.sort(key = lambda element: element.task.sortKey)
+    return aList[:RtmBot.LIST_PAGE_SIZE]
+
+def firstPage(aLists):
+    return firstTasks(aLists, RtmBot.LIST_PAGE_SIZE)
+
+def secondPage(aLists):
+    return firstTasks(aLists, 2 * RtmBot.LIST_PAGE_SIZE)[RtmBot.LIST_PAGE_SIZE:]
+
+def best(function, *args):
+    aTimes = []
+    for i in range(5):
+        start = time.time()
+        result = function(*args)
+        aTimes.append(time.time() - start)
+    
+    return (min(aTimes), result)
+
+def createLists(aRawLists):
+    return [RtmApiList.createFromRaw(list) for list in aRawLists]
+
+def main():
+    n = 10000
+    if len(sys.argv) > 1:
+        n = int(sys.argv[1])
+    
+    rtm = FakeRtm()
+    rtm.addRandomTasks(n)
+    response = simplejson.loads(simplejson.dumps(rtm.handle({"method": "rtm.tasks.getList", "filter": "status:incomplete"})))
+    aRawLists = response["rsp"]["tasks"]["list"]
+    
+    (seconds, aLists) = best(createLists, aRawLists)
+    
+    print "%i tasks in %i lists" % (n, len(aLists))
+    print "models with sort keys  %8.1f ms" % (seconds * 1000)
+    
+    (seconds, aLegacy) = best(sortLegacy, aLists)
+    print "full sort, due string  %8.1f ms  first page starts with %i task(s) without due date" % (seconds * 1000,
+        len([taskseries for taskseries in aLegacy if taskseries.task.due == ""]))
+    
+    (seconds, aSorted) = best(sortAll, aLists)
+    print "full sort, sort keys   %8.1f ms" % (seconds * 1000)
+    
+    (seconds, aFirst) = best(firstPage, aLists)
+    print "first page, top-K      %8.1f ms" % (seconds * 1000)
+    
+    (seconds, aSecond) = best(secondPage, aLists)
+    print "second page, top-K     %8.1f ms" % (seconds * 1000)
+    
+    if aFirst != aSorted:
+        print "FAILED: the first page differs from the full sort"
+        sys.exit(1)
+    if aFirst[-1].task.sortKey[0] == RtmApiTask.NO_DUE:
+        print "FAILED: tasks without due date on the first page"
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# coding: utf-8
+
+"""
+Memory and construction time of the task models for a 5,000 task rtm.tasks.getList response.
+Strings are shared with the decoded response, so only the model objects themselves are counted.
+
+Usage: python bench/benchModels.py [number of tasks]
+"""
+
+import sys
+import time
+import gc
+
+from fakeRtm import FakeRtm
+from RtmApi import RtmApiList, RtmApiObject
+import simplejson
+
+def sizeOf(o, aSeen):
+    """Bytes taken by the model objects and their containers"""
+    if id(o) in aSeen or isinstance(o, basestring):
+        return 0
+    aSeen.add(id(o))
+    
+    size = sys.getsizeof(o)
+    if hasattr(o, "__dict__"):
+        size += sys.getsizeof(o.__dict__)
+        for value in o.__dict__.itervalues():
+            size += sizeOf(value, aSeen)
+    if isinstance(o, RtmApiObject):
+        for cls in type(o).__mro__:
+            for name in getattr(cls, "__slots__", ()):
+                if hasattr(o, name):
+                    size += sizeOf(getattr(o, name), aSeen)
+    if isinstance(o, (list, tuple)):
+        for value in o:
+            size += sizeOf(value, aSeen)
+    
+    return size
+
+def main():
+    n = 5000
+    if len(sys.argv) > 1:
+        n = int(sys.argv[1])
+    
+    rtm = FakeRtm()
+    rtm.addRandomTasks(n)
+    jsonResponse = simplejson.dumps(rtm.handle({"method": "rtm.tasks.getList", "filter": "status:incomplete"}))
+    aListsRaw = simplejson.loads(jsonResponse)["rsp"]["tasks"]["list"]
+    
+    aTimes = []
+    for i in range(5):
+        gc.collect()
+        start = time.time()
+        aLists = [RtmApiList.createFromRaw(list) for list in aListsRaw]
+        aTimes.append(time.time() - start)
+    
+    size = sizeOf(aLists, set())
+    
+    print "%i tasks, response %i KB" % (n, len(jsonResponse) / 1024)
+    print "construction %8.2f us/task" % (min(aTimes) / n * 1000000)
+    print "models       %8i bytes/task" % (size / n)
+
+if __name__ == "__main__":
+    main()
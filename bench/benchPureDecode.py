@@ -0,0 +1,120 @@
+# coding: utf-8
+
+"""
+Decoding without the C extension of simplejson (as on App Engine): the reference pure Python
+decoder (py_scanstring + py_make_scanner) versus the fast one selected when _speedups is
+missing (py_fast_scanstring + py_make_fast_scanner), over the payloads of the bot: the
+rtm.tasks.getList response decoded by simplejson.loads() and into the events of the
+incremental parser, the mirror of the tasks, the stored timezones
+and the jobs of the task queue. Times are the CPU time, the best of 5 runs.
+
+Usage: python bench/benchPureDecode.py [number of tasks...]
+"""
+
+import gc
+import sys
+import time
+import zlib
+import base64
+
+from fakeRtm import FakeRtm
+from RtmTransport import RtmTransport
+import TasksMirrorStorage
+import simplejson
+simplejson._toggle_speedups(False)
+from simplejson import decoder, scanner
+from simplejson.incremental import iterevents
+
+def select(fast):
+    """
+    Selects the fast pure Python decoder or the reference one for the decoders created next
+    
+    @param bool fast
+    """
+    if fast:
+        decoder.scanstring = decoder.py_fast_scanstring
+        scanner.make_scanner = decoder.make_scanner = scanner.py_make_fast_scanner
+    else:
+        decoder.scanstring = decoder.py_scanstring
+        scanner.make_scanner = decoder.make_scanner = scanner.py_make_scanner
+
+def loadsAll(aDocuments):
+    # a new decoder: simplejson.loads() would reuse the one created at the import
+    jsonDecoder = decoder.JSONDecoder()
+    
+    return [jsonDecoder.decode(document) for document in aDocuments]
+
+def eventsAll(aDocuments):
+    return [list(iterevents(aChunks)) for aChunks in aDocuments]
+
+def best(function, aDocuments):
+    """
+    @return dict {fast: seconds} the best CPU time of each decoder, the runs interleaved
+    """
+    aTimes = {False: [], True: []}
+    aResults = {}
+    gc.disable()
+    try:
+        for i in range(5):
+            for fast in (False, True):
+                select(fast)
+                start = time.clock()
+                aResults[fast] = function(aDocuments)
+                aTimes[fast].append(time.clock() - start)
+    finally:
+        select(True)
+        gc.enable()
+    
+    if repr(aResults[False]) != repr(aResults[True]):
+        print "FAILED: the fast decoder differs"
+        sys.exit(1)
+    
+    return dict([(fast, min(aTimes[fast])) for fast in aTimes])
+
+def report(n, payload, size, function, aDocuments):
+    aSeconds = best(function, aDocuments)
+    print "%7s %-16s %9i %12.1f %9.1f %7.2fx" % (n, payload, size / 1024, aSeconds[False] * 1000, aSeconds[True] * 1000,
+                                                 aSeconds[False] / aSeconds[True])
+
+def main():
+    aSizes = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 3000]
+    
+    print "%7s %-16s %9s %12s %9s %8s" % ("tasks", "payload", "KB", "reference ms", "fast ms", "speedup")
+    for n in aSizes:
+        rtm = FakeRtm()
+        rtm.addRandomTasks(n)
+        body = simplejson.dumps(rtm.handle({"method": "rtm.tasks.getList", "filter": "status:incomplete"}))
+        aChunks = [body[start:start + RtmTransport.CHUNK_SIZE] for start in xrange(0, len(body), RtmTransport.CHUNK_SIZE)]
+        
+        report(n, "getList loads", len(body), loadsAll, [body])
+        report(n, "getList events", len(body), eventsAll, [aChunks])
+        
+        aMirror = {"lastSync": u"2010-12-01T10:00:00Z", "created": time.time(), "aTaskseries": {}, "aSynced": {}}
+        for (listId, taskseries) in rtm.aTasks.itervalues():
+            aMirror["aTaskseries"][taskseries["id"]] = [listId, taskseries]
+            aMirror["aSynced"][taskseries["id"]] = listId + u"/" + taskseries["modified"]
+        mirror = TasksMirrorStorage._inflate(base64.b64encode(zlib.compress(simplejson.dumps(aMirror, separators = (",", ":")))))
+        
+        report(n, "mirror", len(mirror), loadsAll, [mirror])
+    
+    # the real list has about 400 timezones
+    rtmZones = FakeRtm().handle({"method": "rtm.timezones.getList"})["rsp"]["timezones"]["timezone"]
+    aTimezones = []
+    for i in range(400):
+        zone = dict(rtmZones[i % len(rtmZones)])
+        zone["id"] = unicode(i + 1)
+        zone["name"] = u"%s/%i" % (zone["name"], i)
+        aTimezones.append(zone)
+    timezones = simplejson.dumps({"lastUpdated": time.time(), "aTimezones": aTimezones})
+    
+    report("", "timezones", len(timezones), loadsAll, [timezones])
+    
+    # the jobs are small, each decoded by a request of its own
+    aJobs = [simplejson.dumps({"user": u"user%i@example.com" % i, "timeline": unicode(100000 + i),
+                               "method": u"taskAddTags", "args": [u"1", unicode(1000000 + i), unicode(2000000 + i), u"work,phone"]})
+             for i in range(1000)]
+    
+    report("", "1000 jobs", sum([len(job) for job in aJobs]), loadsAll, aJobs)
+
+if __name__ == "__main__":
+    main()
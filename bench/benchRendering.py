@@ -0,0 +1,86 @@
+# coding: utf-8
+
+"""
+Time to render the LIST reply for 5,000 tasks: the old per-task due date formatting
+(time.strptime and up to seven time.strftime calls per task) versus RtmApiRenderContext
+shared by the whole list.
+
+Usage: python bench/benchRendering.py [number of tasks]
+"""
+
+import sys
+import time
+import calendar
+
+from fakeRtm import FakeRtm
+from RtmApi import RtmApiList, RtmApiSettings, RtmApiTimezone, RtmApiRenderContext, renderTasks
+import simplejson
+
+def legacyFormatDue(task, userSettings):
+    """The due date part of RtmApiTaskseria.toString() before RtmApiRenderContext"""
+    dueTime = time.strptime(task.due, u"%Y-%m-%dT%H:%M:%SZ")
+    
+    timestamp = calendar.timegm(dueTime)
+    diff = timestamp - time.mktime(time.gmtime())
+    
+    dueTime = time.gmtime(userSettings.getTimezone().gmtToUser(timestamp))
+    
+    weekDays = (u"Sunday", u"Monday", u"Tuesday", u"Wednsday", u"Thursday", u"Friday", u"Saturday")
+    months = (u"January", u"Febuary", u"March", u"April", u"May", u"June", u"July", u"August", u"September", u"October", u"November", u"December")
+    
+    theDate = time.strftime(u"%Y-%m-%d", dueTime)
+    if theDate == time.strftime(u"%Y-%m-%d"):
+        theDate = u"today"
+    elif diff > 0 and diff < 24*3600*7:
+        theDate = weekDays[int(time.strftime("%w", dueTime))]
+    elif time.strftime("%Y", dueTime) == time.strftime("%Y"):
+        # months[12] raises IndexError for December
+        theDate = months[int(time.strftime("%m", dueTime)) % 12] + u" " + time.strftime(u"%d", dueTime)
+    
+    if task.has_due_time:
+        return theDate + " " + time.strftime(u"%H:%M", dueTime)
+    else:
+        return theDate
+
+def renderLegacy(aTaskseries, userSettings):
+    return [taskseries.task.due != "" and legacyFormatDue(taskseries.task, userSettings) for taskseries in aTaskseries]
+
+def renderShared(aTaskseries, userSettings):
+    renderContext = RtmApiRenderContext(userSettings)
+    return [taskseries.task.due != "" and renderContext.formatDue(taskseries.task.due, taskseries.task.has_due_time) for taskseries in aTaskseries]
+
+def renderList(aTaskseries, userSettings):
+    return u"".join(renderTasks(aTaskseries, RtmApiRenderContext(userSettings)))
+
+def best(function, aTaskseries, userSettings):
+    aTimes = []
+    for i in range(5):
+        start = time.time()
+        function(aTaskseries, userSettings)
+        aTimes.append(time.time() - start)
+    
+    return min(aTimes)
+
+def main():
+    n = 5000
+    if len(sys.argv) > 1:
+        n = int(sys.argv[1])
+    
+    rtm = FakeRtm()
+    rtm.addRandomTasks(n)
+    response = simplejson.loads(simplejson.dumps(rtm.handle({"method": "rtm.tasks.getList", "filter": "status:incomplete"})))
+    
+    aTaskseries = []
+    for list in response["rsp"]["tasks"]["list"]:
+        aTaskseries.extend(RtmApiList.createFromRaw(list).getTaskseries())
+    
+    RtmApiTimezone.setTimezones([RtmApiTimezone(u"1", u"Europe/Moscow", u"0", u"10800", u"10800")])
+    userSettings = RtmApiSettings(u"Europe/Moscow", u"0", u"1", u"1", u"en-US")
+    
+    print "%i tasks, %i with due date" % (n, len([taskseries for taskseries in aTaskseries if taskseries.task.due != ""]))
+    print "due dates, legacy      %8.1f ms" % (best(renderLegacy, aTaskseries, userSettings) * 1000)
+    print "due dates, shared      %8.1f ms" % (best(renderShared, aTaskseries, userSettings) * 1000)
+    print "whole tasks            %8.1f ms" % (best(renderList, aTaskseries, userSettings) * 1000)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,233 @@
+# coding: utf-8
+
+"""
+End-to-end scenarios run through RtmBot.processCommand() against the fake RTM and the
+in-memory stand-in for the datastore. Every scenario is run in a new world (RTM data,
+storage, caches) prepared by its setup messages; only its measured messages are counted.
+
+Per scenario: wall time (the median of the runs), RTM calls, datastore reads and writes
+and the objects allocated and not freed by the measured messages (the collector's
+allocation counter, the collection being disabled while they run). The deferred scenarios
+run with the local task queue; the RTM calls made by its jobs after the reply are counted
+separately.
+
+The results are written as JSON; given the JSON of an earlier run, the scenarios making
+more RTM calls or datastore operations or taking much longer fail the run.
+
+Usage: python bench/benchScenarios.py [--latency ms] [--runs n] [--output results.json]
+                                      [--compare baseline.json] [scenario...]
+"""
+
+import sys
+import time
+import gc
+from optparse import OptionParser
+
+from fakeRtm import FakeRtm
+from RtmBot import RtmBot, runDeferredJob
+from RtmApi import RtmApi
+from TaskQueue import LocalTaskQueue
+from RtmApiCache import RtmApiCache
+from RtmTransport import RtmFakeTransport
+from SecureStorage import SecureStorage
+from StorageBackend import TieredStorageBackend, MemoryStorageBackend
+import StorageBackend
+import TasksMirrorStorage
+import TimezonesStorage
+import simplejson
+
+USER = "user@example.com"
+
+# times slower than the baseline a scenario may be before the comparison fails it, and at least that many ms
+SLOWDOWN = 1.25
+SLOWDOWN_MS = 5
+
+class World(object):
+    """
+    The RTM account and the storage of the user, replacing the backends and the caches the bot uses
+    """
+    
+    def __init__(self, tasks, latency, deferred = False):
+        self.rtm = FakeRtm()
+        self.rtm.addRandomTasks(tasks)
+        
+        # the tasks were modified before the scenario, not within the sync overlap of the mirror
+        modified = unicode(time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - 3600)))
+        for (listId, taskseries) in self.rtm.aTasks.itervalues():
+            taskseries["modified"] = modified
+        self.transport = RtmFakeTransport(self.rtm.handle, latency)
+        self.cache = RtmApiCache()
+        
+        self.durable = MemoryStorageBackend()
+        StorageBackend._defaultBackend = TieredStorageBackend(self.durable)
+        TasksMirrorStorage.backend = TieredStorageBackend(self.durable, None, 20)
+        TimezonesStorage._cache = {"aTimezones": None, "lastUpdated": None}
+        
+        self.queue = None
+        if deferred:
+            self.queue = LocalTaskQueue(lambda aJob: runDeferredJob(self.createApi(), aJob), 0.01)
+    
+    def createApi(self):
+        api = RtmApi("key", "secret")
+        api.transport = self.transport
+        api.cache = self.cache
+        
+        return api
+    
+    def say(self, message):
+        storage = SecureStorage(USER)
+        bot = RtmBot("key", "secret", "", storage, self.queue)
+        bot.api.transport = self.transport
+        bot.api.cache = self.cache
+        
+        reply = bot.processCommand(message)
+        storage.flush()
+        bot.enqueueDeferred()
+        
+        return reply
+
+class Scenario(object):
+    def __init__(self, name, tasks, aSetup, aMessages, deferred = False):
+        """
+        @param string name
+        @param int tasks Number of the user's tasks
+        @param list aSetup Messages said before the measured ones
+        @param list aMessages Measured messages
+        @param bool deferred Whether the bot defers the calls the replies do not depend on
+        """
+        self.deferred = deferred
+        self.name = name
+        self.tasks = tasks
+        self.aSetup = aSetup
+        self.aMessages = aMessages
+    
+    def run(self, latency):
+        """
+        @return dict The measurements
+        """
+        world = World(self.tasks, latency, self.deferred)
+        for message in self.aSetup:
+            world.say(message)
+        if world.queue != None:
+            world.queue.join()
+        
+        calls = len(world.rtm.aCalls)
+        (loads, saves) = (world.durable.loads, world.durable.saves)
+        
+        gc.collect()
+        gc.disable()
+        try:
+            objects = gc.get_count()[0]
+            start = time.time()
+            
+            aReplies = [world.say(message) for message in self.aMessages]
+            
+            seconds = time.time() - start
+            objects = gc.get_count()[0] - objects
+        finally:
+            gc.enable()
+        
+        replyCalls = len(world.rtm.aCalls)
+        if world.queue != None:
+            world.queue.join()
+        
+        aMethods = {}
+        for method in world.rtm.aCalls[calls:replyCalls]:
+            aMethods[method] = aMethods.get(method, 0) + 1
+        
+        return {
+            "ms": round(seconds * 1000, 2),
+            "calls": replyCalls - calls,
+            "deferredCalls": len(world.rtm.aCalls) - replyCalls,
+            "methods": aMethods,
+            "dsReads": world.durable.loads - loads,
+            "dsWrites": world.durable.saves - saves,
+            "objects": objects,
+            "replyChars": sum([len(reply) for reply in aReplies]),
+        }
+
+AUTH = [u"hey", u"hey"]
+
+SCENARIOS = [
+    Scenario("auth", 0, [], AUTH),
+    Scenario("add with note", 10, AUTH, [u"buy milk\nthe skimmed one"]),
+    Scenario("add with note deferred", 10, AUTH, [u"buy milk\nthe skimmed one"], True),
+    Scenario("add warm deferred", 10, AUTH + [u"L"], [u"buy milk\nthe skimmed one"], True),
+    Scenario("list 10", 10, AUTH, [u"L"]),
+    Scenario("list 10 again", 10, AUTH + [u"L"], [u"L"]),
+    Scenario("list 1k", 1000, AUTH, [u"L"]),
+    Scenario("list 1k again", 1000, AUTH + [u"L"], [u"L"]),
+    Scenario("list 10k", 10000, AUTH, [u"L"]),
+    Scenario("list 10k again", 10000, AUTH + [u"L"], [u"L"]),
+    Scenario("list 1k + more", 1000, AUTH + [u"L"], [u"MORE"]),
+    Scenario("bulk complete", 100, AUTH + [u"L"], [u"C 1,2,3,4,5,6,7,8,9,10"]),
+    Scenario("tags with list move", 100, AUTH + [u"L"], [u"T 1,2,3 Work urgent"]),
+    Scenario("tags deferred", 100, AUTH + [u"L"], [u"T 1,2,3 Work urgent"], True),
+]
+
+def compare(aResults, aBaseline):
+    """
+    @return list Regressions found, one string each
+    """
+    aRegressions = []
+    for (name, result) in aResults.iteritems():
+        if name not in aBaseline:
+            continue
+        
+        baseline = aBaseline[name]
+        for counter in ("calls", "deferredCalls", "dsReads", "dsWrites"):
+            if result[counter] > baseline.get(counter, 0):
+                aRegressions.append("%s: %s %i, was %i" % (name, counter, result[counter], baseline.get(counter, 0)))
+        
+        if result["ms"] > baseline["ms"] * SLOWDOWN and result["ms"] - baseline["ms"] > SLOWDOWN_MS:
+            aRegressions.append("%s: %.1f ms, was %.1f ms" % (name, result["ms"], baseline["ms"]))
+    
+    return aRegressions
+
+def main():
+    parser = OptionParser(usage = "%prog [options] [scenario...]")
+    parser.add_option("--latency", type = "float", default = 0, help = "RTM latency in ms")
+    parser.add_option("--runs", type = "int", default = 3, help = "runs per scenario, the median time is reported")
+    parser.add_option("--output", help = "file to write the JSON results to")
+    parser.add_option("--compare", help = "JSON results of an earlier run to compare with")
+    (options, aNames) = parser.parse_args()
+    
+    aScenarios = [scenario for scenario in SCENARIOS if not aNames or scenario.name in aNames]
+    
+    print "RTM latency %i ms, %i run(s) per scenario" % (options.latency, options.runs)
+    print "%-24s %9s %6s %8s %8s %9s %9s  %s" % ("scenario", "time", "calls", "deferred", "ds reads", "ds writes", "objects", "RTM methods")
+    
+    aResults = {}
+    for scenario in aScenarios:
+        aRuns = [scenario.run(options.latency / 1000.0) for i in range(options.runs)]
+        
+        result = aRuns[-1]
+        result["ms"] = sorted([run["ms"] for run in aRuns])[len(aRuns) / 2]
+        aResults[scenario.name] = result
+        
+        print "%-24s %7.1fms %6i %8i %8i %9i %9i  %s" % (scenario.name, result["ms"], result["calls"], result["deferredCalls"], result["dsReads"],
+                                                          result["dsWrites"], result["objects"], ", ".join(["%s x%i" % item for item in sorted(result["methods"].items())]))
+    
+    if options.output:
+        f = open(options.output, "w")
+        try:
+            simplejson.dump({"python": sys.version.split()[0], "latency": options.latency, "runs": options.runs, "scenarios": aResults},
+                            f, indent = 2, sort_keys = True)
+        finally:
+            f.close()
+    
+    if options.compare:
+        f = open(options.compare)
+        try:
+            aBaseline = simplejson.load(f)["scenarios"]
+        finally:
+            f.close()
+        
+        aRegressions = compare(aResults, aBaseline)
+        for regression in aRegressions:
+            print "REGRESSION " + regression
+        if aRegressions:
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+# coding: utf-8
+
+"""
+Hit rates of the SecureStorage tiers for messages of users with skewed activity served
+by several instances, with the in-process stand-ins for memcache and the datastore.
+Every message increments a counter stored in its own record (SecureStorage keeps only
+the hot fields in the main record), so a stale read is detected; each message loads
+two records.
+
+Usage: python bench/benchStorage.py [number of messages]
+"""
+
+import sys
+import random
+
+import fakeRtm
+from SecureStorage import SecureStorage
+from StorageBackend import TieredStorageBackend, MemoryStorageBackend, MemoryMemcache
+
+def run(aBackends, durable, messages, users):
+    generator = random.Random(1)
+    aCounts = {}
+    stale = 0
+    
+    for i in xrange(messages):
+        # a few users send most of the messages
+        user = "user%i@example.com" % int(generator.paretovariate(1.2) * 10 % users)
+        backend = generator.choice(aBackends)
+        
+        storage = SecureStorage(user, backend)
+        count = 0
+        if storage.exist("count"):
+            count = storage.get("count")
+        if count != aCounts.get(user, 0):
+            stale += 1
+        storage.set("count", count + 1)
+        storage.flush()
+        
+        aCounts[user] = count + 1
+    
+    aHits = {"local": 0, "shared": 0, "durable": 0}
+    for backend in aBackends:
+        for tier in aHits:
+            aHits[tier] += backend.aHits[tier]
+    
+    return (aHits, durable.loads, stale)
+
+def main():
+    messages = 20000
+    if len(sys.argv) > 1:
+        messages = int(sys.argv[1])
+    users = 2000
+    
+    print "%i messages of %i users" % (messages, users)
+    print "%-34s %8s %8s %8s %10s %6s" % ("configuration", "local", "shared", "durable", "ds reads", "stale")
+    
+    aConfigurations = [
+        ("datastore only", 1, False, 0),
+        ("memory LRU, 1 instance", 1, False, 1000),
+        ("memory LRU + memcache, 3 instances", 3, True, 1000),
+        ("memcache only, 3 instances", 3, True, 0),
+    ]
+    for (name, instances, withShared, localSize) in aConfigurations:
+        durable = MemoryStorageBackend()
+        shared = withShared and MemoryMemcache() or None
+        aBackends = [TieredStorageBackend(durable, shared, localSize) for i in range(instances)]
+        
+        (aHits, durableLoads, stale) = run(aBackends, durable, messages, users)
+        print "%-34s %8i %8i %8i %10i %6i" % (name, aHits["local"], aHits["shared"], aHits["durable"], durableLoads, stale)
+
+if __name__ == "__main__":
+    main()
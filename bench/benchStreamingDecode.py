@@ -0,0 +1,195 @@
+# coding: utf-8
+
+"""
+Decoding of the rtm.tasks.getList response into the models: simplejson.loads() of the whole
+body and RtmApiList.createFromRaw() of the decoded tree versus the incremental parser fed
+by the chunks of the response, every list model created by RtmApiList.createFromRaw() once
+its events have arrived. The raw lists the mirror of TasksMirrorStorage is built from, the call
+the bot makes: taken from simplejson.loads() versus the lists built from the events, both merged
+into the mirror. The mirror keeps every taskseries: streaming saves only the body there, at 2.4x
+the time of loads(), so taskGetList(raw = True) decodes the whole body.
+
+Throughput is the best of 3 runs. Peak memory is the growth of the max resident set size
+of a new process decoding the response read from a file, the whole body at once or in
+chunks of RtmTransport.CHUNK_SIZE bytes like the transport returns them. The max RSS of
+the parent is inherited, so the memory is measured before the parent creates any data.
+
+Usage: python bench/benchStreamingDecode.py [number of tasks...]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import resource
+import subprocess
+
+from fakeRtm import FakeRtm
+from RtmApi import RtmApiList, RtmApiException
+from RtmTransport import RtmTransport
+import TasksMirrorStorage
+from simplejson.incremental import iterevents, iterpaths, build_value
+import simplejson
+
+def decodeWhole(body):
+    o = simplejson.loads(body)
+    aRawLists = o["rsp"]["tasks"]["list"]
+    if isinstance(aRawLists, dict):
+        aRawLists = [aRawLists]
+    
+    return [RtmApiList.createFromRaw(list) for list in aRawLists]
+
+def decodeStreamed(aChunks):
+    return [RtmApiList.createFromRaw(list) for list in listsFromEvents(iterpaths(iterevents(aChunks)))]
+
+def mirrorWhole(body):
+    aRawLists = simplejson.loads(body)["rsp"]["tasks"]["list"]
+    if isinstance(aRawLists, dict):
+        aRawLists = [aRawLists]
+    
+    aTaskseries = {}
+    TasksMirrorStorage._merge(aTaskseries, aRawLists)
+    
+    return aTaskseries
+
+def listsFromEvents(aPaths):
+    """
+    Builds the raw lists of the rtm.tasks.getList response from its events, every taskseries once its events have arrived
+    @param iterator aPaths (path, event, value) as returned by simplejson.incremental.iterpaths()
+    @return iterator The lists as RTM sends them, "taskseries" of each list always an array, every one once it has arrived
+    """
+    for (path, event, value) in aPaths:
+        if path == "rsp.tasks.list":
+            if event == "start_map":
+                aList = {}
+            elif event == "end_map":
+                yield aList
+        elif path == "rsp.tasks.list.taskseries":
+            if event == "start_map":
+                aList.setdefault("taskseries", []).append(build_value(aPaths, event, value))
+            elif event == "start_array":
+                aList.setdefault("taskseries", [])
+        elif path.startswith("rsp.tasks.list.") and event in ("value", "start_map", "start_array"):
+            aList[path[len("rsp.tasks.list."):]] = build_value(aPaths, event, value)
+        elif path == "rsp.err" and event == "start_map":
+            aError = build_value(aPaths, event, value)
+            raise RtmApiException(aError["msg"], aError["code"])
+
+def mirrorStreamed(aChunks):
+    aTaskseries = {}
+    TasksMirrorStorage._merge(aTaskseries, listsFromEvents(iterpaths(iterevents(aChunks))))
+    
+    return aTaskseries
+
+def split(body):
+    return [body[start:start + RtmTransport.CHUNK_SIZE] for start in xrange(0, len(body), RtmTransport.CHUNK_SIZE)]
+
+def readChunks(f):
+    while True:
+        chunk = f.read(RtmTransport.CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+def describe(aLists):
+    return [(list.id, [(taskseries.id, taskseries.listId, taskseries.tags, len(taskseries.notes), taskseries.task.sortKey)
+                       for taskseries in list.getTaskseries()]) for list in aLists]
+
+def best(function, *args):
+    aTimes = []
+    for i in range(3):
+        start = time.time()
+        result = function(*args)
+        aTimes.append(time.time() - start)
+    
+    return (min(aTimes), result)
+
+def createBody(n):
+    rtm = FakeRtm()
+    rtm.addRandomTasks(n)
+    
+    return simplejson.dumps(rtm.handle({"method": "rtm.tasks.getList", "filter": "status:incomplete"}))
+
+def writeBody(n, path):
+    """
+    Run in the child process, so the parent stays small
+    """
+    f = open(path, "wb")
+    try:
+        f.write(createBody(n))
+    finally:
+        f.close()
+
+def measureMemory(mode, path):
+    """
+    Run in the child process: decodes the response and prints the growth of the max RSS in KB
+    """
+    f = open(path, "rb")
+    try:
+        before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        if mode == "whole":
+            result = decodeWhole(f.read())
+        elif mode == "streamed":
+            result = decodeStreamed(readChunks(f))
+        elif mode == "mirrorWhole":
+            result = mirrorWhole(f.read())
+        else:
+            result = mirrorStreamed(readChunks(f))
+        after = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    finally:
+        f.close()
+    
+    print after - before
+
+def child(*args):
+    process = subprocess.Popen([sys.executable, __file__] + list(args), stdout = subprocess.PIPE)
+    output = process.communicate()[0]
+    
+    return output
+
+def main():
+    if sys.argv[1:2] == ["--write"]:
+        writeBody(int(sys.argv[2]), sys.argv[3])
+        return
+    if sys.argv[1:2] == ["--memory"]:
+        measureMemory(sys.argv[2], sys.argv[3])
+        return
+    
+    aSizes = [int(arg) for arg in sys.argv[1:]] or [100, 1000, 10000]
+    
+    aMemory = {}
+    for n in aSizes:
+        (handle, path) = tempfile.mkstemp(".json")
+        os.close(handle)
+        try:
+            child("--write", str(n), path)
+            aMemory[n] = [int(child("--memory", mode, path)) for mode in ("whole", "streamed", "mirrorWhole", "mirrorStreamed")]
+        finally:
+            os.remove(path)
+    
+    print "%7s %9s %12s %12s %10s %12s %12s %12s %12s" % ("tasks", "body KB", "loads ms", "streamed ms", "MB/s", "loads KB",
+                                                          "streamed KB", "mirror ms", "mirror KB")
+    for n in aSizes:
+        body = createBody(n)
+        
+        (wholeSeconds, aWhole) = best(decodeWhole, body)
+        (streamedSeconds, aStreamed) = best(decodeStreamed, split(body))
+        
+        if describe(aWhole) != describe(aStreamed):
+            print "FAILED: the streamed models differ"
+            sys.exit(1)
+        
+        (mirrorWholeSeconds, aMirrorWhole) = best(mirrorWhole, body)
+        (mirrorStreamedSeconds, aMirrorStreamed) = best(mirrorStreamed, split(body))
+        if aMirrorWhole != aMirrorStreamed:
+            print "FAILED: the streamed mirror differs"
+            sys.exit(1)
+        
+        # the loads and the streamed figures of each: ms, KB
+        (wholeKb, streamedKb, mirrorWholeKb, mirrorStreamedKb) = aMemory[n]
+        print "%7i %9i %12.1f %12.1f %10.1f %12i %12i %5.0f/%6.0f %5i/%6i" % (n, len(body) / 1024, wholeSeconds * 1000,
+            streamedSeconds * 1000, len(body) / streamedSeconds / 1024 / 1024, wholeKb, streamedKb,
+            mirrorWholeSeconds * 1000, mirrorStreamedSeconds * 1000, mirrorWholeKb, mirrorStreamedKb)
+
+if __name__ == "__main__":
+    main()
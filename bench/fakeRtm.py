@@ -0,0 +1,202 @@
+# coding: utf-8
+
+"""
+In-memory stand-in for the RTM REST API used by the benchmarks.
+Serve it with RtmTransport.RtmFakeTransport(FakeRtm().handle, latency).
+"""
+
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+class FakeRtm(object):
+    def __init__(self):
+        self.aTasks = {}
+        self.aCalls = []
+        self.__nextId = 1000000
+        self.__timelines = 0
+    
+    def addTask(self, name, listId = "1", due = u"", hasDueTime = False, tags = (), priority = u"N", rrule = None, notes = ()):
+        taskseriesId = self.__newId()
+        taskseries = {
+            "id": taskseriesId,
+            "created": u"2010-12-01T10:00:00Z",
+            "modified": _now(),
+            "name": name,
+            "source": u"api",
+            "url": u"",
+            "location_id": u"",
+            "tags": {"tag": list(tags)} if tags else [],
+            "participants": [],
+            "notes": {"note": [{"id": self.__newId(), "created": u"2010-12-01T10:00:00Z", "modified": u"2010-12-01T10:00:00Z",
+                                "title": u"", "$t": text} for text in notes]} if notes else [],
+            "task": {
+                "id": self.__newId(),
+                "due": due,
+                "has_due_time": hasDueTime and u"1" or u"0",
+                "added": u"2010-12-01T10:00:00Z",
+                "completed": u"",
+                "deleted": u"",
+                "priority": priority,
+                "postponed": u"0",
+                "estimate": u"",
+            },
+        }
+        if rrule != None:
+            taskseries["rrule"] = {"every": u"1", "$t": rrule}
+        
+        self.aTasks[taskseriesId] = (listId, taskseries)
+        
+        return taskseries
+    
+    def addRandomTasks(self, n, seed = 1):
+        """
+        Fills RTM with n tasks looking like the real ones: some have due dates, tags, notes, priorities and repeat.
+        """
+        generator = random.Random(seed)
+        
+        aWords = [u"buy", u"call", u"milk", u"report", u"mom", u"review", u"meeting", u"car", u"pay", u"bills",
+                  u"doctor", u"book", u"tickets", u"garden", u"email", u"project", u"plan", u"weekly", u"clean", u"write"]
+        aTags = [u"work", u"home", u"errands", u"phone", u"urgent", u"someday"]
+        aRrules = [u"FREQ=DAILY;INTERVAL=1", u"FREQ=WEEKLY;INTERVAL=1;BYDAY=MO", u"FREQ=MONTHLY;INTERVAL=1;BYMONTHDAY=15",
+                   u"FREQ=WEEKLY;INTERVAL=2", u"FREQ=MONTHLY;INTERVAL=1;BYDAY=1FR", u"FREQ=YEARLY;INTERVAL=1"]
+        
+        now = time.time()
+        for i in xrange(n):
+            name = u" ".join(generator.sample(aWords, generator.randint(2, 5)))
+            
+            due = u""
+            hasDueTime = False
+            if generator.random() < 0.6:
+                due = unicode(time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now + generator.randint(-30, 400) * 86400 + generator.randint(0, 86399))))
+                hasDueTime = generator.random() < 0.3
+            
+            tags = generator.sample(aTags, generator.choice((0, 0, 1, 1, 2)))
+            priority = generator.choice((u"N", u"N", u"N", u"1", u"2", u"3"))
+            
+            rrule = None
+            if generator.random() < 0.2:
+                rrule = generator.choice(aRrules)
+            
+            notes = ()
+            if generator.random() < 0.1:
+                notes = (u"note for " + name,)
+            
+            self.addTask(name, generator.choice((u"1", u"2", u"3")), due, hasDueTime, tags, priority, rrule, notes)
+    
+    def handle(self, aRequest):
+        method = aRequest["method"]
+        self.aCalls.append(method)
+        
+        handler = getattr(self, "_" + method.replace(".", "_"), None)
+        if handler == None:
+            return {"rsp": {"stat": "fail", "err": {"code": "112", "msg": "Method \"%s\" not found" % method}}}
+        
+        aResult = handler(aRequest)
+        aResult["stat"] = "ok"
+        
+        return {"rsp": aResult}
+    
+    def _rtm_auth_getFrob(self, aRequest):
+        return {"frob": u"0123456789abcdef"}
+    
+    def _rtm_auth_getToken(self, aRequest):
+        return {"auth": {"token": u"fedcba9876543210", "perms": u"delete", "user": {"id": u"1", "username": u"bench", "fullname": u"Bench"}}}
+    
+    def _rtm_timelines_create(self, aRequest):
+        self.__timelines += 1
+        return {"timeline": unicode(self.__timelines)}
+    
+    def _rtm_tasks_getList(self, aRequest):
+        # only 'status:incomplete' of the filters is supported
+        incompleteOnly = "status:incomplete" in aRequest.get("filter", "")
+        lastSync = aRequest.get("last_sync")
+        
+        aLists = {}
+        aDeleted = {}
+        for (listId, taskseries) in self.aTasks.itervalues():
+            if lastSync != None and taskseries["modified"] <= lastSync:
+                continue
+            
+            if taskseries["task"]["deleted"] != u"":
+                if lastSync != None:
+                    aDeleted.setdefault(listId, []).append({"id": taskseries["id"], "task": {"id": taskseries["task"]["id"], "deleted": taskseries["task"]["deleted"]}})
+            elif taskseries["task"]["completed"] == u"" or not incompleteOnly:
+                aLists.setdefault(listId, []).append(taskseries)
+        
+        aResult = []
+        for listId in set(aLists.keys() + aDeleted.keys()):
+            list = {"id": listId}
+            if listId in aLists:
+                list["taskseries"] = aLists[listId]
+            if listId in aDeleted:
+                list["deleted"] = {"taskseries": aDeleted[listId]}
+            if lastSync != None:
+                list["current"] = lastSync
+            aResult.append(list)
+        
+        return {"tasks": {"list": aResult}}
+    
+    def _rtm_tasks_add(self, aRequest):
+        listId = aRequest.get("list_id", "1")
+        return {"list": {"id": listId, "taskseries": self.addTask(aRequest["name"].decode("utf-8"), listId)}}
+    
+    def _rtm_tasks_notes_add(self, aRequest):
+        return {"note": {"id": self.__newId(), "created": u"2010-12-01T10:00:00Z", "modified": u"2010-12-01T10:00:00Z",
+                         "title": aRequest["note_title"].decode("utf-8"), "$t": aRequest["note_text"].decode("utf-8")}}
+    
+    def _rtm_tasks_complete(self, aRequest):
+        return self.__updateTask(aRequest, "completed", u"2010-12-02T10:00:00Z")
+    
+    def _rtm_tasks_delete(self, aRequest):
+        return self.__updateTask(aRequest, "deleted", u"2010-12-02T10:00:00Z")
+    
+    def _rtm_tasks_postpone(self, aRequest):
+        return self.__updateTask(aRequest, "postponed", u"1")
+    
+    def _rtm_tasks_addTags(self, aRequest):
+        return self.__updateTask(aRequest)
+    
+    def _rtm_tasks_removeTags(self, aRequest):
+        return self.__updateTask(aRequest)
+    
+    def _rtm_tasks_moveTo(self, aRequest):
+        (listId, taskseries) = self.aTasks[aRequest["taskseries_id"]]
+        taskseries["modified"] = _now()
+        self.aTasks[taskseries["id"]] = (aRequest["to_list_id"], taskseries)
+        return {"list": {"id": aRequest["to_list_id"], "taskseries": taskseries}}
+    
+    def _rtm_lists_getList(self, aRequest):
+        return {"lists": {"list": [
+            {"id": u"1", "name": u"Inbox", "deleted": u"0", "locked": u"1", "archived": u"0", "position": u"-1", "smart": u"0", "sort_order": u"0"},
+            {"id": u"2", "name": u"Work", "deleted": u"0", "locked": u"0", "archived": u"0", "position": u"0", "smart": u"0", "sort_order": u"0"},
+            {"id": u"3", "name": u"Personal", "deleted": u"0", "locked": u"0", "archived": u"0", "position": u"0", "smart": u"0", "sort_order": u"0"},
+        ]}}
+    
+    def _rtm_settings_getList(self, aRequest):
+        return {"settings": {"timezone": u"Europe/Moscow", "dateformat": u"0", "timeformat": u"1", "defaultlist": u"1", "language": u"en-US"}}
+    
+    def _rtm_timezones_getList(self, aRequest):
+        return {"timezones": {"timezone": [
+            {"id": u"1", "name": u"Europe/London", "dst": u"0", "offset": u"0", "current_offset": u"0"},
+            {"id": u"2", "name": u"Europe/Moscow", "dst": u"0", "offset": u"10800", "current_offset": u"10800"},
+            {"id": u"3", "name": u"America/New_York", "dst": u"0", "offset": u"-18000", "current_offset": u"-18000"},
+        ]}}
+    
+    def __updateTask(self, aRequest, field = None, value = None):
+        (listId, taskseries) = self.aTasks[aRequest["taskseries_id"]]
+        taskseries["modified"] = _now()
+        if field != None:
+            taskseries["task"][field] = value
+        
+        return {"list": {"id": listId, "taskseries": taskseries}}
+    
+    def __newId(self):
+        self.__nextId += 1
+        return unicode(self.__nextId)
+
+def _now():
+    return unicode(time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()))
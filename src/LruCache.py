@@ -0,0 +1,51 @@
+# coding: utf-8
+
+from simplejson import OrderedDict
+
+class LruCache(object):
+    """
+    Dictionary keeping at most maxSize items: the least recently used ones are evicted first.
+    """
+    
+    def __init__(self, maxSize):
+        self.maxSize = maxSize
+        self.__aItems = OrderedDict()
+        
+        # instrumentation
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, key, default = None):
+        aItems = self.__aItems
+        if key in aItems:
+            # move the item to the end as the most recently used one
+            value = aItems.pop(key)
+            aItems[key] = value
+            
+            self.hits += 1
+            return value
+        else:
+            self.misses += 1
+            return default
+    
+    def set(self, key, value):
+        aItems = self.__aItems
+        if key in aItems:
+            del aItems[key]
+        elif len(aItems) >= self.maxSize:
+            aItems.popitem(last = False)
+        
+        aItems[key] = value
+    
+    def delete(self, key):
+        if key in self.__aItems:
+            del self.__aItems[key]
+    
+    def clear(self):
+        self.__aItems.clear()
+    
+    def __contains__(self, key):
+        return key in self.__aItems
+    
+    def __len__(self):
+        return len(self.__aItems)
@@ -1,13 +1,18 @@
 # coding: utf-8
 
-import urllib
 from hashlib import md5
 import re
 import time
 import simplejson
-from google.appengine.api import urlfetch
+from RtmTransport import getDefaultTransport
+from RtmApiCache import getDefaultCache
+from LruCache import LruCache
+import Tracing
+import urllib
 import random
 import calendar
+import heapq
+from itertools import chain
 
 class RtmApiException(Exception):
     pass
@@ -17,10 +22,18 @@ class RtmApi(object):
     REST_URL = "http://api.rememberthemilk.com/services/rest/"
     TIMEOUT = 30
     
+    # max number of requests executeConcurrently() makes at the same time
+    CONCURRENCY_LIMIT = 5
+    
+    # number of seconds the responses of idempotent methods are cached for
+    CACHE_TTL = {"rtm.lists.getList": 600, "rtm.settings.getList": 3600, "rtm.tasks.getList": 60}
+    
     PERMS_READ = "read"
     PERMS_WRITE = "write"
     PERMS_DELETE = "delete"
     
+    ERROR_TIMELINE_INVALID = "300"
+    
     __aNeedAuth = ("rtm.timelines.create", "rtm.tasks.add", "rtm.tasks.delete", "rtm.tasks.notes.add", "rtm.tasks.getList",
                                 "rtm.lists.getList", "rtm.tasks.complete", "rtm.tasks.delete", "rtm.tasks.postpone", "rtm.tasks.addTags",
                                 "rtm.tasks.removeTags", "rtm.tasks.moveTo", "rtm.settings.getList")
@@ -33,6 +46,18 @@ class RtmApi(object):
         self.__secret = secret
         self.__authToken = None
         self.__timeline = None
+        self.__timelineRestored = False
+        
+        # RtmTransport making HTTP requests, None for the default one
+        self.transport = None
+        
+        # RtmApiCache for the responses of methods listed in CACHE_TTL, None to disable caching
+        self.cache = getDefaultCache()
+        
+        self.__aBatch = None
+        
+        # called with the timeline ID every time a new timeline is created
+        self.onTimelineCreated = None
         
         # for local debug set it to True
         self.localDebug = False
@@ -92,6 +117,22 @@ class RtmApi(object):
         o = self.__request("rtm.timelines.create")
         
         self.__timeline = o["rsp"]["timeline"]
+        self.__timelineRestored = False
+        
+        if self.onTimelineCreated != None:
+            self.onTimelineCreated(self.__timeline)
+    
+    def setTimeline(self, timeline):
+        """
+        Use the previously created timeline instead of creating a new one.
+        When no timeline is set, it is created on the first call that needs it.
+        @param string timeline
+        """
+        self.__timeline = timeline
+        self.__timelineRestored = True
+    
+    def getTimeline(self):
+        return self.__timeline
     
     def taskAdd(self, name, parse = False, listId = None):
         """
@@ -125,10 +166,9 @@ class RtmApi(object):
 
         aRequest = {"note_title": title, "note_text": text, "list_id": listId, "taskseries_id": taskseriesId, "task_id": taskId}
         
-        o = self.__request("rtm.tasks.notes.add", aRequest)
-        return o["rsp"]["note"]
+        return self.__call("rtm.tasks.notes.add", aRequest, _noteFromResponse)
     
-    def taskGetList(self, listId = None, filter = None, lastSync = None):
+    def taskGetList(self, listId = None, filter = None, lastSync = None, raw = False):
         """
         @link http://www.rememberthemilk.com/services/api/methods/rtm.tasks.getList.rtm
         
@@ -136,6 +176,7 @@ class RtmApi(object):
         @param string $filter If specified, only tasks matching the desired criteria are returned. See http://www.rememberthemilk.com/help/answers/search/advanced.rtm
         @param string $lastSync An ISO 8601 formatted time value. If last_sync is provided, only tasks modified since last_sync will be returned, 
                                 and each element will have an attribute, current, equal to last_sync.
+        @param bool raw Return the lists as RTM sends them, only "taskseries" of each list is always an array
         @return RtmApiList[]
         """
         
@@ -149,6 +190,20 @@ class RtmApi(object):
         if lastSync != None:
             aRequest["last_sync"] = lastSync
         
+        if raw:
+            # the lists feed the mirrors of TasksMirrorStorage, which are stored themselves: not cached
+            o = self.__request("rtm.tasks.getList", aRequest, useCache = False)
+            
+            aList = o["rsp"]["tasks"].get("list", [])
+            if not is_array(aList):
+                aList = [aList]
+            
+            for list in aList:
+                if "taskseries" in list and not is_array(list["taskseries"]):
+                    list["taskseries"] = [list["taskseries"]]
+            
+            return aList
+        
         o = self.__request("rtm.tasks.getList", aRequest)
         
         aList = []
@@ -171,8 +226,7 @@ class RtmApi(object):
                 
         aRequest = {"list_id": listId, "taskseries_id": taskseriesId, "task_id": taskId}
         
-        o = self.__request("rtm.tasks.complete", aRequest)
-        return RtmApiList.createFromRaw(o["rsp"]["list"])
+        return self.__call("rtm.tasks.complete", aRequest, _listFromResponse)
     
     def taskDelete(self, listId, taskseriesId, taskId):
         """
@@ -184,8 +238,7 @@ class RtmApi(object):
         """
         aRequest = {"list_id": listId, "taskseries_id": taskseriesId, "task_id": taskId}
         
-        o = self.__request("rtm.tasks.delete", aRequest)
-        return RtmApiList.createFromRaw(o["rsp"]["list"])
+        return self.__call("rtm.tasks.delete", aRequest, _listFromResponse)
     
     def taskPostpone(self, listId, taskseriesId, taskId):
         """
@@ -198,8 +251,7 @@ class RtmApi(object):
         
         aRequest = {"list_id": listId, "taskseries_id": taskseriesId, "task_id": taskId}
         
-        o = self.__request("rtm.tasks.postpone", aRequest)
-        return RtmApiList.createFromRaw(o["rsp"]["list"])
+        return self.__call("rtm.tasks.postpone", aRequest, _listFromResponse)
     
     def taskAddTags(self, listId, taskseriesId, taskId, tags):
         """
@@ -213,8 +265,7 @@ class RtmApi(object):
         
         aRequest = {"list_id": listId, "taskseries_id": taskseriesId, "task_id": taskId, "tags": tags}
         
-        o = self.__request("rtm.tasks.addTags", aRequest)
-        return RtmApiList.createFromRaw(o["rsp"]["list"])
+        return self.__call("rtm.tasks.addTags", aRequest, _listFromResponse)
     
     def taskRemoveTags(self, listId, taskseriesId, taskId, tags):
         """
@@ -228,8 +279,7 @@ class RtmApi(object):
         
         aRequest = {"list_id": listId, "taskseries_id": taskseriesId, "task_id": taskId, "tags": tags}
         
-        o = self.__request("rtm.tasks.removeTags", aRequest)
-        return RtmApiList.createFromRaw(o["rsp"]["list"])
+        return self.__call("rtm.tasks.removeTags", aRequest, _listFromResponse)
     
     def taskMoveTo(self, fromListId, taskseriesId, taskId, toListId):
         """
@@ -243,8 +293,7 @@ class RtmApi(object):
         
         aRequest = {"from_list_id": fromListId, "taskseries_id": taskseriesId, "task_id": taskId, "to_list_id": toListId}
         
-        o = self.__request("rtm.tasks.moveTo", aRequest)
-        return RtmApiList.createFromRaw(o["rsp"]["list"])
+        return self.__call("rtm.tasks.moveTo", aRequest, _listFromResponse)
     
     def listGetList(self):
         """
@@ -282,19 +331,136 @@ class RtmApi(object):
         
         return aList
     
-    def settingsGetList(self):
+    def settingsGetList(self, cachedOnly = False):
         """
         @link http://www.rememberthemilk.com/services/api/methods/rtm.settings.getList.rtm
-        @return RtmApiSettings
+        @param bool cachedOnly Return None instead of requesting RTM if the settings are not cached
+        @return RtmApiSettings|None
         """
-        o = self.__request("rtm.settings.getList")
+        o = self.__request("rtm.settings.getList", cachedOnly = cachedOnly)
+        if o == None:
+            return None
+        
         return RtmApiSettings.createFromRaw(o["rsp"]["settings"])
     
-    def __request(self, method, aRequest = None):
+    def __request(self, method, aRequest = None, cachedOnly = False, useCache = True):
+        """
+        @param bool useCache False to neither take the response from the cache nor put it there
+        """
         
         if aRequest == None:
             aRequest = {}
         
+        if method in RtmApi.__aNeedTimeline:
+            if self.__timeline == None:
+                # the timeline is created lazily, only when a method really needs it
+                self.beginTimeline()
+            elif self.__timelineRestored:
+                # the timeline kept from the previous messages may have expired already
+                self.__timelineRestored = False
+                try:
+                    return self.__request(method, dict(aRequest))
+                except RtmApiException, e:
+                    if e.args[1:2] != (RtmApi.ERROR_TIMELINE_INVALID,):
+                        raise
+                    
+                    self.beginTimeline()
+        
+        span = Tracing.span("rtm.request", method = method)
+        try:
+            cached = useCache and self.cache != None and method in RtmApi.CACHE_TTL
+            if cached:
+                result = self.cache.get(method, aRequest, self.__authToken)
+                if result != None:
+                    span.set("cache", "hit")
+                    return result
+            
+            if cachedOnly:
+                span.set("cache", "miss")
+                return None
+            
+            # make HTTP call
+            jsonResult = self.__getTransport().fetch(RtmApi.REST_URL, self.__prepareRequest(method, dict(aRequest), span))
+            
+            result = self.__decodeResponse(jsonResult, span)
+            
+            if cached:
+                self.cache.set(method, aRequest, self.__authToken, result, RtmApi.CACHE_TTL[method])
+            
+            return result
+        except:
+            Tracing.setError(span)
+            raise
+        finally:
+            span.finish()
+    
+    def executeConcurrently(self, aCalls, limit = None):
+        """
+        Makes independent API calls concurrently.
+        Only the methods making a single request can be called this way: taskComplete, taskDelete, taskPostpone,
+        taskAddTags, taskRemoveTags, taskMoveTo and taskNoteAdd.
+        
+        @param list aCalls [(method, args), ...], e.g. [(api.taskComplete, (listId, taskseriesId, taskId)), ...]
+        @param int|None limit Max number of requests made at the same time, CONCURRENCY_LIMIT by default
+        @return RtmApiCall[] in the order of aCalls
+        """
+        
+        if limit == None:
+            limit = RtmApi.CONCURRENCY_LIMIT
+        
+        # collect the requests instead of making them
+        self.__aBatch = []
+        try:
+            for (method, args) in aCalls:
+                method(*args)
+            aBatch = self.__aBatch
+        finally:
+            self.__aBatch = None
+        
+        if len(aBatch) != len(aCalls):
+            raise RtmApiException("Only the methods making a single request can be called concurrently")
+        
+        aQueue = aBatch
+        if self.__timelineRestored and len(aQueue) > 0:
+            # make the first call alone to check if the timeline is still valid
+            aQueue[0].execute(self.__request)
+            aQueue = aQueue[1:]
+        
+        transport = self.__getTransport()
+        for start in range(0, len(aQueue), limit):
+            aPending = []
+            for call in aQueue[start:start + limit]:
+                if call.method in RtmApi.__aNeedTimeline and self.__timeline == None:
+                    self.beginTimeline()
+                
+                span = Tracing.span("rtm.request", method = call.method, concurrent = True)
+                aPending.append((call, span, transport.fetchAsync(RtmApi.REST_URL, self.__prepareRequest(call.method, dict(call.aRequest), span))))
+            
+            for (call, span, response) in aPending:
+                call.execute(lambda method, aRequest: self.__awaitResponse(response, span))
+        
+        return aBatch
+    
+    def __call(self, method, aRequest, parse):
+        """
+        Makes the request and parses the response, or only remembers the call if executeConcurrently() collects them
+        """
+        
+        call = RtmApiCall(method, aRequest, parse)
+        
+        if self.__aBatch != None:
+            self.__aBatch.append(call)
+            return call
+        
+        return parse(self.__request(method, aRequest))
+    
+    def __getTransport(self):
+        if self.transport != None:
+            return self.transport
+        else:
+            return getDefaultTransport(RtmApi.TIMEOUT)
+    
+    def __prepareRequest(self, method, aRequest, span):
         # add common request parameters
         
         aRequest["api_key"] = self.__apiKey
@@ -310,6 +476,10 @@ class RtmApi(object):
         if self.__timeline != None and method in RtmApi.__aNeedTimeline:
             aRequest["timeline"] = self.__timeline
         
+        # the change makes the cached lists of tasks outdated
+        if self.cache != None and method in RtmApi.__aNeedTimeline:
+            self.cache.invalidate("rtm.tasks.getList", self.__authToken)
+        
         # convert request to utf-8
         aRequestUtf8 = {}
         for name in aRequest:
@@ -325,19 +495,36 @@ class RtmApi(object):
         # sign the request
         aRequest = self.__signRequest(aRequest)
         
-        # make HTTP call
-
-        if self.localDebug:
-            url = RtmApi.REST_URL
-            if len(aRequest) > 0:
-                url = url + '?' + urllib.urlencode(aRequest)
-            jsonResult = urllib.urlopen(url).read()
-        else:
-            jsonResult = urlfetch.fetch(url = RtmApi.REST_URL, payload = urllib.urlencode(aRequest), method = urlfetch.POST,
-                                        headers = {'Content-Type': 'application/x-www-form-urlencoded'}, deadline = RtmApi.TIMEOUT).content
+        if span.sampled:
+            span.set("bytesOut", len(urllib.urlencode(aRequest)))
+        
+        return aRequest
+    
+    def __awaitResponse(self, response, span):
+        """
+        @param RtmTransportResult response The response of the request started by executeConcurrently()
+        """
+        try:
+            return self.__decodeResponse(response.getResult(), span)
+        except:
+            Tracing.setError(span)
+            raise
+        finally:
+            span.finish()
+    
+    def __decodeResponse(self, jsonResult, span):
+        """
+        Decodes the response, the caller finishes the span
+        """
+        httpTime = span.elapsed()
         
         # decode JSON
-        result = simplejson.loads(jsonResult)
+        result = simplejson.loads(jsonResult, intern = _internTable)
+        
+        if span.sampled:
+            span.set("httpMs", round(httpTime * 1000, 1))
+            span.set("decodeMs", round((span.elapsed() - httpTime) * 1000, 1))
+            span.set("bytesIn", len(jsonResult))
         
         # analyze for errors
         if "rsp" in result and "stat" in result["rsp"] and result["rsp"]["stat"] == "fail":
@@ -362,52 +549,122 @@ class RtmApi(object):
         
         return aRequest
 
-class RtmApiObject:
+class RtmApiCall(object):
+    """
+    API call made by RtmApi.executeConcurrently()
+    """
+    
+    def __init__(self, method, aRequest, parse):
+        self.method = method
+        self.aRequest = aRequest
+        self.__parse = parse
+        self.__result = None
+        self.__error = None
+    
+    def execute(self, request):
+        try:
+            self.__result = self.__parse(request(self.method, dict(self.aRequest)))
+        except Exception, e:
+            self.__error = e
+    
+    def getResult(self):
+        """
+        @return The result of the API method. Raises the error the call has failed with.
+        """
+        if self.__error != None:
+            raise self.__error
+        
+        return self.__result
+
+def _listFromResponse(o):
+    return RtmApiList.createFromRaw(o["rsp"]["list"])
+
+def _noteFromResponse(o):
+    return o["rsp"]["note"]
+
+class RtmApiObject(object):
+    # models are created by thousands for the long lists of tasks: no per-instance __dict__
+    __slots__ = ()
+    
     def __repr__(self):
         return self.toString()
 
 class RtmApiTaskseria(RtmApiObject):
+    __slots__ = ("id", "created", "modified", "name", "source", "url", "location_id", "listId", "rrule", "tags",
+                 "participants", "notes", "task")
+    
     @classmethod
     def createFromRaw(cls, data, listId = None):
-        taskSeria = RtmApiTaskseria()
-        taskSeria.id = data["id"]
-        taskSeria.created = data["created"]
-        taskSeria.modified = data["modified"]
-        taskSeria.name = data["name"]
-        taskSeria.source = data["source"]
-        taskSeria.url = data["url"]
-        taskSeria.location_id = data["location_id"]
-        
-        taskSeria.listId = listId
-        
         if "rrule" in data:
-            taskSeria.rrule = RtmApiRrule.createFromRaw(data["rrule"])
+            rrule = RtmApiRrule.createFromRaw(data["rrule"])
         else:
-            taskSeria.rrule = None
+            rrule = None
         
         if "tag" in data["tags"]:
             if not is_array(data["tags"]["tag"]):
-                taskSeria.tags = [data["tags"]["tag"]]
+                aTags = [data["tags"]["tag"]]
             else:
-                taskSeria.tags = data["tags"]["tag"]
+                aTags = data["tags"]["tag"]
         else:
-            taskSeria.tags = []
-        
-        taskSeria.participants = data["participants"]
+            aTags = []
         
-        taskSeria.notes = []
+        aNotes = []
         if "note" in data["notes"]:
             if not is_array(data["notes"]["note"]):
                 data["notes"]["note"] = [data["notes"]["note"]]
             
             for aNote in data["notes"]["note"]:
-                taskSeria.notes.append(RtmApiNote.createFromRaw(aNote))
+                aNotes.append(RtmApiNote.createFromRaw(aNote))
         
-        taskSeria.task = RtmApiTask.createFromRaw(data["task"])
+        return RtmApiTaskseria.create(data, listId, rrule, aTags, aNotes)
+    
+    @classmethod
+    def create(cls, data, listId, rrule, aTags, aNotes):
+        """
+        @param dict data The plain fields of the taskseries and its raw task
+        @param string|None listId
+        @param RtmApiRrule|None rrule
+        @param list aTags
+        @param RtmApiNote[] aNotes
+        @return RtmApiTaskseria
+        """
+        taskSeria = RtmApiTaskseria()
+        taskSeria.id = data["id"]
+        taskSeria.created = data["created"]
+        taskSeria.modified = data["modified"]
+        taskSeria.name = data["name"]
+        taskSeria.source = data["source"]
+        taskSeria.url = data["url"]
+        taskSeria.location_id = data["location_id"]
+        
+        taskSeria.listId = listId
+        taskSeria.rrule = rrule
+        taskSeria.tags = aTags
+        taskSeria.participants = data["participants"]
+        taskSeria.notes = aNotes
+        
+        taskSeria.task = RtmApiTask.createFromRaw(data["task"], taskSeria.name)
         
         return taskSeria
     
-    def toString(self, userSettings = None):
+    def toRaw(self):
+        """
+        @return dict The taskseries as RTM sends it, createFromRaw() creates it back
+        """
+        data = {"id": self.id, "created": self.created, "modified": self.modified, "name": self.name, "source": self.source,
+                "url": self.url, "location_id": self.location_id, "participants": self.participants, "tags": {"tag": self.tags},
+                "notes": {"note": [note.toRaw() for note in self.notes]}, "task": self.task.toRaw()}
+        if self.rrule != None:
+            data["rrule"] = self.rrule.toRaw()
+        
+        return data
+    
+    def toString(self, userSettings = None, renderContext = None):
+        """
+        @param RtmApiSettings userSettings Due dates are shown in the user's timezone if given, in GMT otherwise
+        @param RtmApiRenderContext renderContext Context shared by the tasks rendered together, created for the task if not given
+        @return string
+        """
         aResult = []
         
         if (self.task.completed != ""):
@@ -426,43 +683,16 @@ class RtmApiTaskseria(RtmApiObject):
                 aResult.append(u"#" + tag)
         
         if self.task.due != "":
-            dueTime = time.strptime(self.task.due, u"%Y-%m-%dT%H:%M:%SZ")
-            
-            timestamp = calendar.timegm(dueTime)
-            diff = timestamp - time.mktime(time.gmtime())
-            
-            inUserTimezone = userSettings != None
-            
-            # convert datetime to user's timezone
-            if inUserTimezone:
-                dueTime = time.gmtime(userSettings.getTimezone().gmtToUser(timestamp))
-            
-            weekDays = (u"Sunday", u"Monday", u"Tuesday", u"Wednsday", u"Thursday", u"Friday", u"Saturday")
-            months = (u"January", u"Febuary", u"March", u"April", u"May", u"June", u"July", u"August", u"September", u"October", u"November", u"December")
+            if renderContext == None:
+                renderContext = RtmApiRenderContext(userSettings)
             
-            theDate = time.strftime(u"%Y-%m-%d", dueTime)
-            if theDate == time.strftime(u"%Y-%m-%d"):
-                theDate = u"today"
-            elif diff > 0 and diff < 24*3600*7:
-                theDate = weekDays[int(time.strftime("%w", dueTime))]
-            elif time.strftime("%Y", dueTime) == time.strftime("%Y"):
-                theDate = months[int(time.strftime("%m", dueTime))] + u" " + time.strftime(u"%d", dueTime)
-            
-            if inUserTimezone:
-                theTime = time.strftime(u"%H:%M", dueTime)
-            else:
-                theTime = time.strftime(u"%H:%M GMT", dueTime)
-            
-            if self.task.has_due_time:
-                aResult.append(u"^" + theDate + " " + theTime)
-            else:
-                aResult.append(u"^" + theDate)
+            aResult.append(u"^" + renderContext.formatDue(self.task.due, self.task.has_due_time))
         
         if self.task.estimate != "":
             aResult.append(u"=" + self.task.estimate)
         
         if self.rrule != None:
-            aResult.append(u"*" + str(self.rrule))
+            aResult.append(u"*" + self.rrule.toString())
         
         if (self.task.priority != "N"):
             aResult.append(u"!" + self.task.priority)
@@ -476,10 +706,119 @@ class RtmApiTaskseria(RtmApiObject):
     
     def getFullTaskId(self):
         return u"#" + self.listId + u"-" + self.id + u"-" + self.task.id
+
+class RtmApiRenderContext(object):
+    """
+    Everything the tasks rendered together share: the user's timezone, the current time and
+    the boundaries of today, the next week and the current year in the user's timezone.
+    Create one context per reply and pass it to renderTasks().
+    """
+    
+    # indexed by struct_time.tm_wday and tm_mon - 1
+    WEEKDAYS = (u"Monday", u"Tuesday", u"Wednesday", u"Thursday", u"Friday", u"Saturday", u"Sunday")
+    MONTHS = (u"January", u"February", u"March", u"April", u"May", u"June", u"July", u"August", u"September", u"October", u"November", u"December")
     
+    def __init__(self, userSettings = None, now = None):
+        """
+        @param RtmApiSettings userSettings Dates are formatted in GMT if not given
+        @param int now GMT timestamp, the current time by default
+        """
+        if now == None:
+            now = time.time()
+        self.now = int(now)
+        
+        if userSettings != None:
+            self.timezone = userSettings.getTimezone()
+            self.offset = int(self.timezone.offset)
+            self.timeSuffix = u""
+        else:
+            self.timezone = None
+            self.offset = 0
+            self.timeSuffix = u" GMT"
+        
+        # the boundaries as GMT timestamps
+        userNow = self.now + self.offset
+        self.todayStart = userNow - userNow % 86400 - self.offset
+        self.todayEnd = self.todayStart + 86400
+        self.weekEnd = self.now + 7 * 86400
+        self.year = time.gmtime(userNow).tm_year
+        
+        # 'YYYY-MM-DD' -> GMT timestamp of the start of the day
+        self.__aDayStarts = {}
+    
+    def formatDue(self, due, hasDueTime):
+        """
+        @param string due Due date as returned by RTM: 'YYYY-MM-DDTHH:MM:SSZ'
+        @param bool hasDueTime
+        @return string 'today', weekday name for the next week, 'Month DD' for this year, 'YYYY-MM-DD' otherwise, followed by the time if set
+        """
+        # the start of the day is computed once for all the tasks due that day
+        dayStart = self.__aDayStarts.get(due[:10])
+        if dayStart == None:
+            aMatches = _rIsoTime.match(due)
+            if aMatches == None:
+                return due
+            
+            dayStart = calendar.timegm((int(aMatches.group(1)), int(aMatches.group(2)), int(aMatches.group(3)), 0, 0, 0))
+            self.__aDayStarts[due[:10]] = dayStart
+        
+        timestamp = dayStart + int(due[11:13]) * 3600 + int(due[14:16]) * 60 + int(due[17:19])
+        
+        # the date in the user's timezone
+        dueTime = time.gmtime(timestamp + self.offset)
+        
+        if self.todayStart <= timestamp < self.todayEnd:
+            theDate = u"today"
+        elif self.now < timestamp < self.weekEnd:
+            theDate = RtmApiRenderContext.WEEKDAYS[dueTime.tm_wday]
+        elif dueTime.tm_year == self.year:
+            theDate = u"%s %02i" % (RtmApiRenderContext.MONTHS[dueTime.tm_mon - 1], dueTime.tm_mday)
+        else:
+            theDate = u"%04i-%02i-%02i" % (dueTime.tm_year, dueTime.tm_mon, dueTime.tm_mday)
+        
+        if hasDueTime:
+            return u"%s %02i:%02i%s" % (theDate, dueTime.tm_hour, dueTime.tm_min, self.timeSuffix)
+        else:
+            return theDate
+
+def renderTasks(aTaskseries, renderContext):
+    """
+    Renders the tasks one by one as they are iterated
+    @param iterable aTaskseries RtmApiTaskseria
+    @param RtmApiRenderContext renderContext
+    @return iterator string
+    """
+    for taskseries in aTaskseries:
+        yield taskseries.toString(renderContext = renderContext)
+
+def firstTasks(aLists, count):
+    """
+    Selects the first tasks of the lists in the order of RtmApiTask.sortKey without sorting all of them
+    @param RtmApiList[] aLists
+    @param int count
+    @return RtmApiTaskseria[] Sorted, count at most
+    """
+    return heapq.nsmallest(count, chain(*[list.getTaskseries() for list in aLists]), key = _taskseriesSortKey)
+
+def _taskseriesSortKey(taskseries):
+    return taskseries.task.sortKey
+
+_rIsoTime = re.compile(ur"(\d{4})-(\d\d)-(\d\d)T(\d\d):(\d\d):(\d\d)Z$")
+
 class RtmApiTask(RtmApiObject):
+    # sortKey: the LIST order, (due date, has due time, priority, name of the taskseries, ID) computed once
+    __slots__ = ("id", "due", "has_due_time", "added", "completed", "deleted", "priority", "postponed", "estimate", "sortKey")
+    
+    # due date in the sort key of the task without due date: after all the others
+    NO_DUE = u"~"
+    
     @classmethod
-    def createFromRaw(cls, data):
+    def createFromRaw(cls, data, name = u""):
+        """
+        @param dict data
+        @param string name Name of the taskseries, used in the sort key
+        @return RtmApiTask
+        """
         task = RtmApiTask()
         task.id = data["id"]
         task.due = data["due"]
@@ -491,9 +830,19 @@ class RtmApiTask(RtmApiObject):
         task.postponed = data["postponed"]
         task.estimate = data["estimate"]
         
+        # due dates in GMT 'YYYY-MM-DDTHH:MM:SSZ' sort in time order without parsing, priorities 1, 2, 3 sort before N
+        task.sortKey = (task.due or RtmApiTask.NO_DUE, task.has_due_time, task.priority, name, task.id)
+        
         return task
+    
+    def toRaw(self):
+        return {"id": self.id, "due": self.due, "has_due_time": self.has_due_time and u"1" or u"0", "added": self.added,
+                "completed": self.completed, "deleted": self.deleted, "priority": self.priority, "postponed": self.postponed,
+                "estimate": self.estimate}
 
 class RtmApiNote(RtmApiObject):
+    __slots__ = ("id", "created", "modified", "title", "text")
+    
     @classmethod
     def createFromRaw(cls, data):
         note = RtmApiNote()
@@ -505,6 +854,9 @@ class RtmApiNote(RtmApiObject):
         
         return note
     
+    def toRaw(self):
+        return {"id": self.id, "created": self.created, "modified": self.modified, "title": self.title, "$t": self.text}
+    
     def toString(self):
         if self.title != "":
             return self.title + u"\n" + self.text
@@ -512,74 +864,162 @@ class RtmApiNote(RtmApiObject):
             return self.text
 
 class RtmApiRrule(RtmApiObject):
+    __slots__ = ("every", "rule", "parsed")
+    
+    FREQUENCIES = {u"DAILY": u"day", u"WEEKLY": u"week", u"MONTHLY": u"month", u"YEARLY": u"year"}
+    WEEKDAYS = {u"MO": u"Monday", u"TU": u"Tuesday", u"WE": u"Wednesday", u"TH": u"Thursday", u"FR": u"Friday", u"SA": u"Saturday", u"SU": u"Sunday"}
+    
     @classmethod
     def createFromRaw(cls, data):
         rrule = RtmApiRrule()
-        rrule.every = data["every"]
+        # RTM sends '1' for 'every' and '0' for 'after'
+        rrule.every = unicode(data["every"]) == u"1"
         rrule.rule = data["$t"]
+        rrule.parsed = RtmApiRrule.parse(rrule.rule)
         
         return rrule
     
-    def toString(self):
-        ruleParts = {
-            "FREQ" : "",
-            "INTERVAL" : "",
-            "BYDAY" : "",
-            "BYMONTHDAY" : ""
-        }
-        
-        aRulePars = self.rule.split(u";")
-        for pair in aRulePars:
-            parts = pair.split(u"=")
-            ruleParts[parts[0]] = parts[1]
-        
-        # make 'monthly' 'month' and 'daily': 'day'
-        pluralToSingular = ((u"monthly", u"month"), (u"daily", u"day"), (u"yearly", u"year"), (u"weekly", u"week"))
-        ruleParts["FREQ"] = ruleParts["FREQ"].lower()
-        for plural, singular in pluralToSingular:
-            ruleParts["FREQ"] = re.sub(plural, singular, ruleParts["FREQ"])
+    def toRaw(self):
+        return {"every": self.every and u"1" or u"0", "$t": self.rule}
+    
+    @classmethod
+    def parse(cls, rule):
+        """
+        Parses the iCalendar RRULE the way RTM uses it. The result is shared by all the tasks with the same rule.
+        @param string rule 'FREQ=WEEKLY;INTERVAL=1;BYDAY=MO,WE'
+        @return tuple|None (frequency, interval, ((position|None, weekday), ...), (month day, ...)), positions and month
+                           days are negative when counted from the end of the month, None if a part is malformed
+        """
+        parsed = _aParsedRrules.get(rule)
+        if parsed != None:
+            return parsed or None
         
-        s = []
+        parsed = cls.__parse(rule)
+        # a malformed rule is remembered as well
+        _aParsedRrules.set(rule, parsed or ())
         
-        if (self.every == 1):
-            s.append(u"every " + ruleParts["INTERVAL"] + u" " + ruleParts["FREQ"].lower() + (int(ruleParts["INTERVAL"]) > 1 and u"s" or u""))
-        else:
-            s.append(u"after " + ruleParts["INTERVAL"] + u" " + ruleParts["FREQ"].lower() + (int(ruleParts["INTERVAL"]) > 1 and u"s" or u""))
+        return parsed
+    
+    @classmethod
+    def __parse(cls, rule):
+        aRuleParts = {}
+        for pair in rule.split(u";"):
+            (name, sep, value) = pair.partition(u"=")
+            aRuleParts[name.strip().upper()] = value.strip()
+        
+        frequency = aRuleParts.get(u"FREQ", u"").upper()
+        if not frequency in RtmApiRrule.FREQUENCIES:
+            return None
+        
+        interval = aRuleParts.get(u"INTERVAL", u"1")
+        if not _rRruleInterval.match(interval) or int(interval) < 1:
+            return None
+        
+        aByDay = []
+        if aRuleParts.get(u"BYDAY"):
+            for day in _rListSeparator.split(aRuleParts[u"BYDAY"]):
+                aMatches = _rRruleDay.match(day.upper())
+                if aMatches == None or aMatches.group(1) and int(aMatches.group(1)) == 0:
+                    return None
+                
+                aByDay.append((aMatches.group(1) and int(aMatches.group(1)) or None, aMatches.group(2)))
         
-        if (ruleParts["BYDAY"] != ""):
-            aMatches = re.match(ur"^(\d)(..)$", ruleParts["BYDAY"]).groups()
-            s.append(u"on the " + self.__makeNumeral(aMatches[0]) + u" " + self.__makeReadableWeekday(aMatches[1]))
+        aByMonthDay = []
+        if aRuleParts.get(u"BYMONTHDAY"):
+            for day in _rListSeparator.split(aRuleParts[u"BYMONTHDAY"]):
+                if not _rRruleMonthDay.match(day) or int(day) == 0 or abs(int(day)) > 31:
+                    return None
+                
+                aByMonthDay.append(int(day))
         
-        if (ruleParts["BYMONTHDAY"] != ""):
-            s.append(u"on the " + self.__makeNumeral(ruleParts["BYMONTHDAY"]))
+        return (frequency, int(interval), tuple(aByDay), tuple(aByMonthDay))
+    
+    def toString(self):
+        key = (self.every, self.rule)
         
-        return " ".join(s)
+        description = _aRruleDescriptions.get(key)
+        if description == None:
+            description = self.__describe()
+            _aRruleDescriptions.set(key, description)
+        
+        return description
     
-    def __makeNumeral(self, number):
-        number = str(number)
+    def __describe(self):
+        if self.parsed == None:
+            # better the rule as RTM sent it than a wrong description
+            return self.rule
+        
+        (frequency, interval, aByDay, aByMonthDay) = self.parsed
         
-        lastDigit = number[-1]
+        frequency = RtmApiRrule.FREQUENCIES.get(frequency, frequency.lower())
         
-        if lastDigit == "1":
-            number += u"st"
-        elif lastDigit == "2":
-            number += u"nd"
-        elif lastDigit == "3":
-            number += u"rd"
+        s = []
+        
+        if self.every:
+            s.append(u"every %i %s%s" % (interval, frequency, interval > 1 and u"s" or u""))
         else:
-            number += u"th"
+            s.append(u"after %i %s%s" % (interval, frequency, interval > 1 and u"s" or u""))
+        
+        if len(aByDay) > 0:
+            aDays = []
+            for (position, weekday) in aByDay:
+                if position == None:
+                    aDays.append(RtmApiRrule.WEEKDAYS[weekday])
+                else:
+                    aDays.append(u"the " + self.__makePosition(position) + u" " + RtmApiRrule.WEEKDAYS[weekday])
+            
+            s.append(u"on " + self.__makeEnumeration(aDays))
+        
+        if len(aByMonthDay) > 0:
+            aDays = []
+            for day in aByMonthDay:
+                if day < 0:
+                    aDays.append(self.__makePosition(day) + u" day")
+                else:
+                    aDays.append(self.__makePosition(day))
+            
+            s.append(u"on the " + self.__makeEnumeration(aDays))
         
-        return number
+        return " ".join(s)
     
-    def __makeReadableWeekday(self, name):
-        pairs = ((u"MO", u"Monday"), (u"TU", u"Tuesday"), (u"TH", u"Thursday"), (u"FR", u"Friday"), (u"SA", u"Saturday"), (u"SU", u"Sunday"))
+    def __makePosition(self, position):
+        """
+        @param int position Negative positions are counted from the end: -1 is 'last', -2 is '2nd to last'
+        """
+        if position == -1:
+            return u"last"
+        elif position < 0:
+            return self.__makeNumeral(-position) + u" to last"
+        else:
+            return self.__makeNumeral(position)
+    
+    def __makeNumeral(self, number):
+        if number % 100 in (11, 12, 13):
+            return u"%ith" % number
         
-        for short, long in pairs:
-            name = re.sub(short, long, name)
-            
-        return name
+        return u"%i%s" % (number, {1: u"st", 2: u"nd", 3: u"rd"}.get(number % 10, u"th"))
+    
+    def __makeEnumeration(self, aItems):
+        if len(aItems) == 1:
+            return aItems[0]
+        else:
+            return u", ".join(aItems[:-1]) + u" and " + aItems[-1]
+
+_rRruleDay = re.compile(ur"^([+-]?\d{1,2})?(MO|TU|WE|TH|FR|SA|SU)$")
+_rRruleMonthDay = re.compile(ur"^[+-]?\d{1,2}$")
+_rRruleInterval = re.compile(ur"^\d{1,4}$")
+_rListSeparator = re.compile(ur"\s*,\s*")
+
+# the strings of all the responses decoded in the instance: the keys and short values ("id", "N", "0", "") of the
+# responses held by the cache and of the models are one object each
+_internTable = simplejson.InternTable()
+
+# rule -> parsed rule, (every, rule) -> description: users have few distinct rules repeated over many tasks
+_aParsedRrules = LruCache(1000)
+_aRruleDescriptions = LruCache(1000)
 
 class RtmApiList(RtmApiObject):
+    __slots__ = ("id", "aTaskseries", "name", "deleted", "locked", "archived", "position", "smart", "filter", "sort_order")
     
     @classmethod
     def createFromRaw(cls, data):
@@ -602,7 +1042,7 @@ class RtmApiList(RtmApiObject):
             list.locked = data["locked"]
             list.archived = data["archived"]
             list.position = data["position"]
-            list.smart = data["position"]
+            list.smart = data["smart"] == u"1"
             if "filter" in data:
                 list.filter = data["filter"]
             else:
@@ -0,0 +1,112 @@
+# coding: utf-8
+
+from hashlib import md5
+import time
+from LruCache import LruCache
+
+try:
+    from google.appengine.api import memcache
+except ImportError:
+    # not on Google App Engine
+    memcache = None
+
+class RtmApiCache(object):
+    """
+    Read-through cache of the responses of idempotent RTM methods.
+    Responses are kept in the instance memory and, if the second tier is given, in the
+    storage shared by all the instances (memcache). invalidate() drops the cached responses
+    of the user's method once the user has changed the data they were made from.
+    """
+    
+    def __init__(self, maxSize = 500, secondTier = None):
+        """
+        @param int maxSize Max number of responses kept in memory, least recently used ones are evicted first
+        @param secondTier memcache-like object: get(key), set(key, value, time), incr(key, initial_value)
+        """
+        self.secondTier = secondTier
+        self.__memory = LruCache(maxSize)
+        self.__aGenerations = LruCache(maxSize)
+        
+        # instrumentation
+        self.hits = 0
+        self.misses = 0
+    
+    def get(self, method, aRequest, authToken):
+        """
+        @param string method
+        @param dict aRequest Request parameters without the signature
+        @param string|None authToken
+        @return dict|None The decoded response, None if it is not cached or has expired
+        """
+        key = self.__key(method, aRequest, authToken)
+        
+        entry = self.__memory.get(key)
+        if entry == None and self.secondTier != None:
+            entry = self.secondTier.get(key)
+            if entry != None:
+                self.__memory.set(key, entry)
+        
+        if entry == None or entry[0] < time.time():
+            self.misses += 1
+            return None
+        
+        self.hits += 1
+        return entry[1]
+    
+    def set(self, method, aRequest, authToken, response, ttl):
+        """
+        @param dict response The decoded response, must not be changed by the caller afterwards
+        @param int ttl Seconds the response is valid for
+        """
+        key = self.__key(method, aRequest, authToken)
+        entry = (time.time() + ttl, response)
+        
+        self.__memory.set(key, entry)
+        if self.secondTier != None:
+            self.secondTier.set(key, entry, ttl)
+    
+    def invalidate(self, method, authToken):
+        """
+        Drops all the cached responses of the method for the user
+        """
+        generationKey = self.__generationKey(method, authToken)
+        
+        if self.secondTier != None:
+            # shared by the instances, so they all stop using the dropped responses
+            self.secondTier.incr(generationKey, initial_value = 0)
+        else:
+            self.__aGenerations.set(generationKey, self.__aGenerations.get(generationKey, 0) + 1)
+    
+    def __key(self, method, aRequest, authToken):
+        aParams = [u"%s=%s" % (name, aRequest[name]) for name in aRequest if name != "api_sig"]
+        aParams.sort()
+        
+        generation = self.__generation(method, authToken)
+        
+        return "rtm-cache:" + md5((u"%s\n%s\n%s\n%s" % (method, authToken, generation, u"&".join(aParams))).encode("utf-8")).hexdigest()
+    
+    def __generation(self, method, authToken):
+        generationKey = self.__generationKey(method, authToken)
+        
+        if self.secondTier != None:
+            return self.secondTier.get(generationKey) or 0
+        else:
+            return self.__aGenerations.get(generationKey, 0)
+    
+    def __generationKey(self, method, authToken):
+        return "rtm-cache-generation:" + md5(u"%s\n%s" % (method, authToken)).hexdigest()
+
+# cache shared by all the RtmApi instances of the worker
+_defaultCache = None
+
+def getDefaultCache():
+    """
+    Instance memory with memcache as the second tier on Google App Engine, instance memory only elsewhere
+    @return RtmApiCache
+    """
+    global _defaultCache
+    
+    if _defaultCache == None:
+        _defaultCache = RtmApiCache(secondTier = memcache)
+    
+    return _defaultCache
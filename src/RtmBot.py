@@ -1,20 +1,44 @@
 # coding: utf-8
 
 import re
-from RtmApi import RtmApi, RtmApiSettings, RtmApiTimezone
+from RtmApi import RtmApi
 from RtmApi import RtmApiException
+from RtmApi import RtmApiRenderContext, renderTasks, firstTasks
 import logging
 import TimezonesStorage
+import TasksMirrorStorage
 import time
+import Tracing
+from hashlib import md5
+from itertools import izip
+from TaskContext import TaskContext
+from SecureStorage import SecureStorage
+from RtmBotGrammar import RtmBotCommand, parseCommand
 
 class RtmBotUserError(Exception):
     pass
 
 class RtmBot(object):
-    def __init__(self, apiKey, apiSecret, adminJidHash, storage):
+    # max number of tasks and of characters in one page of the LIST reply, the rest is shown by MORE
+    LIST_PAGE_SIZE = 20
+    LIST_PAGE_LENGTH = 4000
+    
+    # number of seconds the timeline is reused for the user's messages, 0 to create it for each message
+    TIMELINE_TTL = 1800
+    
+    def __init__(self, apiKey, apiSecret, adminJidHash, storage, queue = None):
+        """
+        @param TaskQueue queue Queue of the RTM calls the reply does not depend on, see runDeferredJob() and
+                               enqueueDeferred(). None to make all the calls before replying
+        """
         self.adminJidHash = adminJidHash
+        self.queue = queue
+        self.__aJobs = []
         self.api = RtmApi(apiKey, apiSecret)
+        self.api.onTimelineCreated = self.__saveTimeline
         self.__storage = storage
+        self.__context = None
+        self.__contextChanged = False
         
     def __fromStorage(self, name, default = None):
         if (self.__storage.exist(name)):
@@ -36,6 +60,7 @@ class RtmBot(object):
                         o = self.api.getToken(frob)
                         self.__storage.set("auth", o["token"])
                         self.__storage.delete("frob")
+                        self.__forgetTimeline()
                         
                         return "Authenticated!\n\n" + self.getHelpMessage()
                     except RtmApiException, e:
@@ -54,80 +79,88 @@ class RtmBot(object):
                 # check for commands
                 
                 self.api.setAuthToken(str(self.__storage.get("auth")))
+                self.__restoreTimeline()
                 
-                if message == "HELP":
+                command = parseCommand(message)
+                
+                if command == None:
+                    return ""
+                elif command.verb == RtmBotCommand.HELP:
                     self.__clearTaskContext();
                     
                     return self.getHelpMessage();
-                
-                elif message == "CONFIRMATION":
+                elif command.verb == RtmBotCommand.CONFIRMATION:
                     self.__clearTaskContext();
                     
                     return self.__commandConfirmation();
-                elif re.search(ur"^(?:(?:L(?:IST)?)|\?)(\s+.+)?$", message):
-                    aMatches = re.match(ur"^(?:(?:L(?:IST)?)|\?)(\s+.+)?$", message).groups()
-                    if aMatches[0] != None:
-                        query = aMatches[0].strip()
-                    else:
-                        query = ""
-                    return self.__commandList(self.__createFilterString(query));
+                elif command.verb == RtmBotCommand.LIST:
+                    return self.__commandList(self.__createFilterString(command.params));
+                elif command.verb == RtmBotCommand.MORE:
+                    return self.__commandMore();
+                elif command.verb == RtmBotCommand.STATS and self.__isAdmin():
+                    return Tracing.stats.report()
+                elif command.verb == RtmBotCommand.ADD_TASK or command.verb == RtmBotCommand.STATS:
+                    self.__clearTaskContext();
+                    
+                    return self.__commandAddTask(command.params or message, command.note);
                 else:
-                    result = self.__parseCommandWithTaskId(message)
-                    if result != None:
-                        return result
-                    elif message != "":
-                        self.__clearTaskContext();
-                        
-                        # parse message as '<name>\n<note>'
-                        if re.search(ur"^([^\n]+)\n(.+)$", message, re.DOTALL):
-                            aMatches = re.match(ur"^([^\n]+)\n(.+)$", message, re.DOTALL).groups()
-                            message = aMatches[0];
-                            note    = aMatches[1];
-                        else:
-                            note = None
-                        
-                        return self.__commandAddTask(message, note);
-                    else:
-                        return ""
+                    return self.__commandWithTaskId(command)
         except RtmBotUserError, e:
             return "ERROR: " + str(e)
 
-    def __commandCompleteTask(self, listId, taskseriesId, taskId):
-        self.api.taskComplete(listId, taskseriesId, taskId)
-        
-        if self.__fromStorage("confirmation", True):
-            return "Task completed"
-
-    def __commandDeleteTask(self, listId, taskseriesId, taskId):
-        self.api.taskDelete(listId, taskseriesId, taskId)
-        
-        if self.__fromStorage("confirmation", True):
-            return "Task deleted"
-    
     def __afterCommandDeleteTask(self, contextId):
         self.__removeTaskFromContext(contextId)
         
-    def __commandPostponeTask(self, listId, taskseriesId, taskId):
-        self.api.taskPostpone(listId, taskseriesId, taskId)
+    def __commandAddTagsToTasks(self, aArgs):
+        """
+        Moves the tasks to the lists named among the tags, then adds the rest of the tags.
+        Each of the steps is made concurrently for all the tasks.
+        @param list aArgs (listId, taskseriesId, taskId, tags) per task
+        @return list (success, message) per task
+        """
+        aPlans = [(listId, taskseriesId, taskId) + self.__excludeLists(listId, taskseriesId, taskId, tags) for (listId, taskseriesId, taskId, tags) in aArgs]
+        aMessages = [(True, "Tags/List added")] * len(aPlans)
         
-        if self.__fromStorage("confirmation", True):
-            return "Task postponed"
-    
-    def __commandAddTagsToTask(self, listId, taskseriesId, taskId, tags):
-        (listIdToMove, tags) = self.__excludeLists(listId, taskseriesId, taskId, tags)
+        aMoves = [i for i in range(len(aPlans)) if aPlans[i][3] != None]
+        aCalls = [(self.api.taskMoveTo, aPlans[i][0:4]) for i in aMoves]
+        aMoved = []
+        for (i, call) in zip(aMoves, self.api.executeConcurrently(aCalls)):
+            (listId, taskseriesId, taskId, listIdToMove, tags) = aPlans[i]
+            try:
+                aMoved.extend(call.getResult().getTaskseries())
+                
+                # update context as List ID has changed
+                self.__updateTaskInContext(taskseriesId, listIdToMove)
+                aPlans[i] = (listIdToMove, taskseriesId, taskId, None, tags)
+            except RtmApiException, e:
+                logging.exception(e)
+                aMessages[i] = (False, "ERROR: " + e.args[0])
         
-        if listIdToMove != None:
-            list = self.api.taskMoveTo(listId, taskseriesId, taskId, listIdToMove)
-            
-            # update context as List ID has changed
-            aTaskseries = list.getTaskseries()
-            self.updateInfoForTaskInContext(listId, taskseriesId, taskId, aTaskseries[0])
+        if len(aMoved) > 0:
+            renderContext = self.__createRenderContext()
+            for (i, text) in zip([i for i in aMoves if aMessages[i][0]], renderTasks(aMoved, renderContext)):
+                aMessages[i] = (True, u"Task moved: " + text)
         
-        if tags != "":
-            self.api.taskAddTags(listId, taskseriesId, taskId, tags)
+        aTagged = [i for i in range(len(aPlans)) if aMessages[i][0] and aPlans[i][4] != ""]
+        if self.queue != None:
+            for i in aTagged:
+                self.__defer("taskAddTags", aPlans[i][0:3] + (aPlans[i][4],))
+        else:
+            aCalls = [(self.api.taskAddTags, aPlans[i][0:3] + (aPlans[i][4],)) for i in aTagged]
+            for (i, call) in zip(aTagged, self.api.executeConcurrently(aCalls)):
+                try:
+                    call.getResult()
+                except RtmApiException, e:
+                    logging.exception(e)
+                    aMessages[i] = (False, "ERROR: " + e.args[0])
         
-        if self.__fromStorage("confirmation", True):
-            return "Tags/List added"
+        aResults = []
+        for (success, message) in aMessages:
+            if success:
+                message = self.__confirmation(message)
+            aResults.append((success, message))
+        
+        return aResults
     
     def __excludeLists(self, listId, taskseriesId, taskId, tags):
         aLists = self.api.listGetList()
@@ -153,67 +186,176 @@ class RtmBot(object):
         
         return (listIdToMove, tags)
     
-    def __commandRemoveTagsFromTask(self, listId, taskseriesId, taskId, tags):
-        self.api.taskRemoveTags(listId, taskseriesId, taskId, tags)
-        
-        if self.__fromStorage("confirmation", True):
-            return "Tags removed"
-    
     def __commandList(self, filter):
-        aLists = self.api.taskGetList(filter = filter)
+        (aLists, mirror) = TasksMirrorStorage.getList(self.api, self.__storage.key, filter)
 
-        userSettings = self.__loadSettingsAndTimezones()        
+        renderContext = self.__createRenderContext()
         
-        aList = []
+        count = 0
         for list in aLists:
-            aList.extend(list.getTaskseries())
+            count += len(list.getTaskseries())
             
-        if len(aList) > 0:
-            aList.sort(key = lambda element: element.task.due)
+        if count > 0:
+            aTaskseries = firstTasks(aLists, count)
+            aPage = aTaskseries[:RtmBot.LIST_PAGE_SIZE]
             
-            self.__putTasksToContext(aList)
+            # the next pages are added to the context by MORE
+            self.__putTasksToContext(aPage)
             
-            i = 1;
-            resultString = ""
-            for item in aList:
-                resultString += u"%i. %s\n\n" % (i, item.toString(userSettings))
-                i += 1
-                
-            return resultString
+            (aLines, position) = self.__listPage(range(len(aPage)), aPage, len(aPage), renderContext)
+            
+            pages = None
+            if position < count:
+                # the whole list is kept in its order for MORE: RTM is not queried again, and the pages
+                # neither repeat nor skip tasks when the result of the filter changes meanwhile
+                (pages, count) = TasksMirrorStorage.savePages(self.__storage.key, filter, mirror, aTaskseries)
+            
+            return self.__listReply(aLines, pages, position, count)
         else:
+            self.__clearListCursor()
             return "*no tasks*"
 
+    def __commandMore(self):
+        cursor = self.__fromStorage("listCursor")
+        if cursor == None or cursor.get("pages") == None:
+            return "*no more tasks*"
+        
+        context = self.__getContext()
+        if context.isEmpty():
+            # the context has been cleared since the LIST
+            self.__clearListCursor()
+            return "*no more tasks*"
+        
+        # the next page is taken from the list kept by LIST in its order, RTM is not queried again
+        position = cursor["position"]
+        end = min(position + RtmBot.LIST_PAGE_SIZE, cursor["count"])
+        aPage = TasksMirrorStorage.loadPages(self.__storage.key, cursor["pages"], position, end)
+        if aPage == None:
+            self.__clearListCursor()
+            return "*no more tasks*"
+        
+        # the tasks of the page not shown yet are added to the context in the LIST order
+        if end > context.count():
+            for taskseries in aPage[context.count() - position:]:
+                context.append(taskseries.listId, taskseries.id, taskseries.task.id)
+            self.__saveContext()
+        
+        # the tasks keep their IDs in the context, the ones removed from it are skipped
+        aPositions = []
+        aTaskseries = []
+        for (i, taskseries) in enumerate(aPage):
+            task = context.get(position + i + 1)
+            if task != None and task[1] == taskseries.id:
+                aPositions.append(position + i)
+                aTaskseries.append(taskseries)
+        
+        (aLines, position) = self.__listPage(aPositions, aTaskseries, end, self.__createRenderContext())
+        
+        return self.__listReply(aLines, cursor["pages"], position, cursor["count"])
+    
+    def __listPage(self, aPositions, aTaskseries, end, renderContext):
+        """
+        Renders the page of the list starting with the first of the tasks.
+        The tasks are rendered only until the page is full.
+        @param int[] aPositions Positions of the tasks in the whole list
+        @param RtmApiTaskseria[] aTaskseries
+        @param int end Position the next page starts with if all the tasks fit the page
+        @param RtmApiRenderContext renderContext
+        @return tuple (lines, position the next page starts with)
+        """
+        span = Tracing.span("render")
+        
+        aLines = []
+        size = 0
+        try:
+            for (position, text) in izip(aPositions, renderTasks(aTaskseries, renderContext)):
+                line = u"%i. %s\n\n" % (position + 1, text)
+                if len(aLines) > 0 and (len(aLines) >= RtmBot.LIST_PAGE_SIZE or size + len(line) > RtmBot.LIST_PAGE_LENGTH):
+                    break
+                
+                aLines.append(line)
+                size += len(line)
+            else:
+                position = end
+        except:
+            Tracing.setError(span)
+            raise
+        finally:
+            span.finish(tasks = len(aLines), chars = size)
+        
+        return (aLines, position)
+    
+    def __listReply(self, aLines, pages, position, count):
+        """
+        Remembers where the next page starts
+        @param string[] aLines The rendered page
+        @param string|None pages Version of the list kept for MORE by TasksMirrorStorage.savePages()
+        @param int position
+        @param int count Number of tasks in the whole list
+        @return string
+        """
+        if position < count:
+            self.__storage.set("listCursor", {"pages": pages, "position": position, "count": count})
+            aLines.append(u"*%i more, say MORE to see them*" % (count - position))
+        else:
+            self.__clearListCursor()
+        
+        return u"".join(aLines)
+    
+    def __isAdmin(self):
+        """
+        @return bool Whether the user is the one set by Config.ADMIN_JID: the JID or its MD5 hash
+        """
+        jid = self.__storage.key
+        return self.adminJidHash != "" and self.adminJidHash in (jid, md5(jid).hexdigest())
+    
+    def __clearListCursor(self):
+        # reading the cursor is cheaper than writing it
+        if self.__fromStorage("listCursor") != None:
+            self.__storage.set("listCursor", None)
+    
+    def __createRenderContext(self):
+        return RtmApiRenderContext(self.__loadSettingsAndTimezones())
+    
+    def __createCachedRenderContext(self):
+        """
+        Render context not waiting for RTM: if the settings or the timezones are not cached,
+        the dates are shown in GMT and the cache is refreshed in the background
+        @return RtmApiRenderContext
+        """
+        aTimezones = TimezonesStorage.getTimezones(self.api, True)
+        settings = self.api.settingsGetList(True)
+        
+        if aTimezones == None or settings == None:
+            self.__defer("refreshSettings", ())
+            return RtmApiRenderContext()
+        
+        return RtmApiRenderContext(settings)
+    
+    def __defer(self, method, aArgs):
+        """
+        Keeps the RTM call for enqueueDeferred(), it is made with the user's token and timeline
+        @param string method See runDeferredJob()
+        @param tuple aArgs
+        """
+        self.__aJobs.append({"user": self.__storage.key, "timeline": self.api.getTimeline(), "method": method, "args": list(aArgs)})
+    
+    def enqueueDeferred(self):
+        """
+        Enqueues the RTM calls deferred by processCommand(). Called once the user's storage is flushed:
+        the jobs load the token from it, and the calls of the message whose changes are rolled back are dropped.
+        """
+        for aJob in self.__aJobs:
+            self.queue.enqueue(aJob)
+        
+        self.__aJobs = []
+    
     def __loadSettingsAndTimezones(self):
         # load list of timezones
-        RtmApiTimezone.setTimezones(TimezonesStorage.getTimezones(self.api))
+        TimezonesStorage.getTimezones(self.api)
         
-        # load user settings from RTM or from cached in datastore value
-        return self.__getUserSettings()
-            
-    def __getUserSettings(self):
-        settingsRaw = self.__fromStorage("settings", None)
-        lastUpdated = self.__fromStorage("settingsLastUpdated", None)
-
-        # check if settings has expired        
-        if lastUpdated != None and time.mktime(time.gmtime()) - lastUpdated > 3600:
-            settingsRaw = None
-            
-        if settingsRaw == None:
-            settings = self.api.settingsGetList()
-            settingsRaw = {
-                           "timezone": settings.timezone, 
-                           "dateformat": settings.dateformat, 
-                           "timeformat": settings.timeformat, 
-                           "defaultlist": settings.defaultlist, 
-                           "language": settings.language
-                           }
-            self.__storage.put("settings", settingsRaw)
-            self.__storage.put("settingsLastUpdated", time.mktime(time.gmtime()))
-            
-        settings = RtmApiSettings(settingsRaw["timezone"], settingsRaw["dateformat"],
-                                  settingsRaw["timeformat"], settingsRaw["defaultlist"], settingsRaw["language"])
-        
-        return settings
+        # load user settings from RTM or from the cache of RtmApi
+        return self.api.settingsGetList()
         
     def __commandConfirmation(self):
         if self.__fromStorage("confirmation", True):
@@ -242,107 +384,152 @@ class RtmBot(object):
                     title = "Note"
                     text = note
                 
-                self.api.taskNoteAdd(title, text, list.id, taskseries.id, taskseries.task.id)
+                if self.queue != None:
+                    self.__defer("taskNoteAdd", (title, text, list.id, taskseries.id, taskseries.task.id))
+                else:
+                    self.api.taskNoteAdd(title, text, list.id, taskseries.id, taskseries.task.id)
         except RtmApiException, e:
             logging.exception(e)
-            return "ERROR: " . str(e)
+            return "ERROR: " + str(e)
         
         if self.__fromStorage("confirmation", True):
-            userSettings = self.__loadSettingsAndTimezones()
+            if self.queue != None:
+                renderContext = self.__createCachedRenderContext()
+            else:
+                renderContext = self.__createRenderContext()
+            
+            return u"Task added: " + renderTasks([taskseries], renderContext).next()
+    
+    def __getContext(self):
+        """
+        @return TaskContext The user's context, loaded once per message
+        """
+        if self.__context == None:
+            data = self.__fromStorage("aContextTasks")
+            self.__context = TaskContext.unpack(data)
             
-            return "Task added: " + taskseries.toString(userSettings)
+            if not TaskContext.isPacked(data):
+                # one-time conversion of the context stored in the old format
+                self.__saveContext()
+        
+        return self.__context
+    
+    def __saveContext(self):
+        self.__storage.set("aContextTasks", self.__context.pack())
         
     def __putTasksToContext(self, aTaskseries):
-        aNewContext = {}
-        i = 1
-        for taskseries in aTaskseries:
-            aNewContext[str(i)] = (taskseries.listId, taskseries.id, taskseries.task.id)
-            i += 1
-        self.__storage.put("aContextTasks", aNewContext)
+        self.__context = TaskContext.createFromTaskseries(aTaskseries)
+        self.__saveContext()
     
     def __getTaskFromContext(self, contextId):
-#        try:
-#            contextId = int(contextId)
-#        except ValueError:
-#            raise RtmBotUserError("Bad task ID: '%s'" % contextId)
-        
-        if not self.__storage.exist("aContextTasks"):
-            self.__storage.set("aContextTasks", {})
-        
-        if contextId in self.__storage.get("aContextTasks"):
-            return self.__storage.get("aContextTasks")[contextId]
-        else:
+        task = self.__getContext().get(contextId)
+        if task == None:
             raise RtmBotUserError("There is no task with ID " + str(contextId) + " in your current context")
+        
+        return task
     
     def __removeTaskFromContext(self, contextId):
-        if self.__storage.exist("aContextTasks"):
-            context = self.__storage.get("aContextTasks")
-            if context.has_key(contextId):
-                del context[contextId]
-                self.__storage.put("aContextTasks", context)
+        # saved by the command once all its changes are made
+        self.__getContext().remove(contextId)
+        self.__contextChanged = True
+    
+    def __updateTaskInContext(self, taskseriesId, listId):
+        self.__getContext().moveTask(taskseriesId, listId)
+        self.__contextChanged = True
         
     def __clearTaskContext(self):
-        self.__storage.set("aContextTasks", {})
-        
-    def __parseCommandWithTaskId(self, message):
-        self.api.beginTimeline()
-        
-        aCommands = [
-            {"method": self.__commandCompleteTask, "command": (u"C", u"COMPLETE", u"+", u"++")},
-            {"method": self.__commandDeleteTask, "command": (u"D", u"DELETE", u"-")},
-            {"method": self.__commandPostponeTask, "command": (u"P", u"POSTPONE", u">"), "context_callback": self.__afterCommandDeleteTask}, 
-            {"method": self.__commandAddTagsToTask, "command": (u"T", u"TAGS", u"#"), "has_param": True},
-            {"method": self.__commandRemoveTagsFromTask, "command": (u"-T", u"-TAGS", u"-#"), "has_param": True},
-        ]
-        
-        for commandInfo in aCommands:
-            method = commandInfo["method"]
-            aliases = commandInfo["command"]
-            moreParams = "has_param" in commandInfo and commandInfo["has_param"]
+        # the LIST cursor is left as is: MORE finds no tasks in the empty context
+        self.__context = TaskContext()
+        self.__saveContext()
+        
+    def __restoreTimeline(self):
+        timeline = self.__fromStorage("timeline")
+        created = self.__fromStorage("timelineCreated")
+        
+        if timeline != None and created != None and time.mktime(time.gmtime()) - created < RtmBot.TIMELINE_TTL:
+            self.api.setTimeline(timeline)
+    
+    def __saveTimeline(self, timeline):
+        if RtmBot.TIMELINE_TTL > 0:
+            self.__storage.set("timeline", timeline)
+            self.__storage.set("timelineCreated", time.mktime(time.gmtime()))
+    
+    def __forgetTimeline(self):
+        if self.__storage.exist("timeline"):
+            self.__storage.delete("timeline")
+            self.__storage.delete("timelineCreated")
+    
+    def __commandWithTaskId(self, command):
+        aCommands = {
+            RtmBotCommand.COMPLETE: {"api": self.api.taskComplete, "confirmation": "Task completed"},
+            RtmBotCommand.DELETE: {"api": self.api.taskDelete, "confirmation": "Task deleted", "context_callback": self.__afterCommandDeleteTask},
+            RtmBotCommand.POSTPONE: {"api": self.api.taskPostpone, "confirmation": "Task postponed"},
+            RtmBotCommand.ADD_TAGS: {"method": self.__commandAddTagsToTasks},
+            RtmBotCommand.REMOVE_TAGS: {"api": self.api.taskRemoveTags, "confirmation": "Tags removed", "deferred": "taskRemoveTags"},
+        }
+        
+        commandInfo = aCommands[command.verb]
+        
+        if command.params != None:
+            aParams = (command.params,)
+        else:
+            aParams = ()
+        
+        # all the IDs are checked before anything is sent to RTM
+        if command.fullTaskId != None:
+            aTasks = [(None, command.fullTaskId)]
+        else:
+            context = self.__getContext()
             
-            rAliases = []
-            for alias in aliases:
-                rAliases.append(u"(?:" +  re.escape(alias) + ")")
-            rAliases = u"|".join(rAliases)
+            aUnknownIds = [id for id in command.aIds if context.get(id) == None]
+            if len(aUnknownIds) == 1:
+                raise RtmBotUserError("There is no task with ID " + aUnknownIds[0] + " in your current context")
+            elif len(aUnknownIds) > 1:
+                raise RtmBotUserError("There are no tasks with IDs " + ", ".join(aUnknownIds) + " in your current context")
             
-            if moreParams:
-                rMoreParams = ur"(\s+.+)"
-            else:
-                rMoreParams = u""
-
-            # old '#123-456-789' task id notation
-            aMatches = re.match(ur"^ (?: " + rAliases + ur") \s+ (?: \#? ) (\d+)-(\d+)-(\d+) " + rMoreParams + u" $", message, re.VERBOSE)
+            aTasks = [(id, context.get(id)) for id in command.aIds]
+        
+        aArgs = [tuple(task) + aParams for (id, task) in aTasks]
+        
+        if "deferred" in commandInfo and self.queue != None:
+            aMessages = []
+            for args in aArgs:
+                self.__defer(commandInfo["deferred"], args)
+                aMessages.append((True, self.__confirmation(commandInfo["confirmation"])))
+        elif "api" in commandInfo:
+            # the tasks are independent so the calls are made concurrently
+            aMessages = []
+            for call in self.api.executeConcurrently([(commandInfo["api"], args) for args in aArgs]):
+                try:
+                    call.getResult()
+                    aMessages.append((True, self.__confirmation(commandInfo["confirmation"])))
+                except RtmApiException, e:
+                    logging.exception(e)
+                    aMessages.append((False, "ERROR: " + e.args[0]))
+        else:
+            aMessages = commandInfo["method"](aArgs)
+        
+        aResults = []
+        for ((id, task), (success, message)) in zip(aTasks, aMessages):
+            if success and "context_callback" in commandInfo and id != None:
+                commandInfo["context_callback"](id)
             
-            if aMatches != None:
-                aMatches = aMatches.groups()
-                if moreParams:
-                    return method(self, aMatches[0], aMatches[1], aMatches[2], aMatches[3].strip())
-                else:
-                    return method(self, aMatches[0], aMatches[1], aMatches[2])
+            if message == None:
+                continue
+            elif id == None:
+                aResults.append(message)
             else:
-                # 'id in the last list of tasks' task id notation
-                aMatches = re.match(ur"^ (?: " + rAliases + ur" ) \s+ (\d+(?: \s* , \s* \d+)*) " + rMoreParams + u" $", message, re.VERBOSE)
-                
-                if aMatches != None:
-                    aMatches = aMatches.groups()
-                    
-                    aIds = re.split(ur"\s*,\s*", aMatches[0])
-                    
-                    aResults = []
-                    for id in aIds:
-                        (listId, taskseriesId, taskId) = self.__getTaskFromContext(id)
-
-                        if moreParams:
-                            aResults.append(id + u" -- " + method(listId, taskseriesId, taskId, aMatches[1].strip()))
-                        else:
-                            aResults.append(id + u" -- " + method(listId, taskseriesId, taskId))
-                            
-                        if "context_callback" in commandInfo:
-                            commandInfo["context_callback"](id)
-                    
-                    return "\n".join(aResults)
-
-        return None
+                aResults.append(id + u" -- " + message)
+        
+        # the context changed by the command is written once
+        if self.__contextChanged:
+            self.__saveContext()
+        
+        return "\n".join(aResults)
+    
+    def __confirmation(self, message):
+        if self.__fromStorage("confirmation", True):
+            return message
     
     def __answer(self, message):
         print message
@@ -375,6 +562,9 @@ LIST [filter] -- show the list of tasks with optional filter, see: http://www.re
 L [filter] -- LIST command alias
 ? [filter] -- LIST command alias
 
+MORE -- show the next page of the list shown by the LIST command
+M -- MORE command alias
+
 CONFIRMATION -- Turn On/Off showing command execution confirmation messages
 
 :: About Task IDs ::
@@ -430,3 +620,39 @@ The project is Open Souce so you can find souces (in PHP) here:
 
   * http://code.google.com/p/jabber2rtm/
 """
+
+# RtmApi methods the jobs enqueued by RtmBot may call
+_aDeferredMethods = ("taskNoteAdd", "taskAddTags", "taskRemoveTags")
+
+def runDeferredJob(api, aJob):
+    """
+    Makes the RTM call enqueued by RtmBot, raises RtmApiException if it has failed
+    @param RtmApi api Without the user's token
+    @param dict aJob {"user": storage key, "timeline": timeline or None, "method": RtmApi method or "refreshSettings", "args": [...]}
+    """
+    if not "user" in aJob:
+        logging.error("malformed deferred %s dropped: no user", aJob.get("method"))
+        return
+    
+    # the token is not kept in the job: the queue shows the payloads and logs them on retries
+    storage = SecureStorage(aJob["user"])
+    token = None
+    if storage.exist("auth"):
+        token = storage.get("auth")
+    
+    if token == None:
+        logging.warning("deferred %s dropped: the user is not authenticated any more", aJob["method"])
+        return
+    
+    api.setAuthToken(str(token))
+    if aJob["timeline"] != None:
+        api.setTimeline(aJob["timeline"])
+    
+    if aJob["method"] == "refreshSettings":
+        # the cached settings and timezones used to render the replies
+        TimezonesStorage.getTimezones(api)
+        api.settingsGetList()
+    elif aJob["method"] in _aDeferredMethods:
+        getattr(api, aJob["method"])(*aJob["args"])
+    else:
+        logging.error("unknown deferred method %s", aJob["method"])
@@ -0,0 +1,121 @@
+# coding: utf-8
+
+import re
+
+class RtmBotCommand(object):
+    """
+    Parsed user message: the command verb and its arguments.
+    """
+
+    HELP = "HELP"
+    CONFIRMATION = "CONFIRMATION"
+    LIST = "LIST"
+    MORE = "MORE"
+    STATS = "STATS"
+    COMPLETE = "COMPLETE"
+    DELETE = "DELETE"
+    POSTPONE = "POSTPONE"
+    ADD_TAGS = "TAGS"
+    REMOVE_TAGS = "-TAGS"
+    ADD_TASK = "ADD"
+
+    def __init__(self, verb, aIds = None, fullTaskId = None, params = None, note = None):
+        """
+        @param string verb One of the RtmBotCommand constants
+        @param list aIds IDs of tasks in the user's context ('C 1,2,3' notation)
+        @param tuple fullTaskId (listId, taskseriesId, taskId) given in the old 'C #123-456-789' notation
+        @param string params Trailing command parameters: tags, LIST query or the name of the task to add
+        @param string note Note of the task to add
+        """
+        self.verb = verb
+        self.aIds = aIds
+        self.fullTaskId = fullTaskId
+        self.params = params
+        self.note = note
+
+    def __repr__(self):
+        return u"%s ids: %s, full id: %s, params: %s, note: %s" % (self.verb, self.aIds, self.fullTaskId, self.params, self.note)
+
+# the first word of the message -> (verb, regex for the rest of the message)
+
+_rListQuery = re.compile(ur"(?: \s+ (.+) )? $", re.VERBOSE)
+
+_rTaskIds = re.compile(ur"""
+    \s+
+    (?:
+        \#? (\d+)-(\d+)-(\d+)       # old '#123-456-789' task id notation
+        |
+        (\d+ (?: \s* , \s* \d+)*)   # 'id in the last list of tasks' task id notation
+    )
+    $""", re.VERBOSE)
+
+_rTaskIdsWithParam = re.compile(ur"""
+    \s+
+    (?:
+        \#? (\d+)-(\d+)-(\d+)
+        |
+        (\d+ (?: \s* , \s* \d+)*)
+    )
+    \s+ (.+)
+    $""", re.VERBOSE)
+
+_rIdSeparator = re.compile(ur"\s*,\s*")
+_rFirstWord = re.compile(ur"\S+")
+_rTaskWithNote = re.compile(ur"^([^\n]+)\n(.+)$", re.DOTALL)
+
+_aCommands = {}
+
+def _addCommand(verb, aliases, rRest):
+    for alias in aliases:
+        _aCommands[alias] = (verb, rRest)
+
+_addCommand(RtmBotCommand.LIST, (u"L", u"LIST", u"?"), _rListQuery)
+_addCommand(RtmBotCommand.COMPLETE, (u"C", u"COMPLETE", u"+", u"++"), _rTaskIds)
+_addCommand(RtmBotCommand.DELETE, (u"D", u"DELETE", u"-"), _rTaskIds)
+_addCommand(RtmBotCommand.POSTPONE, (u"P", u"POSTPONE", u">"), _rTaskIds)
+_addCommand(RtmBotCommand.ADD_TAGS, (u"T", u"TAGS", u"#"), _rTaskIdsWithParam)
+_addCommand(RtmBotCommand.REMOVE_TAGS, (u"-T", u"-TAGS", u"-#"), _rTaskIdsWithParam)
+
+def parseCommand(message):
+    """
+    Parses the (stripped) user message in one pass.
+    Messages not matching any command are parsed as '<name>\\n<note>' of the task to add.
+    @param string message
+    @return RtmBotCommand|None None for the empty message
+    """
+
+    if message == u"":
+        return None
+
+    if message == u"HELP" or message == u"CONFIRMATION" or message == u"MORE" or message == u"STATS":
+        return RtmBotCommand(message)
+    
+    if message == u"M":
+        return RtmBotCommand(RtmBotCommand.MORE)
+
+    firstWord = _rFirstWord.match(message)
+    if firstWord != None and firstWord.group() in _aCommands:
+        (verb, rRest) = _aCommands[firstWord.group()]
+
+        aMatches = rRest.match(message, firstWord.end())
+        if aMatches != None:
+            if verb == RtmBotCommand.LIST:
+                return RtmBotCommand(verb, params = aMatches.group(1) or u"")
+
+            aMatches = aMatches.groups()
+            if rRest is _rTaskIdsWithParam:
+                params = aMatches[4]
+            else:
+                params = None
+
+            if aMatches[3] == None:
+                return RtmBotCommand(verb, fullTaskId = aMatches[0:3], params = params)
+            else:
+                return RtmBotCommand(verb, aIds = _rIdSeparator.split(aMatches[3]), params = params)
+
+    # parse message as '<name>\n<note>'
+    aMatches = _rTaskWithNote.match(message)
+    if aMatches != None:
+        return RtmBotCommand(RtmBotCommand.ADD_TASK, params = aMatches.group(1), note = aMatches.group(2))
+    else:
+        return RtmBotCommand(RtmBotCommand.ADD_TASK, params = message)
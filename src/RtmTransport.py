@@ -0,0 +1,299 @@
+# coding: utf-8
+
+import urllib
+import urlparse
+import httplib
+import select
+import socket
+import threading
+import time
+import simplejson
+
+try:
+    from google.appengine.api import urlfetch
+except ImportError:
+    # not on Google App Engine
+    urlfetch = None
+
+class RtmTransportResult(object):
+    """
+    The response of the request started by RtmTransport.fetchAsync()
+    """
+    
+    def __init__(self, wait):
+        """
+        @param callable wait Waits for the response and returns its body
+        """
+        self.__wait = wait
+    
+    def getResult(self):
+        """
+        @return string The response body. Raises the error the request has failed with.
+        """
+        return self.__wait()
+
+class RtmTransport(object):
+    """
+    Sends signed requests to the RTM REST endpoint.
+    """
+    
+    # max size of the pieces fetchChunks() returns the response in
+    CHUNK_SIZE = 65536
+    
+    def fetch(self, url, aRequest):
+        """
+        @param string url
+        @param dict aRequest Signed request parameters, utf-8 encoded
+        @return string The response body
+        """
+        raise NotImplementedError()
+    
+    def fetchAsync(self, url, aRequest):
+        """
+        Starts the request and returns without waiting for the response.
+        Transports not able to send requests concurrently make the request right away.
+        @return RtmTransportResult
+        """
+        return _completed(self.fetch, url, aRequest)
+    
+    def fetchChunks(self, url, aRequest):
+        """
+        Makes the request and returns the response body in pieces, as they arrive if the transport can read them so.
+        Transports receiving the whole body at once split it.
+        @return iterator string
+        """
+        return _split(self.fetch(url, aRequest), self.CHUNK_SIZE)
+
+class RtmUrlfetchTransport(RtmTransport):
+    """
+    Google App Engine URL Fetch service. Concurrent requests are made with asynchronous RPCs.
+    """
+    
+    HEADERS = {'Content-Type': 'application/x-www-form-urlencoded'}
+    
+    def __init__(self, deadline = 30):
+        self.deadline = deadline
+    
+    def fetch(self, url, aRequest):
+        return urlfetch.fetch(url = url, payload = urllib.urlencode(aRequest), method = urlfetch.POST,
+                              headers = RtmUrlfetchTransport.HEADERS, deadline = self.deadline).content
+    
+    def fetchAsync(self, url, aRequest):
+        rpc = urlfetch.create_rpc(deadline = self.deadline)
+        urlfetch.make_fetch_call(rpc, url, payload = urllib.urlencode(aRequest), method = urlfetch.POST,
+                                 headers = RtmUrlfetchTransport.HEADERS)
+        
+        return RtmTransportResult(lambda: rpc.get_result().content)
+
+class RtmPooledHttpTransport(RtmTransport):
+    """
+    HTTP client for deployments outside of Google App Engine.
+    Keep-alive connections are reused by the following calls of the same request and
+    by the following requests served by the worker, so the TCP handshake is made once.
+    """
+    
+    HEADERS = {'Content-Type': 'application/x-www-form-urlencoded', 'Connection': 'keep-alive'}
+    
+    def __init__(self, timeout = 30, maxIdle = 4):
+        """
+        @param int timeout Socket timeout in seconds
+        @param int maxIdle Max number of idle connections kept for each host
+        """
+        self.timeout = timeout
+        self.maxIdle = maxIdle
+        self.__aIdle = {}
+        self.__lock = threading.Lock()
+        
+        # instrumentation: number of TCP connections opened
+        self.connectionsOpened = 0
+    
+    def fetch(self, url, aRequest):
+        return "".join(self.fetchChunks(url, aRequest))
+    
+    def fetchChunks(self, url, aRequest):
+        (scheme, host, path, query, fragment) = urlparse.urlsplit(url)
+        payload = urllib.urlencode(aRequest)
+        
+        while True:
+            (connection, reused) = self.__acquire(scheme, host)
+            sent = False
+            try:
+                connection.request("POST", path, payload, RtmPooledHttpTransport.HEADERS)
+                sent = True
+                response = connection.getresponse()
+                # the first piece is read here, so the failure of the reused connection is retried
+                chunk = response.read(self.CHUNK_SIZE)
+            except (httplib.HTTPException, socket.error):
+                connection.close()
+                # the server has closed the idle connection, repeat with the new one. Once the request is sent
+                # the server may have handled it before closing, so only the read-only methods are repeated then,
+                # the changes would be made twice.
+                if reused and (not sent or _isReadOnly(aRequest)):
+                    continue
+                raise
+            
+            return self.__readChunks(scheme, host, connection, response, chunk)
+    
+    def __readChunks(self, scheme, host, connection, response, chunk):
+        """
+        Yields the pieces of the response, then releases the connection.
+        The connection of the response not read to the end is closed.
+        """
+        complete = False
+        try:
+            while chunk:
+                yield chunk
+                chunk = response.read(self.CHUNK_SIZE)
+            complete = True
+        finally:
+            if complete and not response.will_close:
+                self.__release(scheme, host, connection)
+            else:
+                connection.close()
+    
+    def fetchAsync(self, url, aRequest):
+        return _inThread(self.fetch, url, aRequest)
+    
+    def close(self):
+        """Closes all the idle connections"""
+        
+        self.__lock.acquire()
+        try:
+            for aConnections in self.__aIdle.itervalues():
+                for connection in aConnections:
+                    connection.close()
+            self.__aIdle = {}
+        finally:
+            self.__lock.release()
+    
+    def __acquire(self, scheme, host):
+        self.__lock.acquire()
+        try:
+            aConnections = self.__aIdle.get((scheme, host))
+            while aConnections:
+                connection = aConnections.pop()
+                if not _isDropped(connection):
+                    return (connection, True)
+                connection.close()
+            
+            self.connectionsOpened += 1
+        finally:
+            self.__lock.release()
+        
+        if scheme == "https":
+            return (httplib.HTTPSConnection(host, timeout = self.timeout), False)
+        else:
+            return (httplib.HTTPConnection(host, timeout = self.timeout), False)
+    
+    def __release(self, scheme, host, connection):
+        self.__lock.acquire()
+        try:
+            aConnections = self.__aIdle.setdefault((scheme, host), [])
+            if len(aConnections) < self.maxIdle:
+                aConnections.append(connection)
+                return
+        finally:
+            self.__lock.release()
+        
+        connection.close()
+
+class RtmFakeTransport(RtmTransport):
+    """
+    In-process stand-in for RTM for benchmarks and local runs.
+    Requests are answered by the handler after the simulated network latency.
+    """
+    
+    def __init__(self, handler, latency = 0):
+        """
+        @param callable handler Takes the request parameters and returns the response as a dict: {"rsp": {"stat": "ok", ...}}
+        @param float latency Seconds every request takes
+        """
+        self.handler = handler
+        self.latency = latency
+        self.aRequests = []
+    
+    def fetch(self, url, aRequest):
+        self.aRequests.append(aRequest)
+        
+        if self.latency > 0:
+            time.sleep(self.latency)
+        
+        return simplejson.dumps(self.handler(dict(aRequest)))
+    
+    def fetchAsync(self, url, aRequest):
+        return _inThread(self.fetch, url, aRequest)
+
+# transport shared by all the RtmApi instances of the worker
+_defaultTransport = None
+
+def getDefaultTransport(timeout = 30):
+    """
+    URL Fetch on Google App Engine, pooled keep-alive connections elsewhere
+    @return RtmTransport
+    """
+    global _defaultTransport
+    
+    if _defaultTransport == None:
+        if urlfetch != None:
+            _defaultTransport = RtmUrlfetchTransport(timeout)
+        else:
+            _defaultTransport = RtmPooledHttpTransport(timeout)
+    
+    return _defaultTransport
+
+def _isReadOnly(aRequest):
+    """
+    @param dict aRequest
+    @return bool True for the RTM methods not changing anything: rtm.*.get*
+    """
+    return aRequest.get("method", "").split(".")[-1].startswith("get")
+
+def _isDropped(connection):
+    """
+    The idle connection the server has closed is readable: the end of the stream is waiting there.
+    Checked before the connection is reused, as the changing requests are not repeated on failure.
+    @param httplib.HTTPConnection connection
+    @return bool
+    """
+    if connection.sock == None:
+        return True
+    
+    try:
+        return len(select.select([connection.sock], [], [], 0)[0]) > 0
+    except (select.error, socket.error):
+        return True
+
+def _split(body, size):
+    for start in xrange(0, len(body), size):
+        yield body[start:start + size]
+
+def _completed(function, *args):
+    try:
+        result = function(*args)
+    except Exception, e:
+        def fail():
+            raise e
+        return RtmTransportResult(fail)
+    
+    return RtmTransportResult(lambda: result)
+
+def _inThread(function, *args):
+    aResult = []
+    
+    def run():
+        try:
+            aResult.append((True, function(*args)))
+        except Exception, e:
+            aResult.append((False, e))
+    
+    thread = threading.Thread(target = run)
+    thread.start()
+    
+    def wait():
+        thread.join()
+        (success, value) = aResult[0]
+        if not success:
+            raise value
+        return value
+    
+    return RtmTransportResult(wait)
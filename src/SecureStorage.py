@@ -1,40 +1,241 @@
 # coding: utf-8
 
-from google.appengine.ext.db import Model, TextProperty
 import simplejson
+from StorageBackend import getDefaultBackend, newVersion
+import Tracing
 
-class StorageModel(Model):
-    data = TextProperty()
-    
 class SecureStorage:
-    def __init__(self, key):
+    """
+    Per-user storage. The small fields needed by most of the messages are
+    stored in one record loaded at once, every other field is stored in its
+    own record loaded on the first access, so the messages not using the task
+    context do not read and parse it.
+    
+    Changes are kept in memory and written to the backend by flush(), one save
+    per changed record. Used as a context manager it flushes the changes on
+    success and rolls them back when an exception is raised.
+    """
+    
+    # stored in the main record
+    HOT_FIELDS = ("auth", "frob", "confirmation", "timeline", "timelineCreated")
+    
+    # dropped when the main record of the old format (all the fields in one record) is migrated
+    OBSOLETE_FIELDS = ("settings", "settingsLastUpdated")
+    
+    def __init__(self, key, backend = None):
+        """
+        @param string key
+        @param StorageBackend backend StorageBackend.getDefaultBackend() if not given
+        """
+        if backend == None:
+            backend = getDefaultBackend()
+        
         self.key = key
-        self.model = StorageModel.get_or_insert(key)
-        if self.model.data == None:
-            self.aData = {}
-        else:
-            self.aData = simplejson.loads(self.model.data)
+        self.backend = backend
+        
+        # instrumentation: backend writes made by this storage
+        self.putCount = 0
+        self.bytesWritten = 0
+        
+        span = Tracing.span("storage.load", record = "main")
+        try:
+            self.__main = _StorageRecord(key, backend.load(key), {})
+        except:
+            Tracing.setError(span)
+            raise
+        finally:
+            span.finish()
+        
+        # name -> _StorageRecord of the fields stored in their own records, the accessed ones only
+        self.__aFields = {}
+        
+        self.__migrate()
     
     def get(self, name):
-        return self.aData[name];
+        if name in SecureStorage.HOT_FIELDS:
+            return self.__main.value[name]
+        
+        field = self.__loadField(name)
+        if field.value == None:
+            raise KeyError(name)
+        
+        return field.value[0]
     
     def set(self, name, value):
-        self.aData[name] = value;
-        self.__save()
-        
+        if name in SecureStorage.HOT_FIELDS:
+            self.__main.value[name] = value
+            self.__main.dirty = True
+        else:
+            # the whole record is replaced, so it is not loaded
+            self.__getField(name).change([value])
+    
     def delete(self, name):
-        del self.aData[name]
-        self.__save()
+        if name in SecureStorage.HOT_FIELDS:
+            del self.__main.value[name]
+            self.__main.dirty = True
+        else:
+            self.__getField(name).change(None)
     
     def getAll(self):
-        return self.aData;
-
+        """
+        @return dict The fields of the main record and the other fields accessed so far
+        """
+        aData = dict(self.__main.value)
+        for (name, field) in self.__aFields.iteritems():
+            if field.loaded and field.value != None:
+                aData[name] = field.value[0]
+        
+        return aData
+    
     def exist(self, name):
-        return name in self.aData
+        if name in SecureStorage.HOT_FIELDS:
+            return name in self.__main.value
+        
+        return self.__loadField(name).value != None
+    
+    def isDirty(self):
+        if self.__main.dirty:
+            return True
+        
+        for field in self.__aFields.itervalues():
+            if field.dirty:
+                return True
+        
+        return False
+    
+    def flush(self):
+        """Writes the records changed since the last flush(), one backend save per record"""
+        
+        span = Tracing.span("storage.save")
+        putCount = self.putCount
+        bytesWritten = self.bytesWritten
+        
+        try:
+            for record in [self.__main] + self.__aFields.values():
+                if record.dirty:
+                    self.bytesWritten += record.save(self.backend)
+                    self.putCount += 1
+        except:
+            Tracing.setError(span)
+            raise
+        finally:
+            span.finish(records = self.putCount - putCount, bytes = self.bytesWritten - bytesWritten)
+    
+    def rollback(self):
+        """Discards the changes made since the last flush()"""
+        
+        self.__main.rollback()
+        
+        for name in self.__aFields.keys():
+            if not self.__aFields[name].rollback():
+                del self.__aFields[name]
     
-    def __save(self):
-        self.model.data = simplejson.dumps(self.aData)
-        self.model.put()
+    def __getField(self, name):
+        if name not in self.__aFields:
+            self.__aFields[name] = _StorageRecord(self.key + "/" + name)
         
+        return self.__aFields[name]
+    
+    def __loadField(self, name):
+        field = self.__getField(name)
+        if not field.loaded and not field.dirty:
+            span = Tracing.span("storage.load", record = name)
+            try:
+                field.load(self.backend.load(field.key), None)
+            except:
+                Tracing.setError(span)
+                raise
+            finally:
+                span.finish()
+        
+        return field
+    
+    def __migrate(self):
+        """
+        Moves the fields stored in the main record by the old format to their own records
+        """
+        aData = self.__main.value
+        
+        for name in aData.keys():
+            if name not in SecureStorage.HOT_FIELDS:
+                if name not in SecureStorage.OBSOLETE_FIELDS:
+                    self.__getField(name).change([aData[name]])
+                
+                del aData[name]
+                self.__main.dirty = True
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, type, value, traceback):
+        if type == None:
+            self.flush()
+        else:
+            self.rollback()
+        
+        return False
+    
     put = set
+
+class _StorageRecord(object):
+    """
+    Record of the backend: the JSON of the main record's dict or of [value] for the other fields
+    """
+    
+    def __init__(self, key, entry = None, default = None):
+        self.key = key
+        self.dirty = False
+        self.loaded = False
+        self.value = None
+        
+        if entry != None:
+            self.load(entry, default)
     
+    def load(self, entry, default):
+        """
+        @param tuple entry (version, data) as returned by StorageBackend.load()
+        @param default The value of the record that does not exist
+        """
+        (self.version, self.data) = entry
+        self.default = default
+        self.loaded = True
+        self.__parse()
+    
+    def change(self, value):
+        self.value = value
+        self.dirty = True
+    
+    def save(self, backend):
+        """
+        @return int Bytes written
+        """
+        self.data = simplejson.dumps(self.value)
+        self.version = newVersion()
+        backend.save(self.key, self.version, self.data)
+        
+        self.loaded = True
+        self.default = None
+        self.dirty = False
+        
+        return len(self.data)
+    
+    def rollback(self):
+        """
+        @return bool False if the record has never been loaded or saved, so there is nothing to roll back to
+        """
+        if not self.loaded:
+            return False
+        
+        self.__parse()
+        return True
+    
+    def __parse(self):
+        if self.data == None:
+            if isinstance(self.default, dict):
+                self.value = dict(self.default)
+            else:
+                self.value = self.default
+        else:
+            self.value = simplejson.loads(self.data)
+        
+        self.dirty = False
@@ -0,0 +1,205 @@
+# coding: utf-8
+
+import time
+import random
+from LruCache import LruCache
+
+try:
+    from google.appengine.ext import db
+    from google.appengine.api import memcache
+except ImportError:
+    # not on Google App Engine
+    db = None
+    memcache = None
+
+if db != None:
+    class StorageModel(db.Model):
+        data = db.TextProperty()
+        # changed by every save, see TieredStorageBackend
+        version = db.StringProperty()
+
+class StorageBackend(object):
+    """
+    Durable storage of the per-user records: JSON strings stored by key with the version stamp of the last save
+    """
+    
+    def load(self, key):
+        """
+        @param string key
+        @return tuple (version, data) (None, None) if there is no record
+        """
+        raise NotImplementedError()
+    
+    def save(self, key, version, data):
+        """
+        @param string version The new version stamp
+        @param string data
+        """
+        raise NotImplementedError()
+
+class DatastoreStorageBackend(StorageBackend):
+    def load(self, key):
+        model = StorageModel.get_by_key_name(key)
+        if model == None:
+            return (None, None)
+        
+        return (model.version, model.data)
+    
+    def save(self, key, version, data):
+        # the whole record is replaced, so it is not read before the write
+        StorageModel(key_name = key, data = data, version = version).put()
+
+class MemoryStorageBackend(StorageBackend):
+    """
+    Stand-in for the datastore keeping the records in the process memory
+    """
+    
+    def __init__(self):
+        self.aRecords = {}
+        
+        # instrumentation
+        self.loads = 0
+        self.saves = 0
+    
+    def load(self, key):
+        self.loads += 1
+        return self.aRecords.get(key, (None, None))
+    
+    def save(self, key, version, data):
+        self.saves += 1
+        self.aRecords[key] = (version, data)
+
+class MemoryMemcache(object):
+    """
+    Stand-in for the memcache API shared by several TieredStorageBackend instances in one process
+    """
+    
+    def __init__(self):
+        self.aItems = {}
+    
+    def get(self, key):
+        return self.aItems.get(key)
+    
+    def set(self, key, value, time = 0):
+        self.aItems[key] = value
+        return True
+    
+    def add(self, key, value, time = 0):
+        if key in self.aItems:
+            return False
+        
+        self.aItems[key] = value
+        return True
+    
+    def delete(self, key):
+        if key in self.aItems:
+            del self.aItems[key]
+
+class TieredStorageBackend(StorageBackend):
+    """
+    Write-through tiers in front of the durable backend: the records of the recently active users
+    are kept in the instance memory and in memcache (the shared tier).
+    
+    Every save stamps the record with a new version kept in the shared tier under its own key,
+    so a record cached in the memory of one instance is used only while no other instance
+    has saved a newer version of it. Without the shared tier the memory tier is trusted as is,
+    which is right for a single process only.
+    """
+    
+    def __init__(self, durable, shared = None, localSize = 1000, ttl = 3600):
+        """
+        @param StorageBackend durable
+        @param shared memcache-like object: get(key), set(key, value, time), add(key, value, time) or None
+        @param int localSize Max number of records kept in the instance memory, 0 to disable the memory tier
+        @param int ttl Seconds the records are kept in the shared tier for
+        """
+        self.durable = durable
+        self.shared = shared
+        self.ttl = ttl
+        
+        if localSize > 0:
+            self.local = LruCache(localSize)
+        else:
+            self.local = None
+        
+        # instrumentation: the tier each record was loaded from
+        self.aHits = {"local": 0, "shared": 0, "durable": 0}
+    
+    def load(self, key):
+        if self.shared != None:
+            version = self.shared.get("storage-version:" + key)
+            if version != None:
+                if self.local != None:
+                    entry = self.local.get(key)
+                    if entry != None and entry[0] == version:
+                        self.aHits["local"] += 1
+                        return entry
+                
+                entry = self.shared.get("storage:" + key)
+                if entry != None and entry[0] == version:
+                    self.aHits["shared"] += 1
+                    if self.local != None:
+                        self.local.set(key, entry)
+                    return entry
+        elif self.local != None:
+            entry = self.local.get(key)
+            if entry != None:
+                self.aHits["local"] += 1
+                return entry
+        
+        self.aHits["durable"] += 1
+        (version, data) = self.durable.load(key)
+        
+        # the records saved before the version stamps and the missing ones are cached too
+        entry = (version or "", data)
+        
+        if self.local != None:
+            self.local.set(key, entry)
+        if self.shared != None:
+            # add() does not overwrite the version saved by another instance since the durable read
+            self.shared.add("storage-version:" + key, entry[0], self.ttl)
+            self.shared.set("storage:" + key, entry, self.ttl)
+        
+        return entry
+    
+    def save(self, key, version, data):
+        self.durable.save(key, version, data)
+        
+        entry = (version, data)
+        if self.local != None:
+            self.local.set(key, entry)
+        if self.shared != None:
+            self.shared.set("storage:" + key, entry, self.ttl)
+            self.shared.set("storage-version:" + key, version, self.ttl)
+
+def newVersion():
+    """
+    @return string Version stamp unique across the instances
+    """
+    return "%x-%08x" % (int(time.time() * 1000), random.getrandbits(32))
+
+# backend shared by SecureStorage and TimezonesStorage in the worker
+_defaultBackend = None
+
+def getDefaultBackend():
+    """
+    @return StorageBackend The backend created by createBackend()
+    """
+    global _defaultBackend
+    
+    if _defaultBackend == None:
+        _defaultBackend = createBackend()
+    
+    return _defaultBackend
+
+def createBackend(localSize = 1000):
+    """
+    Instance memory, memcache and datastore on Google App Engine, instance memory in front of
+    MemoryStorageBackend elsewhere
+    @param int localSize Max number of records kept in the instance memory
+    @return StorageBackend
+    """
+    if db != None:
+        return TieredStorageBackend(DatastoreStorageBackend(), memcache, localSize)
+    else:
+        return TieredStorageBackend(MemoryStorageBackend(), None, localSize)
@@ -0,0 +1,139 @@
+# coding: utf-8
+
+class TaskContext(object):
+    """
+    Tasks of the last LIST by the numbers they were shown with, starting with 1.
+    
+    Packed for the storage into parallel integer arrays: the distinct list IDs and
+    (list index, taskseries ID, task ID - taskseries ID) per task, the task ID
+    usually being close to the taskseries ID. The tasks removed from the context
+    keep their numbers and have list index -1.
+    """
+    
+    def __init__(self, aListIds = None, aTasks = None):
+        """
+        @param list aListIds Distinct list IDs
+        @param list aTasks Flat [list index, taskseries ID, task ID - taskseries ID, ...]
+        """
+        if aListIds == None:
+            aListIds = []
+        if aTasks == None:
+            aTasks = []
+        
+        self.aListIds = aListIds
+        self.aTasks = aTasks
+        self.__aListIndexes = dict([(listId, i) for (i, listId) in enumerate(aListIds)])
+    
+    @classmethod
+    def createFromTaskseries(cls, aTaskseries):
+        """
+        @param RtmApiTaskseria[] aTaskseries In the order they are shown
+        @return TaskContext
+        """
+        context = TaskContext()
+        for taskseries in aTaskseries:
+            context.append(taskseries.listId, taskseries.id, taskseries.task.id)
+        
+        return context
+    
+    @classmethod
+    def unpack(cls, data):
+        """
+        @param dict|None data As returned by pack(), or the old {"1": [listId, taskseriesId, taskId], ...} format
+        @return TaskContext
+        """
+        if data == None:
+            return TaskContext()
+        
+        if "t" in data and "l" in data:
+            return TaskContext(data["l"], data["t"])
+        
+        # the old format: IDs of the removed tasks are missing
+        context = TaskContext()
+        aNumbers = [int(number) for number in data]
+        for number in xrange(1, max(aNumbers + [0]) + 1):
+            if str(number) in data:
+                context.append(*data[str(number)])
+            else:
+                context.append(None, None, None)
+        
+        return context
+    
+    @classmethod
+    def isPacked(cls, data):
+        return data == None or ("t" in data and "l" in data)
+    
+    def pack(self):
+        """
+        @return dict JSON-serializable
+        """
+        return {"l": self.aListIds, "t": self.aTasks}
+    
+    def append(self, listId, taskseriesId, taskId):
+        if listId == None:
+            self.aTasks.extend((-1, 0, 0))
+        else:
+            taskseriesId = int(taskseriesId)
+            self.aTasks.extend((self.__listIndex(listId), taskseriesId, int(taskId) - taskseriesId))
+    
+    def get(self, number):
+        """
+        @param int|string number
+        @return tuple (listId, taskseriesId, taskId) None if there is no task with the number
+        """
+        i = self.__offset(number)
+        if i == None:
+            return None
+        
+        aTasks = self.aTasks
+        taskseriesId = aTasks[i + 1]
+        
+        return (self.aListIds[aTasks[i]], unicode(taskseriesId), unicode(taskseriesId + aTasks[i + 2]))
+    
+    def remove(self, number):
+        i = self.__offset(number)
+        if i != None:
+            self.aTasks[i:i + 3] = [-1, 0, 0]
+    
+    def moveTask(self, taskseriesId, listId):
+        """
+        Changes the list of the task wherever it is in the context
+        """
+        taskseriesId = int(taskseriesId)
+        aTasks = self.aTasks
+        
+        for i in xrange(0, len(aTasks), 3):
+            if aTasks[i + 1] == taskseriesId and aTasks[i] != -1:
+                aTasks[i] = self.__listIndex(listId)
+    
+    def count(self):
+        """
+        @return int The greatest task number, including the removed tasks
+        """
+        return len(self.aTasks) / 3
+    
+    def isEmpty(self):
+        for i in xrange(0, len(self.aTasks), 3):
+            if self.aTasks[i] != -1:
+                return False
+        
+        return True
+    
+    def __offset(self, number):
+        try:
+            i = (int(number) - 1) * 3
+        except ValueError:
+            return None
+        
+        if i < 0 or i >= len(self.aTasks) or self.aTasks[i] == -1:
+            return None
+        
+        return i
+    
+    def __listIndex(self, listId):
+        listId = unicode(listId)
+        if listId not in self.__aListIndexes:
+            self.__aListIndexes[listId] = len(self.aListIds)
+            self.aListIds.append(listId)
+        
+        return self.__aListIndexes[listId]
@@ -0,0 +1,129 @@
+# coding: utf-8
+
+"""
+Background jobs: the work the reply does not depend on is made after the reply is sent.
+A job is a JSON-serializable dict run by the handler given to the queue; the job failing
+with an exception is retried up to MAX_ATTEMPTS times.
+"""
+
+import logging
+import threading
+import time
+import Queue
+import simplejson
+
+try:
+    from google.appengine.api import taskqueue
+except ImportError:
+    try:
+        # older SDKs
+        from google.appengine.api.labs import taskqueue
+    except ImportError:
+        # not on Google App Engine
+        taskqueue = None
+
+# number of times the job is tried before it is dropped
+MAX_ATTEMPTS = 5
+
+def runJob(handler, aJob, attempt):
+    """
+    Runs the job once
+    @param callable handler Takes the job, raises an exception if it has failed
+    @param dict aJob
+    @param int attempt Number of the attempt, starting with 1
+    @return bool False if the job has failed and has to be retried
+    """
+    try:
+        handler(aJob)
+    except Exception, e:
+        if attempt >= MAX_ATTEMPTS:
+            logging.exception("job dropped after %i attempts: %r", attempt, aJob)
+            return True
+        
+        logging.warning("job failed, attempt %i: %s", attempt, e)
+        return False
+    
+    return True
+
+class TaskQueue(object):
+    def __init__(self, handler):
+        """
+        @param callable handler Takes the job, raises an exception if it has failed
+        """
+        self.handler = handler
+    
+    def enqueue(self, aJob):
+        """
+        @param dict aJob JSON-serializable
+        """
+        raise NotImplementedError()
+
+class GaeTaskQueue(TaskQueue):
+    """
+    Google App Engine task queue. The jobs are posted to URL, whose request handler runs them
+    with runJob() and answers with an error to make the task queue retry the job later.
+    """
+    
+    URL = "/_tasks/rtm"
+    
+    # request header with the number of the previous attempts
+    RETRY_COUNT_HEADER = "X-AppEngine-TaskRetryCount"
+    
+    def enqueue(self, aJob):
+        taskqueue.add(url = GaeTaskQueue.URL, payload = simplejson.dumps(aJob))
+
+class LocalTaskQueue(TaskQueue):
+    """
+    In-process stand-in for the task queue: one worker thread runs the jobs in the order they
+    were enqueued, waiting before the next attempt of the failed job.
+    """
+    
+    def __init__(self, handler, retryDelay = 1.0):
+        """
+        @param float retryDelay Seconds before the second attempt, doubled for every following one
+        """
+        TaskQueue.__init__(self, handler)
+        self.retryDelay = retryDelay
+        self.__queue = Queue.Queue()
+        self.__worker = None
+        self.__lock = threading.Lock()
+    
+    def enqueue(self, aJob):
+        # the job is serialized like the one of the task queue, so it shares nothing with the caller
+        self.__queue.put(simplejson.dumps(aJob))
+        
+        self.__lock.acquire()
+        try:
+            if self.__worker == None:
+                self.__worker = threading.Thread(target = self.__work)
+                self.__worker.setDaemon(True)
+                self.__worker.start()
+        finally:
+            self.__lock.release()
+    
+    def join(self):
+        """
+        Waits until all the enqueued jobs are done or dropped
+        """
+        self.__queue.join()
+    
+    def __work(self):
+        while True:
+            aJob = simplejson.loads(self.__queue.get())
+            try:
+                attempt = 1
+                while not runJob(self.handler, aJob, attempt):
+                    time.sleep(self.retryDelay * 2 ** (attempt - 1))
+                    attempt += 1
+            finally:
+                self.__queue.task_done()
+
+def createQueue(handler):
+    """
+    @param callable handler Takes the job, raises an exception if it has failed
+    @return TaskQueue The task queue on Google App Engine, LocalTaskQueue elsewhere
+    """
+    if taskqueue != None:
+        return GaeTaskQueue(handler)
+    else:
+        return LocalTaskQueue(handler)
@@ -0,0 +1,216 @@
+# coding: utf-8
+
+from RtmApi import RtmApiList, RtmApiTaskseria, is_array
+from StorageBackend import createBackend, newVersion
+from hashlib import md5
+import simplejson
+import zlib
+import base64
+import time
+import re
+
+# the whole result is requested again after this number of seconds to recover from any drift
+MAX_AGE = 24 * 3600
+
+# last_sync is moved back by this number of seconds to tolerate the clock difference with RTM
+SYNC_OVERLAP = 60
+
+# number of records the mirrors of each user are kept in, the filters share them by their hash
+MIRRORS_PER_USER = 4
+
+# max size of the stored mirror and of the pages of a LIST: the datastore entity and the memcache value are limited
+# to 1 MB, the list of the bigger mirror is requested from RTM as a whole every time
+MAX_RECORD_SIZE = 900 * 1024
+
+# filters depending on the current time: their result changes even when no task was modified
+_rTimeDependentFilter = re.compile(ur"(?:^|[\s(])(?:due|dueBefore|dueAfter|dueWithin|added|addedBefore|addedAfter|addedWithin|"
+                                   ur"completed|completedBefore|completedAfter|completedWithin|postponed)\s*:", re.IGNORECASE)
+
+# records of the mirrors, base64 encoded zlib compressed JSON:
+#     {"filter": string, "lastSync": string, "created": timestamp, "aTaskseries": {taskseriesId: [listId, raw taskseries]},
+#      "aSynced": {taskseriesId: "listId/modified" or "deleted" as returned by the last sync}}
+# or "" for the mirror grown too big
+# and the records of the pages of the last LIST of each user, encoded the same way:
+#     {"filter": string, "mirror": version of its record, "aIds": [taskseriesId, ...]} for the result in the mirror,
+#     {"aTaskseries": [[listId, raw taskseries], ...]} otherwise
+# The mirrors go through StorageBackend like the user records: the memcache tier serves the LIST of the active users,
+# and outside of App Engine MemoryStorageBackend keeps them. StorageModel keeps text, hence base64, a third bigger
+# (MAX_RECORD_SIZE is the encoded size).
+# The mirrors are big, so few of them are kept in the instance memory.
+backend = createBackend(localSize = 20)
+
+def getList(rtmApi, userKey, filter):
+    """
+    Returns the result of rtm.tasks.getList for the filter from the user's mirror of it.
+    The mirror is refreshed with the tasks modified since the previous call (last_sync).
+    The result of the filter depending on the current time is not stored: it is requested as a whole anyway.
+    @param RtmApi rtmApi
+    @param string userKey
+    @param string filter
+    @return tuple (RtmApiList[], version of the record of the mirror holding the result or None if it is not stored)
+    """
+    key = _key(userKey, filter)
+    (version, data) = backend.load(key)
+    
+    now = time.time()
+    syncTime = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(now - SYNC_OVERLAP))
+    timeDependent = _rTimeDependentFilter.search(filter) != None
+    
+    if not data or timeDependent:
+        mirror = None
+    else:
+        mirror = _unpack(data)
+        if mirror.get("filter") != filter or not 0 <= now - mirror["created"] <= MAX_AGE:
+            mirror = None
+    
+    stored = mirror != None
+    
+    if mirror == None:
+        mirror = {"filter": filter, "lastSync": syncTime, "created": now, "aTaskseries": {}, "aSynced": {}}
+        _merge(mirror["aTaskseries"], rtmApi.taskGetList(filter = filter, raw = True))
+        changed = True
+    else:
+        changed = _sync(rtmApi, mirror, filter)
+        if changed:
+            mirror["lastSync"] = syncTime
+    
+    if timeDependent:
+        version = None
+    elif changed:
+        packed = _pack(mirror)
+        if len(packed) <= MAX_RECORD_SIZE:
+            version = newVersion()
+            backend.save(key, version, packed)
+        else:
+            if stored:
+                # the mirror has outgrown the record, it is not synced again
+                backend.save(key, newVersion(), "")
+            version = None
+    
+    return (_toLists(mirror["aTaskseries"]), version)
+
+def _sync(rtmApi, mirror, filter):
+    """
+    Applies the changes made since the last sync to the mirror
+    @return bool False if nothing has changed
+    """
+    
+    # all the tasks modified or deleted since the last sync
+    aSynced = {}
+    for list in rtmApi.taskGetList(lastSync = mirror["lastSync"], raw = True):
+        for taskseries in list.get("taskseries", []):
+            aSynced[taskseries["id"]] = list["id"] + u"/" + taskseries["modified"]
+        
+        if "deleted" in list and "taskseries" in list["deleted"]:
+            aDeleted = list["deleted"]["taskseries"]
+            if not is_array(aDeleted):
+                aDeleted = [aDeleted]
+            for taskseries in aDeleted:
+                aSynced[taskseries["id"]] = u"deleted"
+    
+    # tasks returned once again because of SYNC_OVERLAP have not changed
+    aIds = [id for id in aSynced if mirror["aSynced"].get(id) != aSynced[id]]
+    if len(aIds) == 0:
+        return False
+    
+    # modified tasks may have stopped matching the filter: drop them and add back the ones still matching
+    aTaskseries = mirror["aTaskseries"]
+    for id in aIds:
+        if id in aTaskseries:
+            del aTaskseries[id]
+    
+    _merge(aTaskseries, rtmApi.taskGetList(filter = filter, lastSync = mirror["lastSync"], raw = True))
+    
+    mirror["aSynced"] = aSynced
+    
+    return True
+
+def _merge(aTaskseries, aLists):
+    for list in aLists:
+        for taskseries in list.get("taskseries", []):
+            aTaskseries[taskseries["id"]] = [list["id"], taskseries]
+
+def _toLists(aTaskseries):
+    return [RtmApiList.createFromRaw({"id": listId, "taskseries": aListTaskseries}) for (listId, aListTaskseries) in _groupByList(aTaskseries)]
+
+def _groupByList(aTaskseries):
+    """
+    @param dict aTaskseries {taskseriesId: [listId, taskseries]}
+    @return list [(listId, [taskseries, ...]), ...]
+    """
+    aByList = {}
+    for (listId, taskseries) in aTaskseries.itervalues():
+        aByList.setdefault(listId, []).append(taskseries)
+    
+    return aByList.items()
+
+def savePages(userKey, filter, mirror, aTaskseries):
+    """
+    Keeps the tasks shown by LIST in their order for MORE, which takes the next pages from them
+    without querying RTM again: the pages neither repeat nor skip tasks when the list changes.
+    The IDs are enough for the tasks in the stored mirror, the other lists are kept as a whole.
+    @param string userKey
+    @param string filter
+    @param string|None mirror Version of the mirror holding the tasks as returned by getList()
+    @param RtmApiTaskseria[] aTaskseries Sorted
+    @return tuple (version of the record, number of tasks kept), the tasks beyond MAX_RECORD_SIZE are not kept
+    """
+    if mirror != None:
+        pages = {"filter": filter, "mirror": mirror, "aIds": [taskseries.id for taskseries in aTaskseries]}
+        packed = _pack(pages)
+    else:
+        aPages = [[taskseries.listId, taskseries.toRaw()] for taskseries in aTaskseries]
+        packed = _pack({"aTaskseries": aPages})
+        while len(packed) > MAX_RECORD_SIZE:
+            aPages = aPages[:len(aPages) / 2]
+            packed = _pack({"aTaskseries": aPages})
+        aTaskseries = aPages
+    
+    version = newVersion()
+    backend.save(_pagesKey(userKey), version, packed)
+    
+    return (version, len(aTaskseries))
+
+def loadPages(userKey, version, start, end):
+    """
+    @param string userKey
+    @param string version As returned by savePages()
+    @param int start
+    @param int end
+    @return RtmApiTaskseria[]|None The tasks kept by savePages() from start to end, None if the record or the mirror
+                                   it refers to is lost or was replaced
+    """
+    (stored, data) = backend.load(_pagesKey(userKey))
+    if stored != version or not data:
+        return None
+    
+    pages = _unpack(data)
+    if "aIds" in pages:
+        (stored, data) = backend.load(_key(userKey, pages["filter"]))
+        if stored != pages["mirror"] or not data:
+            return None
+        
+        aTaskseries = _unpack(data)["aTaskseries"]
+        aPage = [aTaskseries[id] for id in pages["aIds"][start:end]]
+    else:
+        aPage = pages["aTaskseries"][start:end]
+    
+    return [RtmApiTaskseria.createFromRaw(taskseries, listId) for (listId, taskseries) in aPage]
+
+def _pack(o):
+    return base64.b64encode(zlib.compress(simplejson.dumps(o, separators = (",", ":"))))
+
+def _unpack(data):
+    return simplejson.loads(_inflate(data))
+
+def _inflate(data):
+    return zlib.decompress(base64.b64decode(data))
+
+def _key(userKey, filter):
+    """
+    @return string The key of the record the user's mirror of the filter is kept in, one of MIRRORS_PER_USER
+    """
+    return "mirror:%s:%i" % (userKey, int(md5(filter.encode("utf-8")).hexdigest()[:8], 16) % MIRRORS_PER_USER)
+
+def _pagesKey(userKey):
+    return "pages:%s" % userKey
@@ -1,27 +1,79 @@
 # coding: utf-8
 
-from google.appengine.ext.db import Model, TextProperty, DateTimeProperty
+from RtmApi import RtmApiTimezone
+from StorageBackend import getDefaultBackend, newVersion
 import simplejson
-import datetime
+import time
+import Tracing
 
-class TimezoneStorageModel(Model):
-    data = TextProperty()
-    lastUpdated = DateTimeProperty(auto_now = True)
-    
-def getTimezones(rtmApi):
-    model = TimezoneStorageModel.get_or_insert("2")
+# number of seconds the list of timezones is used before it is requested from RTM again
+TTL = 3600
+
+# record of the storage backend: {"lastUpdated": timestamp, "aTimezones": raw list of timezones}
+# The list goes through StorageBackend like the user records: its memcache tier spares the instances starting
+# cold a datastore read, and outside of App Engine (benchmarks, local runs) MemoryStorageBackend keeps it.
+# The record replaced the TimezoneStorageModel entity "2", which is not read any more.
+KEY = "timezones:2"
+
+# timezones parsed by this instance, shared by all the requests it serves
+_cache = {"aTimezones": None, "lastUpdated": None}
+
+def isFresh(lastUpdated, now, ttl = TTL):
+    """
+    A list updated in the future (the clock went backwards) is not fresh, otherwise it would be
+    used until the clock catches up.
+    @param float|None lastUpdated timestamp
+    @param float now timestamp
+    @param int ttl seconds
+    @return bool
+    """
+    if lastUpdated == None:
+        return False
     
-    if (datetime.datetime.now() - model.lastUpdated).seconds > 3600:
-        model.data = None
+    return 0 <= now - lastUpdated < ttl
 
-    if model.data == None:
-        aTimezonesRaw = rtmApi.timezonesGetList(raw = True)
-        model.data = simplejson.dumps(aTimezonesRaw)
-        model.put()
-    else:
-        aTimezonesRaw = simplejson.loads(model.data)
+def getTimezones(rtmApi, cachedOnly = False):
+    """
+    Returns the list of timezones with the RtmApiTimezone name index already built.
+    The list is taken from the instance cache, then from the storage backend and only then from RTM.
+    @param bool cachedOnly Return None instead of requesting RTM if there is no fresh list stored
+    @return RtmApiTimezone[]|None
+    """
+    now = time.time()
+    
+    if _cache["aTimezones"] != None and isFresh(_cache["lastUpdated"], now):
+        return _cache["aTimezones"]
+    
+    span = Tracing.span("timezones.load", source = "storage")
+    try:
+        backend = getDefaultBackend()
+        (version, data) = backend.load(KEY)
         
-    aTimezones = rtmApi.timezonesGetList(fromRaw = aTimezonesRaw)
+        stored = None
+        if data != None:
+            stored = simplejson.loads(data)
+        
+        if stored == None or not isFresh(stored["lastUpdated"], now):
+            if cachedOnly:
+                span.set("source", "none")
+                return None
+            
+            span.set("source", "rtm")
+            stored = {"lastUpdated": now, "aTimezones": rtmApi.timezonesGetList(raw = True)}
+            backend.save(KEY, newVersion(), simplejson.dumps(stored))
+        
+        aTimezonesRaw = stored["aTimezones"]
+        
+        aTimezones = rtmApi.timezonesGetList(fromRaw = aTimezonesRaw)
+        RtmApiTimezone.setTimezones(aTimezones)
+    except:
+        Tracing.setError(span)
+        raise
+    finally:
+        span.finish()
+    
+    # the instance cache expires together with the stored copy
+    _cache["aTimezones"] = aTimezones
+    _cache["lastUpdated"] = stored["lastUpdated"]
     
     return aTimezones
-
@@ -0,0 +1,216 @@
+# coding: utf-8
+
+"""
+Per-message tracing: the spans of a traced message (storage, RTM requests, rendering...) are
+logged as one structured record when the trace ends and their durations are added to the
+per-instance statistics reported by the admin STATS command.
+
+Only the SAMPLE_RATE fraction of the messages is traced; for the others span() returns a span
+doing nothing, so the instrumented code costs a function call.
+"""
+
+import sys
+import time
+import random
+import logging
+import simplejson
+
+# fraction of the messages traced
+SAMPLE_RATE = 0.1
+
+# number of the latest durations kept per span name for the percentiles
+STATS_SIZE = 1000
+
+class Span(object):
+    sampled = True
+    
+    def __init__(self, trace, name, aAttributes):
+        self.trace = trace
+        self.name = name
+        self.aAttributes = aAttributes
+        self.start = time.time()
+        self.duration = None
+    
+    def set(self, name, value):
+        self.aAttributes[name] = value
+    
+    def elapsed(self):
+        """
+        @return float Seconds since the span has started
+        """
+        return time.time() - self.start
+    
+    def finish(self, **aAttributes):
+        """
+        @param aAttributes Added to the attributes of the span
+        @return float Duration in seconds
+        """
+        self.duration = time.time() - self.start
+        self.aAttributes.update(aAttributes)
+        self.trace.record(self)
+        
+        return self.duration
+    
+    def getStatsName(self):
+        """
+        @return string The name the duration is counted under: the span name and the RTM method if any,
+                       the RTM calls answered by the cache or looking it up only apart from the requests
+        """
+        name = self.name
+        if "method" in self.aAttributes:
+            name += ":" + self.aAttributes["method"]
+        if "cache" in self.aAttributes:
+            name += ":cache"
+        
+        return name
+
+class NullSpan(object):
+    """
+    Span of the message not traced
+    """
+    
+    sampled = False
+    
+    def set(self, name, value):
+        pass
+    
+    def elapsed(self):
+        return 0.0
+    
+    def finish(self, **aAttributes):
+        return 0.0
+
+class Trace(object):
+    def __init__(self, name):
+        self.id = "%08x" % random.getrandbits(32)
+        self.aSpans = []
+        self.root = Span(self, name, {})
+    
+    def record(self, span):
+        self.aSpans.append(span)
+        stats.add(span.getStatsName(), span.duration)
+    
+    def toJson(self):
+        aSpans = []
+        for span in self.aSpans:
+            aSpan = {"name": span.name, "ms": round(span.duration * 1000, 1), "at": round((span.start - self.root.start) * 1000, 1)}
+            aSpan.update(span.aAttributes)
+            aSpans.append(aSpan)
+        
+        return simplejson.dumps({"trace": self.id, "spans": aSpans}, separators = (",", ":"))
+
+class TraceStats(object):
+    """
+    Count and percentiles of the latest durations per span name
+    """
+    
+    def __init__(self, size = STATS_SIZE):
+        self.size = size
+        # name -> [count, [latest durations], index of the next one to replace]
+        self.aSamples = {}
+    
+    def add(self, name, seconds):
+        if name not in self.aSamples:
+            self.aSamples[name] = [0, [], 0]
+        
+        sample = self.aSamples[name]
+        sample[0] += 1
+        if len(sample[1]) < self.size:
+            sample[1].append(seconds)
+        else:
+            sample[1][sample[2]] = seconds
+            sample[2] = (sample[2] + 1) % self.size
+    
+    def getPercentile(self, name, percent):
+        """
+        @return float|None Seconds
+        """
+        if name not in self.aSamples:
+            return None
+        
+        aDurations = sorted(self.aSamples[name][1])
+        return aDurations[min(len(aDurations) - 1, int(len(aDurations) * percent / 100.0))]
+    
+    def getCount(self, name):
+        if name not in self.aSamples:
+            return 0
+        
+        return self.aSamples[name][0]
+    
+    def report(self):
+        """
+        @return string One line per span name: count, p50 and p95 in milliseconds
+        """
+        aLines = [u"%-40s %7s %9s %9s" % (u"span", u"count", u"p50 ms", u"p95 ms")]
+        for name in sorted(self.aSamples):
+            aLines.append(u"%-40s %7i %9.1f %9.1f" % (name, self.getCount(name), self.getPercentile(name, 50) * 1000, self.getPercentile(name, 95) * 1000))
+        
+        return u"\n".join(aLines)
+    
+    def clear(self):
+        self.aSamples = {}
+
+# statistics of the instance
+stats = TraceStats()
+
+# trace of the message being processed, None if it is not traced
+_current = None
+
+def beginTrace(name, sampleRate = None):
+    """
+    Starts the trace of the message, if it is sampled
+    @param string name Name of the root span
+    @param float sampleRate SAMPLE_RATE by default
+    @return Span|NullSpan The root span
+    """
+    global _current
+    
+    if sampleRate == None:
+        sampleRate = SAMPLE_RATE
+    
+    if random.random() < sampleRate:
+        _current = Trace(name)
+        return _current.root
+    else:
+        _current = None
+        return NullSpan()
+
+def endTrace(**aAttributes):
+    """
+    Finishes the root span and logs the trace
+    """
+    global _current
+    
+    if _current != None:
+        _current.root.finish(**aAttributes)
+        logging.info("trace %s", _current.toJson())
+        _current = None
+
+def setError(span):
+    """
+    Marks the span interrupted by the exception being handled with its class, so the failed calls are traced too:
+        
+        try:
+            ...
+        except:
+            Tracing.setError(span)
+            raise
+        finally:
+            span.finish()
+    
+    @param Span|NullSpan span
+    """
+    span.set("error", sys.exc_info()[0].__name__)
+
+def span(name, **aAttributes):
+    """
+    @param string name
+    @param aAttributes JSON-serializable attributes of the span
+    @return Span|NullSpan
+    """
+    if _current == None:
+        return _nullSpan
+    
+    return Span(_current, name, aAttributes)
+
+_nullSpan = NullSpan()
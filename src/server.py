@@ -1,29 +1,68 @@
 # coding: utf-8
 
+from __future__ import with_statement
 from google.appengine.api import xmpp
 from google.appengine.ext import webapp
 from google.appengine.ext.webapp.util import run_wsgi_app
-from RtmBot import RtmBot
+from RtmBot import RtmBot, runDeferredJob
+from RtmApi import RtmApi
+import TaskQueue
+import simplejson
 import Config
 from SecureStorage import SecureStorage
+import Tracing
 import logging
 import re
 
+# fraction of the messages traced, see Tracing
+Tracing.SAMPLE_RATE = getattr(Config, "TRACE_SAMPLE_RATE", Tracing.SAMPLE_RATE)
+
+def runJob(aJob):
+    runDeferredJob(RtmApi(Config.API_KEY, Config.API_SECRET), aJob)
+
+# RTM calls made after the reply is sent, see RtmBot.queue
+if getattr(Config, "DEFERRED_CALLS", False):
+    queue = TaskQueue.createQueue(runJob)
+else:
+    queue = None
+
 class XMPPHandler(webapp.RequestHandler):
     def post(self):
-        message = xmpp.Message(self.request.POST)
-        
-        storage = SecureStorage(re.sub(r"/.+$", "",message.sender))
+        root = Tracing.beginTrace("xmpp.post")
+        try:
+            message = xmpp.Message(self.request.POST)
+            
+            with SecureStorage(re.sub(r"/.+$", "",message.sender)) as storage:
+                bot = RtmBot(Config.API_KEY, Config.API_SECRET, Config.ADMIN_JID, storage, queue)
+                reply = bot.processCommand(message.body)
+            
+            # once the storage is flushed: a message whose changes were rolled back leaves no calls behind
+            bot.enqueueDeferred()
+            
+            logging.debug("storage: %i put(s), %i byte(s) written", storage.putCount, storage.bytesWritten)
+            
+            message.reply(reply)
+        except:
+            Tracing.setError(root)
+            raise
+        finally:
+            Tracing.endTrace()
+
+class TaskQueueHandler(webapp.RequestHandler):
+    def post(self):
+        attempt = int(self.request.headers.get(TaskQueue.GaeTaskQueue.RETRY_COUNT_HEADER, 0)) + 1
         
-        bot = RtmBot(Config.API_KEY, Config.API_SECRET, Config.ADMIN_JID, storage)
-        message.reply(bot.processCommand(message.body))
+        if not TaskQueue.runJob(runJob, simplejson.loads(self.request.body), attempt):
+            # the task queue retries the job later
+            self.error(500)
 
-application = webapp.WSGIApplication([('/_ah/xmpp/message/chat/', XMPPHandler)],
+application = webapp.WSGIApplication([('/_ah/xmpp/message/chat/', XMPPHandler),
+                                      (TaskQueue.GaeTaskQueue.URL, TaskQueueHandler)],
                                      debug=True)
 
 def main():
     logging.getLogger().setLevel(logging.DEBUG)
-
+    
     run_wsgi_app(application)
 
 if __name__ == "__main__":
@@ -101,15 +101,16 @@ __version__ = '2.1.1'
 __all__ = [
     'dump', 'dumps', 'load', 'loads',
     'JSONDecoder', 'JSONDecodeError', 'JSONEncoder',
-    'OrderedDict',
+    'OrderedDict', 'JSONEventParser', 'iterevents', 'InternTable',
 ]
 
 __author__ = 'Bob Ippolito <bob@redivi.com>'
 
 from decimal import Decimal
 
-from decoder import JSONDecoder, JSONDecodeError
+from decoder import JSONDecoder, JSONDecodeError, InternTable
 from encoder import JSONEncoder
+from incremental import JSONEventParser, iterevents
 def _import_OrderedDict():
     import collections
     try:
@@ -407,16 +408,16 @@ def _toggle_speedups(enabled):
     import simplejson.scanner as scan
     c_make_encoder = _import_c_make_encoder()
     if enabled:
-        dec.scanstring = dec.c_scanstring or dec.py_scanstring
+        dec.scanstring = dec.c_scanstring or dec.py_fast_scanstring
         enc.c_make_encoder = c_make_encoder
         enc.encode_basestring_ascii = (enc.c_encode_basestring_ascii or 
             enc.py_encode_basestring_ascii)
-        scan.make_scanner = scan.c_make_scanner or scan.py_make_scanner
+        scan.make_scanner = scan.c_make_scanner or scan.py_make_fast_scanner
     else:
-        dec.scanstring = dec.py_scanstring
+        dec.scanstring = dec.py_fast_scanstring
         enc.c_make_encoder = None
         enc.encode_basestring_ascii = enc.py_encode_basestring_ascii
-        scan.make_scanner = scan.py_make_scanner
+        scan.make_scanner = scan.py_make_fast_scanner
     dec.make_scanner = scan.make_scanner
     global _default_decoder
     _default_decoder = JSONDecoder(
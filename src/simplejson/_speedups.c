@@ -57,6 +57,8 @@ typedef struct _PyScannerObject {
     PyObject *parse_int;
     PyObject *parse_constant;
     PyObject *memo;
+    PyObject *intern;
+    Py_ssize_t intern_max_length;
 } PyScannerObject;
 
 static PyMemberDef scanner_members[] = {
@@ -935,6 +937,7 @@ scanner_traverse(PyObject *self, visitproc visit, void *arg)
     Py_VISIT(s->parse_int);
     Py_VISIT(s->parse_constant);
     Py_VISIT(s->memo);
+    Py_VISIT(s->intern);
     return 0;
 }
 
@@ -952,9 +955,50 @@ scanner_clear(PyObject *self)
     Py_CLEAR(s->parse_int);
     Py_CLEAR(s->parse_constant);
     Py_CLEAR(s->memo);
+    Py_CLEAR(s->intern);
     return 0;
 }
 
+static PyObject *
+_memo_string(PyScannerObject *s, PyObject *str)
+{
+    /* Return the string of the document equal to str, the one of the
+    intern table on its first occurrence if the scanner has one.
+    Steals the reference to str. */
+    PyObject *memostr = PyDict_GetItem(s->memo, str);
+    if (memostr != NULL) {
+        Py_INCREF(memostr);
+        Py_DECREF(str);
+        return memostr;
+    }
+    if (s->intern != Py_None) {
+        memostr = PyObject_CallMethod(s->intern, "intern", "O", str);
+        Py_DECREF(str);
+        if (memostr == NULL)
+            return NULL;
+        str = memostr;
+    }
+    if (PyDict_SetItem(s->memo, str, str) < 0) {
+        Py_DECREF(str);
+        return NULL;
+    }
+    return str;
+}
+
+static PyObject *
+_memo_value(PyScannerObject *s, PyObject *value)
+{
+    /* Memoize the string value like the keys if it is short enough for
+    the intern table. Steals the reference to value. */
+    Py_ssize_t length;
+    if (value == NULL || s->intern == Py_None)
+        return value;
+    length = PyString_Check(value) ? PyString_GET_SIZE(value) : PyUnicode_GET_SIZE(value);
+    if (length > s->intern_max_length)
+        return value;
+    return _memo_string(s, value);
+}
+
 static PyObject *
 _parse_object_str(PyScannerObject *s, PyObject *pystr, Py_ssize_t idx, Py_ssize_t *next_idx_ptr) {
     /* Read a JSON object from PyString pystr.
@@ -993,8 +1037,6 @@ _parse_object_str(PyScannerObject *s, PyObject *pystr, Py_ssize_t idx, Py_ssize_
     /* only loop if the object is non-empty */
     if (idx <= end_idx && str[idx] != '}') {
         while (idx <= end_idx) {
-            PyObject *memokey;
-
             /* read key */
             if (str[idx] != '"') {
                 raise_errmsg("Expecting property name", pystr, idx);
@@ -1003,16 +1045,9 @@ _parse_object_str(PyScannerObject *s, PyObject *pystr, Py_ssize_t idx, Py_ssize_
             key = scanstring_str(pystr, idx + 1, encoding, strict, &next_idx);
             if (key == NULL)
                 goto bail;
-            memokey = PyDict_GetItem(s->memo, key);
-            if (memokey != NULL) {
-                Py_INCREF(memokey);
-                Py_DECREF(key);
-                key = memokey;
-            }
-            else {
-                if (PyDict_SetItem(s->memo, key, key) < 0)
-                    goto bail;
-            }
+            key = _memo_string(s, key);
+            if (key == NULL)
+                goto bail;
             idx = next_idx;
 
             /* skip whitespace between key and : delimiter, read :, skip whitespace */
@@ -1139,8 +1174,6 @@ _parse_object_unicode(PyScannerObject *s, PyObject *pystr, Py_ssize_t idx, Py_ss
     /* only loop if the object is non-empty */
     if (idx <= end_idx && str[idx] != '}') {
         while (idx <= end_idx) {
-            PyObject *memokey;
-
             /* read key */
             if (str[idx] != '"') {
                 raise_errmsg("Expecting property name", pystr, idx);
@@ -1149,16 +1182,9 @@ _parse_object_unicode(PyScannerObject *s, PyObject *pystr, Py_ssize_t idx, Py_ss
             key = scanstring_unicode(pystr, idx + 1, strict, &next_idx);
             if (key == NULL)
                 goto bail;
-            memokey = PyDict_GetItem(s->memo, key);
-            if (memokey != NULL) {
-                Py_INCREF(memokey);
-                Py_DECREF(key);
-                key = memokey;
-            }
-            else {
-                if (PyDict_SetItem(s->memo, key, key) < 0)
-                    goto bail;
-            }
+            key = _memo_string(s, key);
+            if (key == NULL)
+                goto bail;
             idx = next_idx;
 
             /* skip whitespace between key and : delimiter, read :, skip whitespace */
@@ -1632,10 +1658,10 @@ scan_once_str(PyScannerObject *s, PyObject *pystr, Py_ssize_t idx, Py_ssize_t *n
     switch (str[idx]) {
         case '"':
             /* string */
-            return scanstring_str(pystr, idx + 1,
+            return _memo_value(s, scanstring_str(pystr, idx + 1,
                 PyString_AS_STRING(s->encoding),
                 PyObject_IsTrue(s->strict),
-                next_idx_ptr);
+                next_idx_ptr));
         case '{':
             /* object */
             return _parse_object_str(s, pystr, idx + 1, next_idx_ptr);
@@ -1708,9 +1734,9 @@ scan_once_unicode(PyScannerObject *s, PyObject *pystr, Py_ssize_t idx, Py_ssize_
     switch (str[idx]) {
         case '"':
             /* string */
-            return scanstring_unicode(pystr, idx + 1,
+            return _memo_value(s, scanstring_unicode(pystr, idx + 1,
                 PyObject_IsTrue(s->strict),
-                next_idx_ptr);
+                next_idx_ptr));
         case '{':
             /* object */
             return _parse_object_unicode(s, pystr, idx + 1, next_idx_ptr);
@@ -1792,6 +1818,14 @@ scanner_call(PyObject *self, PyObject *args, PyObject *kwds)
         return NULL;
     }
     PyDict_Clear(s->memo);
+    if (s->intern != Py_None) {
+        PyObject *ended = PyObject_CallMethod(s->intern, "end_document", NULL);
+        if (ended == NULL) {
+            Py_XDECREF(rval);
+            return NULL;
+        }
+        Py_DECREF(ended);
+    }
     return _build_rval_index_tuple(rval, next_idx);
 }
 
@@ -1808,6 +1842,7 @@ scanner_new(PyTypeObject *type, PyObject *args, PyObject *kwds)
         s->parse_float = NULL;
         s->parse_int = NULL;
         s->parse_constant = NULL;
+        s->intern = NULL;
     }
     return (PyObject *)s;
 }
@@ -1867,6 +1902,24 @@ scanner_init(PyObject *self, PyObject *args, PyObject *kwds)
     s->parse_constant = PyObject_GetAttrString(ctx, "parse_constant");
     if (s->parse_constant == NULL)
         goto bail;
+    /* the intern table is optional, contexts without one have no interning */
+    s->intern = PyObject_GetAttrString(ctx, "intern");
+    if (s->intern == NULL) {
+        if (!PyErr_ExceptionMatches(PyExc_AttributeError))
+            goto bail;
+        PyErr_Clear();
+        Py_INCREF(Py_None);
+        s->intern = Py_None;
+    }
+    if (s->intern != Py_None) {
+        PyObject *max_length = PyObject_GetAttrString(s->intern, "max_length");
+        if (max_length == NULL)
+            goto bail;
+        s->intern_max_length = PyInt_AsSsize_t(max_length);
+        Py_DECREF(max_length);
+        if (s->intern_max_length == -1 && PyErr_Occurred())
+            goto bail;
+    }
 
     return 0;
 
@@ -1878,6 +1931,7 @@ bail:
     Py_CLEAR(s->parse_float);
     Py_CLEAR(s->parse_int);
     Py_CLEAR(s->parse_constant);
+    Py_CLEAR(s->intern);
     return -1;
 }
 
@@ -3,6 +3,8 @@
 import re
 import sys
 import struct
+import heapq
+from operator import itemgetter
 
 from simplejson.scanner import make_scanner
 def _import_c_scanstring():
@@ -13,7 +15,7 @@ def _import_c_scanstring():
         return None
 c_scanstring = _import_c_scanstring()
 
-__all__ = ['JSONDecoder']
+__all__ = ['JSONDecoder', 'InternTable']
 
 FLAGS = re.VERBOSE | re.MULTILINE | re.DOTALL
 
@@ -171,8 +173,27 @@ def py_scanstring(s, end, encoding=None, strict=True,
     return u''.join(chunks), end
 
 
+PLAINSTRING = re.compile(r'([^"\\\x00-\x1f]*)"', FLAGS)
+
+def py_fast_scanstring(s, end, encoding=None, strict=True,
+        _m=PLAINSTRING.match):
+    """Same as :func:`py_scanstring`, but the strings without escape
+    sequences and control characters, nearly all of them in compact ASCII
+    JSON, are matched in one step. The others are scanned by
+    :func:`py_scanstring`."""
+    chunk = _m(s, end)
+    if chunk is None:
+        return py_scanstring(s, end, encoding, strict)
+    content = chunk.group(1)
+    if not isinstance(content, unicode):
+        if encoding is None:
+            encoding = DEFAULT_ENCODING
+        content = unicode(content, encoding)
+    return content, chunk.end()
+
+
 # Use speedup if available
-scanstring = c_scanstring or py_scanstring
+scanstring = c_scanstring or py_fast_scanstring
 
 WHITESPACE = re.compile(r'[ \t\n\r]*', FLAGS)
 WHITESPACE_STR = ' \t\n\r'
@@ -305,6 +326,95 @@ def JSONArray((s, end), scan_once, _w=WHITESPACE.match, _ws=WHITESPACE_STR):
 
     return values, end
 
+class InternTable(object):
+    """Table of the strings shared by all the documents decoded with it
+
+    Object keys, and string values of at most *max_length* characters, are
+    looked up in the table on their first occurrence in a document, so equal
+    strings decoded from different documents are one object (``"id"``,
+    ``"N"``, ``""`` of thousands of records kept in memory at once). The
+    table holds at most *maxsize* strings: once it is full, the strings that
+    have not occurred for the most documents are evicted first.
+
+        >>> from simplejson import loads, InternTable
+        >>> table = InternTable()
+        >>> a = loads('[{"priority": "N"}]', intern=table)
+        >>> b = loads('[{"priority": "N"}]', intern=table)
+        >>> a[0].keys()[0] is b[0].keys()[0], a[0]['priority'] is b[0]['priority']
+        (True, True)
+
+    """
+
+    def __init__(self, maxsize=10000, max_length=16):
+        self.maxsize = maxsize
+        self.max_length = max_length
+        self.strings = {}
+        # string -> number of the document it occurred in last
+        self.last_used = {}
+        self.documents = 0
+
+    def intern(self, s):
+        """Return the string of the table equal to *s*, adding *s* if there
+        is none
+
+        """
+        s = self.strings.setdefault(s, s)
+        self.last_used[s] = self.documents
+        return s
+
+    def end_document(self):
+        """Called once a document is decoded, evicts the least recently used
+        strings from the full table
+
+        """
+        self.documents += 1
+        excess = len(self.strings) - self.maxsize
+        if excess > 0:
+            # an eighth more, so the table is not sorted for every document
+            self.evict(excess + self.maxsize // 8)
+
+    def evict(self, count):
+        """Evict the *count* least recently used strings"""
+        last_used = self.last_used
+        strings = self.strings
+        # items() rather than iteritems(): the table may be shared by threads
+        for s, document in heapq.nsmallest(count, last_used.items(),
+                key=itemgetter(1)):
+            last_used.pop(s, None)
+            strings.pop(s, None)
+
+    def __len__(self):
+        return len(self.strings)
+
+    def __contains__(self, s):
+        return s in self.strings
+
+
+class InternMemo(dict):
+    """Memo of the strings of one document, filled from the
+    :class:`InternTable` on their first occurrence. Used in place of the
+    plain ``dict`` memo of :class:`JSONDecoder`.
+
+    """
+
+    def __init__(self, table):
+        dict.__init__(self)
+        self.table = table
+        self.max_length = table.max_length
+
+    def __missing__(self, s):
+        s = self.table.intern(s)
+        self[s] = s
+        return s
+
+    def setdefault(self, s, default=None):
+        return self[s]
+
+    def clear(self):
+        dict.clear(self)
+        self.table.end_document()
+
+
 class JSONDecoder(object):
     """Simple JSON <http://json.org> decoder
 
@@ -337,7 +447,7 @@ class JSONDecoder(object):
 
     def __init__(self, encoding=None, object_hook=None, parse_float=None,
             parse_int=None, parse_constant=None, strict=True,
-            object_pairs_hook=None):
+            object_pairs_hook=None, intern=None):
         """
         *encoding* determines the encoding used to interpret any
         :class:`str` objects decoded by this instance (``'utf-8'`` by
@@ -380,6 +490,9 @@ class JSONDecoder(object):
         ``True`` means that unescaped control characters are parse errors, if
         ``False`` then control characters will be allowed in strings.
 
+        *intern*, if specified, is the :class:`InternTable` shared by the
+        documents decoded by this instance and any other it is given to.
+
         """
         self.encoding = encoding
         self.object_hook = object_hook
@@ -391,7 +504,11 @@ class JSONDecoder(object):
         self.parse_object = JSONObject
         self.parse_array = JSONArray
         self.parse_string = scanstring
-        self.memo = {}
+        self.intern = intern
+        if intern is None:
+            self.memo = {}
+        else:
+            self.memo = InternMemo(intern)
         self.scan_once = make_scanner(self)
 
     def decode(self, s, _w=WHITESPACE.match):
@@ -0,0 +1,418 @@
+"""Incremental (push) JSON parser producing a stream of events
+"""
+import re
+
+import simplejson.decoder as decoder
+from simplejson.decoder import JSONDecodeError, InternMemo, WHITESPACE, \
+    _CONSTANTS
+from simplejson.scanner import NUMBER_RE, MEMBER
+
+__all__ = ['JSONEventParser', 'iterevents', 'iterpaths', 'build_value']
+
+# characters that may continue a number found at the end of the buffer
+NUMBER_TAIL = re.compile(r'[0-9.eE+\-]*')
+
+# characters the string without escapes must not contain
+CONTROL_CHARS = re.compile(r'[\x00-\x1f]')
+
+LITERALS = (
+    ('null', None),
+    ('true', True),
+    ('false', False),
+)
+
+LITERAL_VALUES = dict(LITERALS)
+
+CONSTANTS = ('NaN', 'Infinity', '-Infinity')
+
+# what the parser expects next
+_VALUE = 0
+_VALUE_OR_END = 1
+_KEY = 2
+_KEY_OR_END = 3
+_COLON = 4
+_COMMA_OR_END = 5
+_DONE = 6
+
+_MAP = 'map'
+_ARRAY = 'array'
+
+
+class JSONEventParser(object):
+    """Push parser of one JSON document fed in chunks of any size
+
+    Every call of :meth:`feed` returns the events completed by the chunk,
+    as ``(event, value)`` pairs::
+
+        ('start_map', None), ('key', key), ('end_map', None),
+        ('start_array', None), ('end_array', None), ('value', value)
+
+    Scalars are decoded like :class:`JSONDecoder` decodes them, object keys
+    are shared by all the objects of the document. A token split between
+    chunks is decoded once the rest of it arrives, so only the incomplete
+    token is kept between the calls.
+
+        >>> from simplejson.incremental import JSONEventParser
+        >>> parser = JSONEventParser()
+        >>> parser.feed('{"a": [1, tr')
+        [('start_map', None), ('key', u'a'), ('start_array', None), ('value', 1)]
+        >>> parser.feed('ue]}')
+        [('value', True), ('end_array', None), ('end_map', None)]
+        >>> parser.close()
+        []
+
+    """
+
+    def __init__(self, encoding=None, strict=True, parse_float=None,
+            parse_int=None, parse_constant=None, intern=None):
+        """
+        *encoding*, *strict*, *parse_float*, *parse_int*, *parse_constant*
+        and *intern* have the same meaning as for :class:`JSONDecoder`.
+
+        """
+        self.encoding = encoding
+        self.strict = strict
+        self.parse_float = parse_float or float
+        self.parse_int = parse_int or int
+        self.parse_constant = parse_constant or _CONSTANTS.__getitem__
+        self.scanstring = decoder.scanstring
+        if intern is None:
+            self.memo = {}
+        else:
+            self.memo = InternMemo(intern)
+        self._buffer = ''
+        self._stack = []
+        self._state = _VALUE
+
+    def feed(self, chunk):
+        """Parse the next chunk of the document and return the list of
+        the events it has completed
+
+        """
+        if self._buffer:
+            self._buffer += chunk
+        else:
+            self._buffer = chunk
+        return self._parse(False)
+
+    def close(self):
+        """Parse the rest of the buffered data and return its events.
+        Raises :exc:`JSONDecodeError` if the document is incomplete.
+
+        """
+        events = self._parse(True)
+        if self._state != _DONE:
+            raise JSONDecodeError("Unexpected end of data", self._buffer,
+                len(self._buffer))
+        self.memo.clear()
+        return events
+
+    def _parse(self, final, _w=WHITESPACE.match, match_member=MEMBER.match):
+        s = self._buffer
+        n = len(s)
+        stack = self._stack
+        state = self._state
+        encoding = self.encoding or decoder.DEFAULT_ENCODING
+        fast = self.scanstring is decoder.py_fast_scanstring
+        memo = self.memo
+        memo_get = memo.setdefault
+        max_length = getattr(memo, 'max_length', None)
+        events = []
+        append = events.append
+        end = 0
+
+        while True:
+            end = _w(s, end).end()
+            if end == n:
+                break
+            nextchar = s[end]
+
+            if state == _VALUE or state == _VALUE_OR_END:
+                if nextchar == '{':
+                    stack.append(_MAP)
+                    append(('start_map', None))
+                    end += 1
+                    state = _KEY_OR_END
+                    continue
+                elif nextchar == '[':
+                    stack.append(_ARRAY)
+                    append(('start_array', None))
+                    end += 1
+                    state = _VALUE_OR_END
+                    continue
+                elif nextchar == ']' and state == _VALUE_OR_END:
+                    stack.pop()
+                    append(('end_array', None))
+                    end += 1
+                else:
+                    value, valueend = self._scan_scalar(s, end, final)
+                    if valueend is None:
+                        break
+                    if (max_length is not None and type(value) is unicode
+                            and len(value) <= max_length):
+                        value = memo[value]
+                    append(('value', value))
+                    end = valueend
+            elif state == _KEY or state == _KEY_OR_END:
+                if nextchar == '}' and state == _KEY_OR_END:
+                    stack.pop()
+                    append(('end_map', None))
+                    end += 1
+                elif nextchar == '"':
+                    # without the C extension the member of a plain string,
+                    # literal or container value is matched at once
+                    m = fast and match_member(s, end)
+                    if m:
+                        key, text, integer, frac, exp, token = m.groups()
+                        if text is not None or token is not None:
+                            if type(key) is str:
+                                key = unicode(key, encoding)
+                            append(('key', memo_get(key, key)))
+                            end = m.end()
+                            if text is not None:
+                                if type(text) is str:
+                                    text = unicode(text, encoding)
+                                if (max_length is not None
+                                        and len(text) <= max_length):
+                                    text = memo[text]
+                                append(('value', text))
+                            elif token == '{':
+                                stack.append(_MAP)
+                                append(('start_map', None))
+                                state = _KEY_OR_END
+                                continue
+                            elif token == '[':
+                                stack.append(_ARRAY)
+                                append(('start_array', None))
+                                state = _VALUE_OR_END
+                                continue
+                            else:
+                                append(('value', LITERAL_VALUES[token]))
+                            state = _COMMA_OR_END
+                            continue
+                    key, keyend = self._scan_string(s, end, final)
+                    if keyend is None:
+                        break
+                    append(('key', memo_get(key, key)))
+                    end = keyend
+                    state = _COLON
+                    continue
+                else:
+                    raise JSONDecodeError("Expecting property name", s, end)
+            elif state == _COLON:
+                if nextchar != ':':
+                    raise JSONDecodeError("Expecting : delimiter", s, end)
+                end += 1
+                state = _VALUE
+                continue
+            elif state == _COMMA_OR_END:
+                container = stack[-1]
+                if nextchar == ',':
+                    end += 1
+                    if container is _MAP:
+                        state = _KEY
+                    else:
+                        state = _VALUE
+                    continue
+                elif nextchar == '}' and container is _MAP:
+                    stack.pop()
+                    append(('end_map', None))
+                    end += 1
+                elif nextchar == ']' and container is _ARRAY:
+                    stack.pop()
+                    append(('end_array', None))
+                    end += 1
+                else:
+                    raise JSONDecodeError("Expecting , delimiter", s, end)
+            else:
+                raise JSONDecodeError("Extra data", s, end, n)
+
+            # a value or a container has been completed
+            if stack:
+                state = _COMMA_OR_END
+            else:
+                state = _DONE
+
+        self._buffer = s[end:]
+        self._state = state
+        return events
+
+    def _scan_string(self, s, end, final, _c=CONTROL_CHARS.search):
+        """Return the string starting at *end* and the index after it,
+        ``(None, None)`` if the rest of it has not arrived yet
+
+        """
+        quote = s.find('"', end + 1)
+        if quote == -1:
+            if final:
+                raise JSONDecodeError("Unterminated string starting at", s,
+                    end)
+            return None, None
+
+        chunk = s[end + 1:quote]
+        if '\\' not in chunk:
+            # the common case: no escapes, the string ends at the first quote
+            if self.strict and _c(chunk) is not None:
+                return self.scanstring(s, end + 1, self.encoding, True)
+            if not isinstance(chunk, unicode):
+                chunk = unicode(chunk,
+                    self.encoding or decoder.DEFAULT_ENCODING)
+            return chunk, quote + 1
+
+        while quote != -1:
+            backslashes = 0
+            while s[quote - 1 - backslashes] == '\\':
+                backslashes += 1
+            if backslashes % 2 == 0:
+                return self.scanstring(s, end + 1, self.encoding,
+                    self.strict)
+            quote = s.find('"', quote + 1)
+        if final:
+            raise JSONDecodeError("Unterminated string starting at", s, end)
+        return None, None
+
+    def _scan_scalar(self, s, end, final):
+        """Return the scalar starting at *end* and the index after it,
+        ``(None, None)`` if the rest of it has not arrived yet
+
+        """
+        if s[end] == '"':
+            return self._scan_string(s, end, final)
+
+        m = NUMBER_RE.match(s, end)
+        if m is not None:
+            if not final and NUMBER_TAIL.match(s, m.end()).end() == len(s):
+                # the number may continue in the next chunk
+                return None, None
+            integer, frac, exp = m.groups()
+            if frac or exp:
+                res = self.parse_float(integer + (frac or '') + (exp or ''))
+            else:
+                res = self.parse_int(integer)
+            return res, m.end()
+
+        rest = s[end:end + 9]
+        for literal, value in LITERALS:
+            if rest.startswith(literal):
+                return value, end + len(literal)
+            if not final and literal.startswith(rest):
+                return None, None
+        for literal in CONSTANTS:
+            if rest.startswith(literal):
+                return self.parse_constant(literal), end + len(literal)
+            if not final and literal.startswith(rest):
+                return None, None
+        raise JSONDecodeError("Expecting object", s, end)
+
+
+def iterevents(chunks, **kw):
+    """Parse the JSON document given as an iterable of chunks (a file,
+    a response read piece by piece) and yield its events as they are
+    completed, see :class:`JSONEventParser`. The keyword arguments are
+    passed to :class:`JSONEventParser`.
+
+        >>> from simplejson.incremental import iterevents
+        >>> list(iterevents(['[1', '0, "x"]']))
+        [('start_array', None), ('value', 10), ('value', u'x'), ('end_array', None)]
+
+    """
+    parser = JSONEventParser(**kw)
+    for chunk in chunks:
+        for event in parser.feed(chunk):
+            yield event
+    for event in parser.close():
+        yield event
+
+
+def iterpaths(events):
+    """Add to every event the dotted path of the value it belongs to:
+    ``(path, event, value)``. Arrays are transparent: the items of an array
+    have the path of the array, so the path is the same whether a member is
+    a single value or an array of them. The ``key`` and ``end_*`` events
+    have the path of their container.
+
+        >>> from simplejson.incremental import iterevents, iterpaths
+        >>> list(iterpaths(iterevents(['{"a": [{"b": 1}]}'])))[3:6]
+        [(u'a', 'start_map', None), (u'a', 'key', u'b'), (u'a.b', 'value', 1)]
+
+    """
+    stack = []
+    path = ''
+    for event, value in events:
+        if event == 'value':
+            yield path, event, value
+        elif event == 'key':
+            container = stack[-1][1]
+            yield container, event, value
+            if container:
+                path = container + '.' + value
+            else:
+                path = value
+            continue
+        elif event == 'start_map' or event == 'start_array':
+            yield path, event, value
+            stack.append((event, path))
+            continue
+        else:
+            path = stack.pop()[1]
+            yield path, event, value
+
+        # the next value of the array has the same path
+        if stack and stack[-1][0] == 'start_array':
+            path = stack[-1][1]
+
+
+def build_value(paths, event, value):
+    """Build the value starting with *event* from the following events of
+    the *paths* iterator returned by :func:`iterpaths`, consuming them up
+    to the end of the value.
+
+        >>> from simplejson.incremental import iterevents, iterpaths, build_value
+        >>> paths = iterpaths(iterevents(['{"a": {"b": [1, 2]}, "c": 3}']))
+        >>> paths.next(), paths.next(), paths.next()
+        (('', 'start_map', None), ('', 'key', u'a'), (u'a', 'start_map', None))
+        >>> build_value(paths, 'start_map', None)
+        {u'b': [1, 2]}
+        >>> paths.next()
+        ('', 'key', u'c')
+
+    """
+    if event == 'value':
+        return value
+    elif event == 'start_map':
+        root = {}
+    elif event == 'start_array':
+        root = []
+    else:
+        raise ValueError("Not the start of a value: %r" % (event,))
+
+    stack = [root]
+    keys = [None]
+    for path, event, value in paths:
+        if event == 'key':
+            keys[-1] = value
+            continue
+        elif event == 'end_map' or event == 'end_array':
+            stack.pop()
+            keys.pop()
+            if not stack:
+                return root
+            continue
+        elif event == 'start_map':
+            obj = {}
+        elif event == 'start_array':
+            obj = []
+        else:
+            obj = value
+
+        container = stack[-1]
+        if type(container) is list:
+            container.append(obj)
+        else:
+            container[keys[-1]] = obj
+
+        if event != 'value':
+            stack.append(obj)
+            keys.append(None)
+
+    raise ValueError("Unexpected end of events")
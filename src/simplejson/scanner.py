@@ -28,6 +28,9 @@ def py_make_scanner(context):
     object_hook = context.object_hook
     object_pairs_hook = context.object_pairs_hook
     memo = context.memo
+    # the memo filled from the intern table (decoder.InternMemo) also takes
+    # the short string values
+    max_length = getattr(memo, 'max_length', None)
 
     def _scan_once(string, idx):
         try:
@@ -36,7 +39,12 @@ def py_make_scanner(context):
             raise StopIteration
 
         if nextchar == '"':
-            return parse_string(string, idx + 1, encoding, strict)
+            if max_length is None:
+                return parse_string(string, idx + 1, encoding, strict)
+            value, end = parse_string(string, idx + 1, encoding, strict)
+            if len(value) <= max_length:
+                value = memo[value]
+            return value, end
         elif nextchar == '{':
             return parse_object((string, idx + 1), encoding, strict,
                 _scan_once, object_hook, object_pairs_hook, memo)
@@ -74,4 +82,218 @@ def py_make_scanner(context):
 
     return scan_once
 
-make_scanner = c_make_scanner or py_make_scanner
+# a value: plain string (no escapes), number, or the first token of the
+# other values; matches nothing for the rest (escapes, NaN, invalid JSON)
+_VALUE = r'''
+    (?:
+        "([^"\\\x00-\x1f]*)"
+        |(-?(?:0|[1-9]\d*))(\.\d+)?([eE][-+]?\d+)?
+        |(\{|\[|true|false|null)
+    )?'''
+MEMBER = re.compile(r'[ \t\n\r]*"([^"\\\x00-\x1f]*)"[ \t\n\r]*:[ \t\n\r]*'
+    + _VALUE, (re.VERBOSE | re.MULTILINE | re.DOTALL))
+ITEM = re.compile(r'[ \t\n\r]*' + _VALUE,
+    (re.VERBOSE | re.MULTILINE | re.DOTALL))
+_LITERALS = {'true': True, 'false': False, 'null': None}
+
+def py_make_fast_scanner(context):
+    """Pure Python scanner for objects and arrays of the usual shape, the
+    one used without the C extension
+
+    Each member of an object (``"key": value``) and each item of an array
+    is matched by a single regular expression, and the key or string value
+    it captures is decoded once per document: the repeated keys and values
+    are looked up by their undecoded text. Scalar documents, documents with
+    the decoding hooks, and invalid documents are scanned by
+    :func:`py_make_scanner`, so the errors are the same.
+
+    """
+    from simplejson.decoder import (JSONObject, JSONArray, py_scanstring,
+        py_fast_scanstring, DEFAULT_ENCODING, WHITESPACE)
+    py_scan_once = py_make_scanner(context)
+    if (context.object_hook is not None or
+            context.object_pairs_hook is not None or
+            context.parse_object is not JSONObject or
+            context.parse_array is not JSONArray or
+            context.parse_string not in (py_scanstring, py_fast_scanstring)):
+        return py_scan_once
+
+    parse_string = context.parse_string
+    encoding = context.encoding
+    if encoding is None:
+        encoding = DEFAULT_ENCODING
+    strict = context.strict
+    parse_float = context.parse_float
+    parse_int = context.parse_int
+    parse_constant = context.parse_constant
+    memo = context.memo
+    memo_get = memo.setdefault
+    max_length = getattr(memo, 'max_length', None)
+    match_member = MEMBER.match
+    match_item = ITEM.match
+    _w = WHITESPACE.match
+    literals = _LITERALS
+    # undecoded text -> decoded key or string value, for the document
+    keys = {}
+    strings = {}
+    strings_get = strings.get
+
+    def _scan_other(string, idx):
+        """The value not matched by _VALUE"""
+        nextchar = string[idx:idx + 1]
+        if nextchar == '"':
+            value, end = parse_string(string, idx + 1, encoding, strict)
+            if max_length is not None and len(value) <= max_length:
+                value = memo[value]
+            return value, end
+        elif nextchar == 'N' and string[idx:idx + 3] == 'NaN':
+            return parse_constant('NaN'), idx + 3
+        elif nextchar == 'I' and string[idx:idx + 8] == 'Infinity':
+            return parse_constant('Infinity'), idx + 8
+        elif nextchar == '-' and string[idx:idx + 9] == '-Infinity':
+            return parse_constant('-Infinity'), idx + 9
+        raise StopIteration
+
+    def _parse_object(string, end):
+        values = {}
+        if string[end:end + 1] != '"':
+            end = _w(string, end).end()
+            if string[end:end + 1] == '}':
+                return values, end + 1
+        while True:
+            m = match_member(string, end)
+            if m is not None:
+                key, text, integer, frac, exp, token = m.groups()
+                try:
+                    key = keys[key]
+                except KeyError:
+                    raw = key
+                    if type(key) is str:
+                        key = unicode(key, encoding)
+                    key = keys[raw] = memo_get(key, key)
+            else:
+                # the key with escapes
+                end = _w(string, end).end()
+                if string[end:end + 1] != '"':
+                    raise StopIteration
+                key, end = parse_string(string, end + 1, encoding, strict)
+                key = memo_get(key, key)
+                end = _w(string, end).end()
+                if string[end:end + 1] != ':':
+                    raise StopIteration
+                m = match_item(string, end + 1)
+                text, integer, frac, exp, token = m.groups()
+            end = m.end()
+
+            if text is not None:
+                value = strings_get(text)
+                if value is None:
+                    value = text
+                    if type(value) is str:
+                        value = unicode(value, encoding)
+                    if max_length is not None and len(value) <= max_length:
+                        value = memo[value]
+                    strings[text] = value
+                values[key] = value
+            elif token is not None:
+                if token == '{':
+                    values[key], end = _parse_object(string, end)
+                elif token == '[':
+                    values[key], end = _parse_array(string, end)
+                else:
+                    values[key] = literals[token]
+            elif integer is not None:
+                if frac or exp:
+                    values[key] = parse_float(
+                        integer + (frac or '') + (exp or ''))
+                else:
+                    values[key] = parse_int(integer)
+            else:
+                values[key], end = _scan_other(string, end)
+
+            nextchar = string[end:end + 1]
+            if nextchar != ',':
+                if nextchar != '}':
+                    end = _w(string, end).end()
+                    nextchar = string[end:end + 1]
+                if nextchar == '}':
+                    return values, end + 1
+                elif nextchar != ',':
+                    raise StopIteration
+            end += 1
+
+    def _parse_array(string, end):
+        values = []
+        append = values.append
+        nextchar = string[end:end + 1]
+        if nextchar == ']':
+            return values, end + 1
+        elif nextchar in ' \t\n\r':
+            end = _w(string, end).end()
+            if string[end:end + 1] == ']':
+                return values, end + 1
+        while True:
+            m = match_item(string, end)
+            text, integer, frac, exp, token = m.groups()
+            end = m.end()
+
+            if text is not None:
+                value = strings_get(text)
+                if value is None:
+                    value = text
+                    if type(value) is str:
+                        value = unicode(value, encoding)
+                    if max_length is not None and len(value) <= max_length:
+                        value = memo[value]
+                    strings[text] = value
+                append(value)
+            elif token is not None:
+                if token == '{':
+                    value, end = _parse_object(string, end)
+                elif token == '[':
+                    value, end = _parse_array(string, end)
+                else:
+                    value = literals[token]
+                append(value)
+            elif integer is not None:
+                if frac or exp:
+                    append(parse_float(integer + (frac or '') + (exp or '')))
+                else:
+                    append(parse_int(integer))
+            else:
+                value, end = _scan_other(string, end)
+                append(value)
+
+            nextchar = string[end:end + 1]
+            if nextchar != ',':
+                if nextchar != ']':
+                    end = _w(string, end).end()
+                    nextchar = string[end:end + 1]
+                if nextchar == ']':
+                    return values, end + 1
+                elif nextchar != ',':
+                    raise StopIteration
+            end += 1
+
+    def scan_once(string, idx):
+        nextchar = string[idx:idx + 1]
+        if nextchar != '{' and nextchar != '[':
+            return py_scan_once(string, idx)
+        try:
+            try:
+                if nextchar == '{':
+                    result = _parse_object(string, idx + 1)
+                else:
+                    result = _parse_array(string, idx + 1)
+            finally:
+                keys.clear()
+                strings.clear()
+        except (StopIteration, ValueError):
+            # invalid JSON: scanned again for the error of py_make_scanner
+            return py_scan_once(string, idx)
+        memo.clear()
+        return result
+
+    return scan_once
+
+make_scanner = c_make_scanner or py_make_fast_scanner
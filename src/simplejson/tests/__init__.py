@@ -17,9 +17,11 @@ def additional_tests(suite=None):
     import simplejson
     import simplejson.encoder
     import simplejson.decoder
+    import simplejson.incremental
     if suite is None:
         suite = unittest.TestSuite()
-    for mod in (simplejson, simplejson.encoder, simplejson.decoder):
+    for mod in (simplejson, simplejson.encoder, simplejson.decoder,
+            simplejson.incremental):
         suite.addTest(doctest.DocTestSuite(mod))
     suite.addTest(doctest.DocFileSuite('../../index.rst'))
     return suite
@@ -34,6 +36,9 @@ def all_tests_suite():
         'simplejson.tests.test_encode_basestring_ascii',
         'simplejson.tests.test_encode_for_html',
         'simplejson.tests.test_fail',
+        'simplejson.tests.test_fast_scanner',
+        'simplejson.tests.test_incremental',
+        'simplejson.tests.test_intern',
         'simplejson.tests.test_float',
         'simplejson.tests.test_indent',
         'simplejson.tests.test_pass1',
@@ -0,0 +1,175 @@
+import random
+from decimal import Decimal
+from unittest import TestCase
+
+import simplejson as json
+import simplejson.decoder
+import simplejson.scanner
+from simplejson.decoder import JSONDecoder, py_scanstring, py_fast_scanstring
+from simplejson.scanner import py_make_scanner, py_make_fast_scanner
+from simplejson.tests.test_fail import JSONDOCS
+from simplejson.tests.test_pass1 import JSON as PASS1
+
+TASKSERIES = {
+    'id': '1000001', 'created': '2010-12-01T10:00:00Z', 'name': 'plan email',
+    'source': 'api', 'url': '', 'location_id': '', 'participants': [],
+    'tags': {'tag': ['work', 'home']},
+    'notes': {'note': {'id': '7', '$t': 'call \\"Bob\\"\nat 5'}},
+    'rrule': {'every': '1', '$t': 'FREQ=WEEKLY;INTERVAL=1'},
+    'task': {'id': '1000002', 'due': '', 'has_due_time': '0',
+        'priority': 'N', 'postponed': '0', 'estimate': ''},
+}
+
+DOCS = [
+    '{}', '[]', '{ }', '[ ]', '[[]]', '{"a": {}}', '[{}, []]',
+    '{"a": 1, "b": -2, "c": 0.5, "d": 1e3, "e": -1.5E-2, "f": 10}',
+    '[true, false, null, "", 0, -0, [true], {"t": true, "n": null}]',
+    '[NaN, Infinity, -Infinity, {"x": NaN, "y": -Infinity}]',
+    '{"\\u00e9t\\u00e9": "\\u20ac", "a\\"b": "c\\\\d", "e": "f\\/g"}',
+    '["caf\xc3\xa9", {"caf\xc3\xa9": "\xe2\x82\xac"}]',
+    u'["caf\xe9", {"caf\xe9": "\u20ac"}]',
+    '  {\n\t"a" :\r\n [ 1 ,\t2 ] , "b"\n:\n"c" }  ',
+    '{"dup": 1, "dup": 2}',
+    '[' * 50 + ']' * 50,
+    PASS1,
+    json.dumps({'rsp': {'stat': 'ok', 'tasks': {'list': [
+        {'id': '1', 'taskseries': [TASKSERIES, TASKSERIES]},
+        {'id': '2', 'taskseries': TASKSERIES}]}}}),
+    json.dumps([TASKSERIES] * 3, separators=(',', ':')),
+    json.dumps({'l': ['1', '2'], 't': [0, 1000001, 1, -1, 0, 0]}),
+]
+
+
+def decoders(**kw):
+    """The reference decoder and the fast one"""
+    reference = JSONDecoder(**kw)
+    reference.parse_string = py_scanstring
+    reference.scan_once = py_make_scanner(reference)
+    fast = JSONDecoder(**kw)
+    fast.parse_string = py_fast_scanstring
+    fast.scan_once = py_make_fast_scanner(fast)
+    return reference, fast
+
+
+def random_value(rand, depth=0):
+    kind = rand.randrange(depth < 4 and 9 or 7)
+    if kind == 0:
+        return rand.randrange(-1000, 1000)
+    elif kind == 1:
+        return rand.random() * 10 ** rand.randrange(-5, 20)
+    elif kind == 2:
+        return rand.choice([True, False, None])
+    elif kind < 7:
+        return random_string(rand)
+    elif kind == 7:
+        return [random_value(rand, depth + 1)
+            for i in range(rand.randrange(4))]
+    return dict([(random_string(rand), random_value(rand, depth + 1))
+        for i in range(rand.randrange(4))])
+
+
+def random_string(rand):
+    # mostly plain ASCII, like the keys and values of the RTM responses
+    chars = u'aZ09 "\\/\n\t\x01\xe9\u20ac'[:rand.choice([5, 5, 5, 9, 12])]
+    return u''.join([rand.choice(chars) for i in range(rand.randrange(6))])
+
+
+class TestFastScanner(TestCase):
+    def setUp(self):
+        # JSONObject of the reference decoder scans the keys with it
+        self.scanstring = simplejson.decoder.scanstring
+        simplejson.decoder.scanstring = py_scanstring
+
+    def tearDown(self):
+        simplejson.decoder.scanstring = self.scanstring
+
+    def assertParity(self, doc, **kw):
+        reference, fast = decoders(**kw)
+        try:
+            expected = reference.decode(doc)
+        except ValueError, e:
+            try:
+                fast.decode(doc)
+            except ValueError, f:
+                self.assertEquals((type(f), str(f)), (type(e), str(e)))
+            else:
+                self.fail('%r decoded' % (doc,))
+        else:
+            # repr: the same types, str or unicode, int or float
+            self.assertEquals(repr(fast.decode(doc)), repr(expected))
+
+    def test_documents(self):
+        for doc in DOCS:
+            self.assertParity(doc)
+            if isinstance(doc, str):
+                self.assertParity(doc.decode('utf-8'))
+
+    def test_random_documents(self):
+        rand = random.Random(1)
+        for i in range(300):
+            value = [random_value(rand) for j in range(3)]
+            for kw in [{}, {'indent': 1}, {'separators': (',', ':')},
+                    {'ensure_ascii': False}]:
+                self.assertParity(json.dumps(value, **kw))
+
+    def test_failures(self):
+        for doc in JSONDOCS:
+            self.assertParity(doc)
+
+    def test_truncated(self):
+        doc = DOCS[-3]
+        for i in range(len(doc)):
+            self.assertParity(doc[:i])
+            self.assertParity(doc[:i] + ']' + doc[i:])
+
+    def test_invalid(self):
+        for doc in ['[1,]', '{"a": 1,}', '{"a" 1}', '[1 2]', '[tru]', '[1.]',
+                '{"a": nulls}', '[01]', '{"a":}', '[-]', '{1: 2}', '["\x01"]',
+                '{"a\x01": 1}', '["a\\x"]', '[1] [2]', '["\xff"]', '[1e]']:
+            self.assertParity(doc)
+
+    def test_not_strict(self):
+        self.assertParity('["a\x01b", {"c\td": "\n"}]', strict=False)
+
+    def test_hooks(self):
+        doc = DOCS[7]
+        self.assertParity(doc, parse_float=str, parse_int=float)
+        self.assertParity(DOCS[9], parse_constant=str)
+        self.assertParity(doc, object_hook=sorted)
+        self.assertParity(doc, object_pairs_hook=list)
+        self.assertParity(doc, parse_float=Decimal)
+
+    def test_encoding(self):
+        self.assertParity(u'["caf\xe9", {"\xe9": 1}]'.encode('latin-1'),
+            encoding='latin-1')
+
+    def test_intern(self):
+        table = json.InternTable()
+        self.assertParity(DOCS[-2], intern=table)
+        first = decoders(intern=table)[1].decode(DOCS[-2])
+        second = decoders(intern=table)[1].decode(DOCS[-2])
+        self.assertTrue(first[0]['task'] is not second[0]['task'])
+        self.assertTrue(first[0]['task']['priority'] is
+            second[0]['task']['priority'])
+
+    def test_shared_strings(self):
+        value = decoders()[1].decode('[{"a": "x"}, {"a": "x"}]')
+        self.assertTrue(value[0].keys()[0] is value[1].keys()[0])
+        self.assertTrue(value[0]['a'] is value[1]['a'])
+
+    def test_raw_decode(self):
+        reference, fast = decoders()
+        for doc, idx in [('xx[1, {"a": 2}] tail', 2), ('  "s"', 2),
+                ('12 34', 3)]:
+            self.assertEquals(fast.raw_decode(doc, idx),
+                reference.raw_decode(doc, idx))
+
+    def test_selected(self):
+        enabled = simplejson.scanner.make_scanner is not py_make_fast_scanner
+        json._toggle_speedups(False)
+        try:
+            self.assertTrue(simplejson.decoder.scanstring is py_fast_scanstring)
+            self.assertTrue(
+                simplejson.decoder.make_scanner is py_make_fast_scanner)
+        finally:
+            json._toggle_speedups(enabled)
@@ -0,0 +1,144 @@
+from unittest import TestCase
+
+import simplejson as json
+from simplejson.incremental import (JSONEventParser, iterevents, iterpaths,
+    build_value)
+
+DOC = ('{"rsp": {"stat": "ok", "tasks": {"list": [{"id": "1", "taskseries": '
+       '[{"name": "caf\\u00e9 \\"bar\\"", "tags": [], "n": -12.5e1}, '
+       '{"name": "x", "tags": ["a", "b"], "n": 0}]}, {"id": "2"}]}, '
+       '"flags": [true, false, null, 1E3, []], "empty": {}}}')
+
+
+def build(events):
+    paths = iterpaths(iter(events))
+    path, event, value = paths.next()
+    return build_value(paths, event, value)
+
+
+class TestIncremental(TestCase):
+    def test_events(self):
+        self.assertEquals(list(iterevents(['{"a": [1, "b", {}], "c": null}'])), [
+            ('start_map', None),
+            ('key', u'a'),
+            ('start_array', None),
+            ('value', 1),
+            ('value', u'b'),
+            ('start_map', None),
+            ('end_map', None),
+            ('end_array', None),
+            ('key', u'c'),
+            ('value', None),
+            ('end_map', None),
+        ])
+
+    def test_scalar_document(self):
+        self.assertEquals(list(iterevents(['"x"'])), [('value', u'x')])
+        self.assertEquals(list(iterevents(['  4', '2 '])), [('value', 42)])
+
+    def test_loads_parity(self):
+        events = list(iterevents([DOC]))
+        self.assertEquals(build(events), json.loads(DOC))
+
+    def test_every_split(self):
+        expected = list(iterevents([DOC]))
+        for i in range(len(DOC) + 1):
+            self.assertEquals(list(iterevents([DOC[:i], DOC[i:]])), expected)
+
+    def test_byte_chunks(self):
+        expected = list(iterevents([DOC]))
+        self.assertEquals(list(iterevents(list(DOC))), expected)
+
+    def test_utf8_split(self):
+        doc = u'["\u010d\u00e9", "\u20ac"]'.encode('utf-8')
+        for i in range(len(doc) + 1):
+            self.assertEquals(list(iterevents([doc[:i], doc[i:]])),
+                [('start_array', None), ('value', u'\u010d\u00e9'),
+                 ('value', u'\u20ac'), ('end_array', None)])
+
+    def test_unicode_chunks(self):
+        self.assertEquals(list(iterevents([u'["\u010d', u'"]'])),
+            [('start_array', None), ('value', u'\u010d'),
+             ('end_array', None)])
+
+    def test_escapes(self):
+        doc = r'["a\\", "\"b\"", "\\\"", "A\n"]'
+        for i in range(len(doc) + 1):
+            self.assertEquals(build(list(iterevents([doc[:i], doc[i:]]))),
+                json.loads(doc))
+
+    def test_numbers_and_literals(self):
+        doc = '[12345, -0.5, 1e-3, true, false, null, NaN, -Infinity]'
+        for i in range(len(doc) + 1):
+            value = build(list(iterevents([doc[:i], doc[i:]])))
+            self.assertEquals(repr(value), repr(json.loads(doc)))
+
+    def test_number_at_end(self):
+        parser = JSONEventParser()
+        self.assertEquals(parser.feed('12'), [])
+        self.assertEquals(parser.feed('3'), [])
+        self.assertEquals(parser.close(), [('value', 123)])
+
+    def test_hooks(self):
+        events = list(iterevents(['[1.5, 2, NaN]'], parse_float=str,
+            parse_int=float, parse_constant=str))
+        self.assertEquals([value for event, value in events[1:-1]],
+            ['1.5', 2.0, 'NaN'])
+
+    def test_shared_keys(self):
+        events = list(iterevents(['[{"name": 1}, ', '{"name": 2}]']))
+        keys = [value for event, value in events if event == 'key']
+        self.assertTrue(keys[0] is keys[1])
+
+    def test_strict(self):
+        self.assertRaises(json.JSONDecodeError, list,
+            iterevents(['["a\tb"]']))
+        self.assertEquals(list(iterevents(['["a\tb"]'], strict=False))[1],
+            ('value', u'a\tb'))
+
+    def test_errors(self):
+        for doc in ['[1,]', '{"a" 1}', '{1: 2}', '[1 2]', '[tru]', '[x]',
+                '{"a": 1]', '[1}', '1 2', '[] []']:
+            self.assertRaises(json.JSONDecodeError, list, iterevents([doc]))
+
+    def test_incomplete(self):
+        for doc in ['', '[', '{"a": 1', '"abc', '[tr', '{"a"']:
+            parser = JSONEventParser()
+            parser.feed(doc)
+            self.assertRaises(json.JSONDecodeError, parser.close)
+
+    def test_iterpaths(self):
+        paths = list(iterpaths(iterevents(
+            ['{"a": [{"b": 1}, 2], "c": {"d": [3]}}'])))
+        self.assertEquals(paths, [
+            ('', 'start_map', None),
+            ('', 'key', u'a'),
+            (u'a', 'start_array', None),
+            (u'a', 'start_map', None),
+            (u'a', 'key', u'b'),
+            (u'a.b', 'value', 1),
+            (u'a', 'end_map', None),
+            (u'a', 'value', 2),
+            (u'a', 'end_array', None),
+            ('', 'key', u'c'),
+            (u'c', 'start_map', None),
+            (u'c', 'key', u'd'),
+            (u'c.d', 'start_array', None),
+            (u'c.d', 'value', 3),
+            (u'c.d', 'end_array', None),
+            (u'c', 'end_map', None),
+            ('', 'end_map', None),
+        ])
+
+    def test_build_value(self):
+        paths = iterpaths(iterevents([DOC]))
+        items = []
+        for path, event, value in paths:
+            if path == 'rsp.tasks.list.taskseries' and event == 'start_map':
+                items.append(build_value(paths, event, value))
+        expected = json.loads(DOC)['rsp']['tasks']['list'][0]['taskseries']
+        self.assertEquals(items, expected)
+        self.assertRaises(ValueError, build_value, iter([]), 'end_map',
+            None)
+        self.assertRaises(ValueError, build_value, iter([]), 'start_map',
+            None)
@@ -0,0 +1,71 @@
+from unittest import TestCase
+
+import simplejson as json
+from simplejson.incremental import iterevents
+
+DOC = ('{"rsp": {"stat": "ok", "list": [{"id": "1", "priority": "N", '
+       '"name": "a name longer than sixteen characters", "due": ""}, '
+       '{"id": "2", "priority": "N", "name": "b", "due": ""}]}}')
+
+
+def keys(value):
+    return dict([(key, key) for key in value])
+
+
+class TestIntern(TestCase):
+    def test_loads_parity(self):
+        table = json.InternTable()
+        for i in range(2):
+            self.assertEquals(json.loads(DOC, intern=table), json.loads(DOC))
+
+    def test_shared_across_documents(self):
+        table = json.InternTable()
+        a = json.loads(DOC, intern=table)['rsp']['list'][0]
+        b = json.loads(DOC, intern=table)['rsp']['list'][1]
+        self.assertTrue(keys(a)[u'priority'] is keys(b)[u'priority'])
+        self.assertTrue(a['priority'] is b['priority'])
+        self.assertTrue(a['due'] is b['due'])
+        self.assertEquals(table.documents, 2)
+
+    def test_decoder(self):
+        table = json.InternTable()
+        first = json.JSONDecoder(intern=table).decode(DOC)
+        second = json.JSONDecoder(intern=table).decode(DOC)
+        self.assertTrue(first['rsp']['stat'] is second['rsp']['stat'])
+
+    def test_short_values_only(self):
+        table = json.InternTable(max_length=4)
+        value = json.loads('["abcd", "abcde", 1]', intern=table)
+        self.assertTrue(u'abcd' in table)
+        self.assertFalse(u'abcde' in table)
+        self.assertEquals(value, [u'abcd', u'abcde', 1])
+
+    def test_bound(self):
+        table = json.InternTable(maxsize=8)
+        for i in range(100):
+            json.loads('{"k%i": "v%i"}' % (i, i), intern=table)
+            self.assertTrue(len(table) <= 8)
+        self.assertTrue(u'k99' in table)
+        self.assertEquals(len(table.last_used), len(table))
+
+    def test_least_recently_used_evicted(self):
+        table = json.InternTable(maxsize=4)
+        for i in range(4):
+            json.loads('["keep", "old%i"]' % (i,), intern=table)
+        json.loads('["keep", "new"]', intern=table)
+        self.assertTrue(u'keep' in table)
+        self.assertTrue(u'new' in table)
+        self.assertFalse(u'old0' in table)
+        self.assertFalse(u'old1' in table)
+        self.assertEquals(len(table), 4)
+
+    def test_incremental(self):
+        table = json.InternTable()
+        first = list(iterevents([DOC[:30], DOC[30:]], intern=table))
+        second = list(iterevents([DOC], intern=table))
+        self.assertEquals(first, list(iterevents([DOC])))
+        for (event, a), (event, b) in zip(first, second):
+            if event in ('key', 'value') and isinstance(a, unicode) \
+                    and len(a) <= table.max_length:
+                self.assertTrue(a is b)
+        self.assertEquals(table.documents, 2)
@@ -8,6 +8,9 @@ class TestScanString(TestCase):
     def test_py_scanstring(self):
         self._test_scanstring(simplejson.decoder.py_scanstring)
 
+    def test_py_fast_scanstring(self):
+        self._test_scanstring(simplejson.decoder.py_fast_scanstring)
+
     def test_c_scanstring(self):
         if not simplejson.decoder.c_scanstring:
             return
@@ -0,0 +1,119 @@
+# coding: utf-8
+
+"""
+RTM calls and storage writes made by the task commands with one or several IDs, run through RtmBot.processCommand()
+against the fake RTM and the in-memory storage backend.
+
+Usage: python tests/testCommandPipeline.py
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bench"))
+
+from fakeRtm import FakeRtm
+from RtmApiCache import RtmApiCache
+from RtmBot import RtmBot
+from RtmTransport import RtmFakeTransport
+from SecureStorage import SecureStorage
+from StorageBackend import TieredStorageBackend, MemoryStorageBackend
+import TasksMirrorStorage
+
+class CommandPipelineTest(unittest.TestCase):
+    def setUp(self):
+        self.rtm = FakeRtm()
+        self.transport = RtmFakeTransport(self.rtm.handle)
+        self.durable = MemoryStorageBackend()
+        self.backend = TieredStorageBackend(self.durable)
+        # the lists and settings cached by the other tests are not seen
+        self.cache = RtmApiCache()
+        
+        self.mirrorBackend = TasksMirrorStorage.backend
+        TasksMirrorStorage.backend = TieredStorageBackend(MemoryStorageBackend(), None, 20)
+        
+        for i in range(10):
+            self.rtm.addTask(u"task %02i" % i, due = u"2010-12-%02iT10:00:00Z" % (i + 1))
+        
+        for message in (u"hey", u"hey", u"L"):
+            self.say(message)
+    
+    def tearDown(self):
+        TasksMirrorStorage.backend = self.mirrorBackend
+    
+    def say(self, message):
+        """
+        @return tuple (reply, RTM methods called, records written)
+        """
+        calls = len(self.rtm.aCalls)
+        saves = self.durable.saves
+        
+        storage = SecureStorage("user@example.com", self.backend)
+        bot = RtmBot("key", "secret", "", storage)
+        bot.api.transport = self.transport
+        bot.api.cache = self.cache
+        reply = bot.processCommand(message)
+        storage.flush()
+        
+        return (reply, self.rtm.aCalls[calls:], self.durable.saves - saves)
+    
+    def testSingleId(self):
+        (reply, aCalls, writes) = self.say(u"C 1")
+        self.assertEqual(reply, u"1 -- Task completed")
+        # the timeline is created by the first command needing it and saved with the user's record
+        self.assertEqual(aCalls, ["rtm.timelines.create", "rtm.tasks.complete"])
+        self.assertEqual(writes, 1)
+        
+        (reply, aCalls, writes) = self.say(u"P 2")
+        self.assertEqual(aCalls, ["rtm.tasks.postpone"])
+        self.assertEqual(writes, 0)
+    
+    def testMultipleIds(self):
+        self.say(u"C 1")
+        
+        (reply, aCalls, writes) = self.say(u"C 2,3,4")
+        self.assertEqual(reply, u"2 -- Task completed\n3 -- Task completed\n4 -- Task completed")
+        self.assertEqual(aCalls, ["rtm.tasks.complete"] * 3)
+        self.assertEqual(writes, 0)
+        
+        # the deleted tasks are removed from the context, written once for all of them
+        (reply, aCalls, writes) = self.say(u"D 5,6")
+        self.assertEqual(aCalls, ["rtm.tasks.delete"] * 2)
+        self.assertEqual(writes, 1)
+    
+    def testInvalidId(self):
+        # no call is made when any of the IDs is not in the context
+        (reply, aCalls, writes) = self.say(u"C 1,2,99")
+        self.assertEqual(reply, "ERROR: There is no task with ID 99 in your current context")
+        self.assertEqual(aCalls, [])
+        self.assertEqual(writes, 0)
+        
+        (reply, aCalls, writes) = self.say(u"D 99")
+        self.assertEqual(aCalls, [])
+        self.assertEqual(writes, 0)
+    
+    def testTags(self):
+        self.say(u"C 1")
+        
+        (reply, aCalls, writes) = self.say(u"T 2,3 urgent")
+        self.assertEqual(reply, u"2 -- Tags/List added\n3 -- Tags/List added")
+        self.assertEqual(aCalls, ["rtm.lists.getList", "rtm.tasks.addTags", "rtm.tasks.addTags"])
+        self.assertEqual(writes, 0)
+        
+        # the list named among the tags: the task is moved, and its new list is written to the context
+        (reply, aCalls, writes) = self.say(u"T 4 work urgent")
+        self.assertEqual(sorted(aCalls), ["rtm.tasks.addTags", "rtm.tasks.moveTo"])
+        self.assertEqual(writes, 1)
+    
+    def testRemoveTags(self):
+        self.say(u"C 1")
+        
+        (reply, aCalls, writes) = self.say(u"-T 2,3 urgent")
+        self.assertEqual(reply, u"2 -- Tags removed\n3 -- Tags removed")
+        self.assertEqual(aCalls, ["rtm.tasks.removeTags"] * 2)
+        self.assertEqual(writes, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+# coding: utf-8
+
+"""
+Pages of the LIST reply shown by MORE from the list kept by LIST, without querying RTM again.
+
+Usage: python tests/testListPages.py
+"""
+
+import os
+import re
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "bench"))
+
+from fakeRtm import FakeRtm
+from RtmBot import RtmBot
+from RtmTransport import RtmFakeTransport
+from SecureStorage import SecureStorage
+from StorageBackend import TieredStorageBackend, MemoryStorageBackend
+import TasksMirrorStorage
+
+class ListPagesTest(unittest.TestCase):
+    def setUp(self):
+        self.rtm = FakeRtm()
+        self.transport = RtmFakeTransport(self.rtm.handle)
+        self.backend = TieredStorageBackend(MemoryStorageBackend())
+        
+        self.mirrorBackend = TasksMirrorStorage.backend
+        self.maxRecordSize = TasksMirrorStorage.MAX_RECORD_SIZE
+        TasksMirrorStorage.backend = TieredStorageBackend(MemoryStorageBackend(), None, 20)
+        
+        for i in range(45):
+            self.rtm.addTask(u"task %02i" % i, due = u"2010-12-%02iT10:00:00Z" % (i % 28 + 1))
+        
+        # authentication
+        self.say(u"hey")
+        self.say(u"hey")
+    
+    def tearDown(self):
+        TasksMirrorStorage.backend = self.mirrorBackend
+        TasksMirrorStorage.MAX_RECORD_SIZE = self.maxRecordSize
+    
+    def say(self, message):
+        """
+        @return tuple (reply, RTM methods called)
+        """
+        calls = len(self.rtm.aCalls)
+        
+        storage = SecureStorage("user@example.com", self.backend)
+        bot = RtmBot("key", "secret", "", storage)
+        bot.api.transport = self.transport
+        reply = bot.processCommand(message)
+        storage.flush()
+        
+        return (reply, self.rtm.aCalls[calls:])
+    
+    def readAll(self, message):
+        """
+        @return list [(number, task name), ...] of all the pages
+        """
+        (reply, aCalls) = self.say(message)
+        aTasks = re.findall(ur"(\d+)\. (task \w+)", reply)
+        
+        while u"say MORE" in reply:
+            (reply, aCalls) = self.say(u"MORE")
+            self.assertEqual(aCalls, [])
+            aTasks.extend(re.findall(ur"(\d+)\. (task \w+)", reply))
+        
+        self.assertEqual(self.say(u"MORE"), (u"*no more tasks*", []))
+        
+        return [(int(number), name) for (number, name) in aTasks]
+    
+    def assertListed(self, aTasks, count):
+        self.assertEqual([number for (number, name) in aTasks], range(1, count + 1))
+        self.assertEqual(len(set([name for (number, name) in aTasks])), count)
+    
+    def testPagesInListOrder(self):
+        aTasks = self.readAll(u"L")
+        self.assertListed(aTasks, 45)
+        self.assertEqual(aTasks[:2], [(1, u"task 00"), (2, u"task 28")])
+    
+    def testListChangedBetweenPages(self):
+        (reply, aCalls) = self.say(u"L")
+        self.assertTrue(reply.endswith(u"*25 more, say MORE to see them*"))
+        
+        # sorted before all the others: the next pages would shift by one if the list was requested again
+        self.rtm.addTask(u"task new", due = u"2010-12-01T09:00:00Z")
+        
+        aTasks = re.findall(ur"(\d+)\. (task \w+)", reply)
+        while u"say MORE" in reply:
+            (reply, aCalls) = self.say(u"MORE")
+            self.assertEqual(aCalls, [])
+            aTasks.extend(re.findall(ur"(\d+)\. (task \w+)", reply))
+        
+        self.assertListed([(int(number), name) for (number, name) in aTasks], 45)
+        self.assertFalse(u"task new" in [name for (number, name) in aTasks])
+    
+    def testTimeDependentFilter(self):
+        # the result of the filter is not stored in the mirror
+        self.assertListed(self.readAll(u"L dueBefore:2011-01-01"), 45)
+    
+    def testMirrorTooBig(self):
+        TasksMirrorStorage.MAX_RECORD_SIZE = 1200
+        
+        aTasks = self.readAll(u"L")
+        self.assertListed(aTasks, 45)
+        self.assertEqual(TasksMirrorStorage.backend.load(TasksMirrorStorage._key("user@example.com", u""))[1], None)
+    
+    def testListTooBigToKeep(self):
+        # only the first tasks of the list are kept for MORE
+        TasksMirrorStorage.MAX_RECORD_SIZE = 1000
+        
+        aTasks = self.readAll(u"L dueBefore:2011-01-01")
+        self.assertTrue(RtmBot.LIST_PAGE_SIZE < len(aTasks) < 45)
+        self.assertListed(aTasks, len(aTasks))
+
+if __name__ == "__main__":
+    unittest.main()
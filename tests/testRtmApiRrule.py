@@ -0,0 +1,82 @@
+# coding: utf-8
+
+"""
+Parsing of the recurrence rules RTM sends and their descriptions shown in the lists of tasks.
+
+Usage: python tests/testRtmApiRrule.py
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from RtmApi import RtmApiRrule
+
+def describe(rule, every = True):
+    return RtmApiRrule.createFromRaw({"every": every and u"1" or u"0", "$t": rule}).toString()
+
+class ParseTest(unittest.TestCase):
+    def testFrequencyAndInterval(self):
+        self.assertEqual(RtmApiRrule.parse(u"FREQ=DAILY;INTERVAL=3"), (u"DAILY", 3, (), ()))
+        self.assertEqual(RtmApiRrule.parse(u"FREQ=YEARLY"), (u"YEARLY", 1, (), ()))
+    
+    def testByDay(self):
+        self.assertEqual(RtmApiRrule.parse(u"FREQ=WEEKLY;INTERVAL=1;BYDAY=MO,WE, FR"),
+                         (u"WEEKLY", 1, ((None, u"MO"), (None, u"WE"), (None, u"FR")), ()))
+        self.assertEqual(RtmApiRrule.parse(u"FREQ=MONTHLY;INTERVAL=1;BYDAY=2TU,-1FR,+3SU"),
+                         (u"MONTHLY", 1, ((2, u"TU"), (-1, u"FR"), (3, u"SU")), ()))
+    
+    def testByMonthDay(self):
+        self.assertEqual(RtmApiRrule.parse(u"FREQ=MONTHLY;INTERVAL=1;BYMONTHDAY=1,15,-1"),
+                         (u"MONTHLY", 1, (), (1, 15, -1)))
+    
+    def testMalformed(self):
+        for rule in (u"FREQ=WEEKLY;BYDAY=XX", u"FREQ=WEEKLY;INTERVAL=abc", u"FREQ=WEEKLY;INTERVAL=0",
+                     u"FREQ=SOMETIMES", u"INTERVAL=2", u"", u"FREQ=MONTHLY;BYDAY=0MO", u"FREQ=MONTHLY;BYDAY=1MO,",
+                     u"FREQ=MONTHLY;BYMONTHDAY=32", u"FREQ=MONTHLY;BYMONTHDAY=0", u"FREQ=MONTHLY;BYMONTHDAY=1,x"):
+            self.assertEqual(RtmApiRrule.parse(rule), None, rule)
+            # remembered as malformed
+            self.assertEqual(RtmApiRrule.parse(rule), None, rule)
+
+class DescriptionTest(unittest.TestCase):
+    def testEveryAndAfter(self):
+        self.assertEqual(describe(u"FREQ=DAILY;INTERVAL=1"), u"every 1 day")
+        self.assertEqual(describe(u"FREQ=WEEKLY;INTERVAL=2"), u"every 2 weeks")
+        self.assertEqual(describe(u"FREQ=MONTHLY;INTERVAL=1", False), u"after 1 month")
+        self.assertEqual(describe(u"FREQ=YEARLY;INTERVAL=5", False), u"after 5 years")
+    
+    def testByDayList(self):
+        self.assertEqual(describe(u"FREQ=WEEKLY;INTERVAL=1;BYDAY=MO"), u"every 1 week on Monday")
+        self.assertEqual(describe(u"FREQ=WEEKLY;INTERVAL=1;BYDAY=MO,WE,FR"), u"every 1 week on Monday, Wednesday and Friday")
+    
+    def testByDayPositions(self):
+        self.assertEqual(describe(u"FREQ=MONTHLY;INTERVAL=1;BYDAY=2TU"), u"every 1 month on the 2nd Tuesday")
+        self.assertEqual(describe(u"FREQ=MONTHLY;INTERVAL=1;BYDAY=-1FR"), u"every 1 month on the last Friday")
+        self.assertEqual(describe(u"FREQ=MONTHLY;INTERVAL=1;BYDAY=-2SA"), u"every 1 month on the 2nd to last Saturday")
+        self.assertEqual(describe(u"FREQ=MONTHLY;INTERVAL=1;BYDAY=1MO,-1SU"),
+                         u"every 1 month on the 1st Monday and the last Sunday")
+    
+    def testByMonthDay(self):
+        self.assertEqual(describe(u"FREQ=MONTHLY;INTERVAL=1;BYMONTHDAY=3"), u"every 1 month on the 3rd")
+        self.assertEqual(describe(u"FREQ=MONTHLY;INTERVAL=1;BYMONTHDAY=1,15,-1"),
+                         u"every 1 month on the 1st, 15th and last day")
+        self.assertEqual(describe(u"FREQ=MONTHLY;INTERVAL=1;BYMONTHDAY=-3"), u"every 1 month on the 3rd to last day")
+    
+    def testOrdinalSuffixes(self):
+        aExpected = {1: u"1st", 2: u"2nd", 3: u"3rd", 4: u"4th", 11: u"11th", 12: u"12th", 13: u"13th",
+                     21: u"21st", 22: u"22nd", 23: u"23rd", 31: u"31st"}
+        for (day, numeral) in aExpected.items():
+            self.assertEqual(describe(u"FREQ=MONTHLY;INTERVAL=1;BYMONTHDAY=%i" % day), u"every 1 month on the " + numeral)
+    
+    def testMalformedShownAsSent(self):
+        self.assertEqual(describe(u"FREQ=WEEKLY;BYDAY=XX"), u"FREQ=WEEKLY;BYDAY=XX")
+        self.assertEqual(describe(u"FREQ=WEEKLY;INTERVAL=abc", False), u"FREQ=WEEKLY;INTERVAL=abc")
+    
+    def testMemoizedPerEvery(self):
+        self.assertEqual(describe(u"FREQ=DAILY;INTERVAL=2"), u"every 2 days")
+        self.assertEqual(describe(u"FREQ=DAILY;INTERVAL=2", False), u"after 2 days")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,169 @@
+# coding: utf-8
+
+"""
+Expiry of the list of timezones kept by TimezonesStorage in the instance cache and in the storage backend.
+
+Usage: python tests/testTimezonesStorage.py
+"""
+
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+from RtmApi import RtmApiTimezone
+from StorageBackend import TieredStorageBackend, MemoryStorageBackend
+import StorageBackend
+import TimezonesStorage
+from TimezonesStorage import isFresh, getTimezones, TTL
+
+NOW = 1300000000.0
+
+class FakeClock(object):
+    """
+    Stands for the time module in TimezonesStorage
+    """
+    
+    def __init__(self, now):
+        self.now = now
+    
+    def time(self):
+        return self.now
+
+class FakeRtmApi(object):
+    def __init__(self):
+        self.calls = 0
+        self.aTimezonesRaw = [{"id": u"1", "name": u"Europe/London", "dst": u"0", "offset": u"0", "current_offset": u"0"},
+                              {"id": u"2", "name": u"Europe/Moscow", "dst": u"0", "offset": u"10800", "current_offset": u"10800"}]
+    
+    def timezonesGetList(self, raw = False, fromRaw = None):
+        if fromRaw:
+            return [RtmApiTimezone.createFromRaw(data) for data in fromRaw]
+        
+        self.calls += 1
+        return self.aTimezonesRaw
+
+class IsFreshTest(unittest.TestCase):
+    def testNeverUpdated(self):
+        self.assertFalse(isFresh(None, NOW))
+    
+    def testWithinTtl(self):
+        self.assertTrue(isFresh(NOW, NOW))
+        self.assertTrue(isFresh(NOW - TTL + 1, NOW))
+    
+    def testExactlyAtTtl(self):
+        self.assertFalse(isFresh(NOW - TTL, NOW))
+        self.assertFalse(isFresh(NOW - 10, NOW, ttl = 10))
+    
+    def testMoreThanADayOld(self):
+        # timedelta.seconds wraps at a day: a list a day and a minute old looked a minute old
+        self.assertFalse(isFresh(NOW - 86400 - 60, NOW))
+        self.assertFalse(isFresh(NOW - 7 * 86400, NOW))
+    
+    def testClockWentBackwards(self):
+        self.assertFalse(isFresh(NOW + 1, NOW))
+        self.assertFalse(isFresh(NOW + 7 * 86400, NOW))
+
+class GetTimezonesTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(NOW)
+        self.time = TimezonesStorage.time
+        TimezonesStorage.time = self.clock
+        
+        self.durable = MemoryStorageBackend()
+        self.defaultBackend = StorageBackend._defaultBackend
+        StorageBackend._defaultBackend = TieredStorageBackend(self.durable)
+        
+        TimezonesStorage._cache["aTimezones"] = None
+        TimezonesStorage._cache["lastUpdated"] = None
+        
+        self.rtmApi = FakeRtmApi()
+    
+    def tearDown(self):
+        TimezonesStorage.time = self.time
+        StorageBackend._defaultBackend = self.defaultBackend
+        TimezonesStorage._cache["aTimezones"] = None
+        TimezonesStorage._cache["lastUpdated"] = None
+    
+    def coldInstance(self):
+        """
+        Forgets what this instance keeps in memory, as a new instance would, the stored list stays
+        """
+        TimezonesStorage._cache["aTimezones"] = None
+        TimezonesStorage._cache["lastUpdated"] = None
+        StorageBackend._defaultBackend = TieredStorageBackend(self.durable)
+    
+    def testRequestedOnce(self):
+        aTimezones = getTimezones(self.rtmApi)
+        self.assertEqual([timezone.name for timezone in aTimezones], [u"Europe/London", u"Europe/Moscow"])
+        self.assertTrue(RtmApiTimezone.createByZoneName(u"Europe/Moscow") is aTimezones[1])
+        
+        self.clock.now = NOW + TTL - 1
+        self.assertTrue(getTimezones(self.rtmApi) is aTimezones)
+        self.assertEqual(self.rtmApi.calls, 1)
+        self.assertEqual(self.durable.saves, 1)
+    
+    def testExpiredAtTtl(self):
+        aTimezones = getTimezones(self.rtmApi)
+        
+        self.clock.now = NOW + TTL
+        self.assertFalse(getTimezones(self.rtmApi) is aTimezones)
+        self.assertEqual(self.rtmApi.calls, 2)
+        self.assertEqual(self.durable.saves, 2)
+    
+    def testExpiredAfterADay(self):
+        getTimezones(self.rtmApi)
+        
+        self.clock.now = NOW + 86400 + 60
+        getTimezones(self.rtmApi)
+        self.assertEqual(self.rtmApi.calls, 2)
+    
+    def testClockWentBackwards(self):
+        getTimezones(self.rtmApi)
+        
+        self.clock.now = NOW - 86400
+        getTimezones(self.rtmApi)
+        self.assertEqual(self.rtmApi.calls, 2)
+        
+        # the list stored then is fresh by the new clock
+        self.clock.now = NOW - 86400 + 60
+        getTimezones(self.rtmApi)
+        self.assertEqual(self.rtmApi.calls, 2)
+    
+    def testColdCacheLoadsStoredList(self):
+        getTimezones(self.rtmApi)
+        loads = self.durable.loads
+        
+        self.coldInstance()
+        self.clock.now = NOW + TTL - 1
+        aTimezones = getTimezones(self.rtmApi)
+        self.assertEqual([timezone.name for timezone in aTimezones], [u"Europe/London", u"Europe/Moscow"])
+        self.assertTrue(RtmApiTimezone.createByZoneName(u"Europe/London") is aTimezones[0])
+        self.assertEqual(self.rtmApi.calls, 1)
+        self.assertEqual(self.durable.loads, loads + 1)
+        
+        # the instance cache expires together with the stored list, not a TTL after it was loaded
+        self.clock.now = NOW + TTL
+        getTimezones(self.rtmApi)
+        self.assertEqual(self.rtmApi.calls, 2)
+    
+    def testColdCacheExpiredStoredList(self):
+        getTimezones(self.rtmApi)
+        
+        self.coldInstance()
+        self.clock.now = NOW + TTL
+        getTimezones(self.rtmApi)
+        self.assertEqual(self.rtmApi.calls, 2)
+    
+    def testCachedOnly(self):
+        self.assertEqual(getTimezones(self.rtmApi, cachedOnly = True), None)
+        self.assertEqual(self.rtmApi.calls, 0)
+        
+        getTimezones(self.rtmApi)
+        self.coldInstance()
+        self.assertEqual(len(getTimezones(self.rtmApi, cachedOnly = True)), 2)
+        self.assertEqual(self.rtmApi.calls, 1)
+
+if __name__ == "__main__":
+    unittest.main()